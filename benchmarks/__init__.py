@@ -0,0 +1,6 @@
+"""
+Benchmarks for hugo_dataset. Run them from the repository root, e.g.
+
+    python -m benchmarks.run --n 2000
+    python -m benchmarks.bench_router
+"""
@@ -0,0 +1,100 @@
+"""
+Import time of the package's entry points, checked against a budget.
+
+    python -m benchmarks.bench_import [--budget-ms 300] [--module hugo_dataset.evidence]
+
+Each module is imported in a fresh interpreter with `-X importtime` (best of
+--repeat runs). A module fails the check if its cumulative import time is over
+budget or if it pulls in one of the --forbid packages, which should only be
+imported once they are used. The slowest imports are listed for each module.
+The exit status is 1 if any check fails.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# hugo_dataset is imported from the checkout these benchmarks belong to.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Module -> budget in milliseconds, with headroom for slower machines.
+BUDGETS = {
+    "hugo_dataset.retrievers": 150,
+    "hugo_dataset.evidence": 250,
+    "hugo_dataset.load_dataset": 500,
+    "hugo_dataset.create_dataset": 500,
+}
+
+FORBIDDEN = ("requests", "bs4", "datasets", "pyarrow")
+
+def import_times(module: str, python: str = sys.executable) -> dict[str, tuple[int, int]]:
+    """
+    Import module in a new interpreter.
+
+    Returns:
+        dict: Imported module -> (self, cumulative) microseconds, in import order.
+    """
+    result = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        if not own.strip().isdigit():
+            continue # The header line
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+def measure(module: str, repeat: int = 5) -> dict[str, tuple[int, int]]:
+    """
+    The import_times of the fastest of `repeat` runs.
+    """
+    runs = [import_times(module) for _ in range(repeat)]
+    return min(runs, key=lambda times: times[module][1])
+
+def check(module: str, budget_ms: float, forbidden=FORBIDDEN, repeat: int = 5, top: int = 10) -> list[str]:
+    """
+    Report the import time of module and return the failed checks.
+    """
+    times = measure(module, repeat)
+    total_ms = times[module][1] / 1000
+    failures = []
+    if total_ms > budget_ms:
+        failures.append(f"{module} takes {total_ms:.1f}ms to import, over its budget of {budget_ms:.0f}ms")
+    for package in forbidden:
+        if package in times:
+            failures.append(f"{module} imports {package} ({times[package][1] / 1000:.1f}ms)")
+    print(f"{module}: {total_ms:.1f}ms (budget {budget_ms:.0f}ms), {len(times)} modules")
+    slowest = sorted(times.items(), key=lambda item: -item[1][0])[:top]
+    for name, (own, cumulative) in slowest:
+        print(f"  {own / 1000:>8.1f}ms self {cumulative / 1000:>8.1f}ms total  {name}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--module", action="append", default=None,
+                        help=f"Module to check (repeatable, default: {', '.join(BUDGETS)})")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Budget of every module (default: per module, see BUDGETS)")
+    parser.add_argument("--forbid", default=",".join(FORBIDDEN),
+                        help="Comma-separated packages that must not be imported")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per module; the fastest is kept")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports listed per module")
+    args = parser.parse_args()
+
+    forbidden = [package.strip() for package in args.forbid.split(",") if package.strip()]
+    failures = []
+    for module in args.module or BUDGETS:
+        budget = args.budget_ms if args.budget_ms is not None else BUDGETS.get(module, 500)
+        failures += check(module, budget, forbidden, args.repeat, args.top)
+    for failure in failures:
+        print(f"FAILED {failure}")
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
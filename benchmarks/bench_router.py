@@ -0,0 +1,75 @@
+"""
+Throughput of URL -> (source, id) routing.
+
+    python -m benchmarks.bench_router [--n 200000]
+
+Compares the per-call netloc split + GETTERS lookup that get_id_from_url
+used to do with UrlRouter.route and UrlRouter.route_many (list and Arrow input).
+"""
+import argparse
+import random
+import re
+import time
+import urllib.parse
+
+from hugo_dataset import retrievers
+
+URLS = [
+    "https://arxiv.org/abs/2101.{:05d}",
+    "https://arxiv.org/pdf/2101.{:05d}.pdf",
+    "https://export.arxiv.org/abs/1901.{:05d}v2",
+    "https://aclanthology.org/2023.acl-long.{}.pdf",
+    "https://en.wikipedia.org/wiki/Material_{}",
+    "https://next-gen.materialsproject.org/materials/mp-{}",
+    "https://www.sciencedirect.com/science/article/pii/S0{:08d}",
+    "https://link.springer.com/10.1007/978-3-030-{:05d}-1",
+    "https://journals.aps.org/prb/abstract/10.1103/PhysRevB.{}",
+    "https://example.org/paper/{}",
+]
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(URLS).format(i) for i in range(n)]
+
+def legacy(url):
+    # What get_id_from_url did before the router: split netloc, then an uncompiled regex.
+    source = urllib.parse.urlparse(url).netloc.split(".")[-2]
+    getter = retrievers.GETTERS.get(source)
+    if getter is None:
+        return None
+    match = re.search(getter.url_pattern, url)
+    return (source, getter.clean_id(match.group(1))) if match else None
+
+def timed(name, n, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24} {n / elapsed:>12,.0f} urls/s  ({elapsed:.3f}s)")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=200_000, help="Number of URLs")
+    args = parser.parse_args()
+    urls = corpus(args.n)
+    router = retrievers.get_router()
+
+    def route_each():
+        for url in urls:
+            try:
+                router.route(url)
+            except (ValueError, NotImplementedError):
+                pass
+
+    timed("legacy (per call)", args.n, lambda: [legacy(url) for url in urls])
+    timed("UrlRouter.route", args.n, route_each)
+    timed("UrlRouter.route_many", args.n, lambda: router.route_many(urls))
+    try:
+        import pyarrow as pa
+    except ImportError:
+        return
+    array = pa.array(urls)
+    timed("route_many (Arrow)", args.n, lambda: router.route_many(array))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Synthetic document corpora: N files spread over a directory tree of a given
+depth, with sizes drawn from a distribution.
+"""
+import math
+import os
+import random
+import time
+
+_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30}
+
+def parse_size(text: str) -> int:
+    """
+    "64k" -> 65536. Suffixes k, m and g (case-insensitive) are powers of 1024.
+    """
+    text = text.strip().lower().rstrip("b")
+    unit = text[-1] if text and text[-1] in _UNITS else ""
+    return int(float(text[:len(text) - len(unit)]) * _UNITS[unit])
+
+def size_sampler(spec: str, rng: random.Random):
+    """
+    A function returning file sizes for a distribution spec:
+
+        fixed:64k           every file is 64 KiB
+        uniform:4k-1m       uniform between 4 KiB and 1 MiB
+        lognormal:256k,1.0  log-normal with median 256 KiB and sigma 1.0 (PDF-like)
+    """
+    kind, _, args = spec.partition(":")
+    if kind == "fixed":
+        size = parse_size(args)
+        return lambda: size
+    if kind == "uniform":
+        low, high = (parse_size(x) for x in args.split("-"))
+        return lambda: rng.randint(low, high)
+    if kind == "lognormal":
+        median, _, sigma = args.partition(",")
+        mu = math.log(parse_size(median))
+        sigma = float(sigma or 1.0)
+        return lambda: max(1, int(rng.lognormvariate(mu, sigma)))
+    raise ValueError(f"Unknown size distribution {spec}.")
+
+def paper_id(i: int) -> str:
+    """
+    An arXiv-style id for the i-th document.
+    """
+    return f"{2101 + i // 100000}.{i % 100000:05d}"
+
+def make_corpus(root: str, n: int, depth: int = 2, fanout: int = 16, sizes: str = "lognormal:256k,1.0",
+                extension: str = "pdf", seed: int = 0, age: float = 86400) -> list[tuple[str, str, int]]:
+    """
+    Write n documents under root, `depth` directory levels deep with `fanout`
+    subdirectories per level. Contents are pseudo-random, and differ per
+    document so that every file has its own hash.
+
+    Files and directories get mtimes `age` seconds in the past, like an
+    existing corpus: the hash cache and the incremental index do not trust
+    entries modified moments ago.
+
+    Returns:
+        list: (id, path, size) of every document.
+    """
+    rng = random.Random(seed)
+    sample = size_sampler(sizes, rng)
+    block = rng.randbytes(1 << 20)
+    documents = []
+    for i in range(n):
+        parts = []
+        k = i
+        for _ in range(depth):
+            parts.append(f"d{k % fanout:02d}")
+            k //= fanout
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        id = paper_id(i)
+        path = os.path.join(directory, f"{id}.{extension}")
+        size = sample()
+        with open(path, "wb") as f:
+            header = f"%PDF-1.4 {id}\n".encode()
+            f.write(header[:size])
+            remaining = size - min(size, len(header))
+            offset = i % len(block)
+            while remaining > 0:
+                chunk = block[offset:offset + remaining]
+                f.write(chunk)
+                remaining -= len(chunk)
+                offset = 0
+        documents.append((id, path, size))
+    if age:
+        mtime = time.time() - age
+        for _, path, _ in documents:
+            os.utime(path, (mtime, mtime))
+        for d, _, _ in os.walk(root):
+            os.utime(d, (mtime, mtime))
+    return documents
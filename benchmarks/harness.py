@@ -0,0 +1,107 @@
+"""
+Timing, result files and regression checks shared by the benchmarks.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    The q-th percentile (0-100) of values, interpolated linearly.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (k - low)
+
+def summarize(latencies: list[float], seconds: float | None = None, nbytes: int = 0, items: int | None = None) -> dict:
+    """
+    Throughput and latency percentiles of a stage.
+
+    Args:
+        latencies: Seconds per item (per run for whole-tree stages).
+        seconds: Wall-clock time of the stage (default: the sum of latencies).
+        nbytes: Bytes processed by the stage.
+        items: Items processed (default: one per latency), e.g. files per index run.
+    """
+    seconds = sum(latencies) if seconds is None else seconds
+    items = len(latencies) if items is None else items
+    stats = dict(count=items, seconds=round(seconds, 6), per_second=items / seconds if seconds else 0.0)
+    if nbytes:
+        stats["mb_per_second"] = nbytes / (1 << 20) / seconds if seconds else 0.0
+    for q in (50, 90, 99):
+        stats[f"p{q}_ms"] = percentile(latencies, q) * 1000
+    stats["max_ms"] = max(latencies, default=0.0) * 1000
+    return stats
+
+def time_each(fn, items) -> tuple[list[float], float]:
+    """
+    Call fn(item) for every item.
+
+    Returns:
+        tuple: (seconds per call, total seconds).
+    """
+    latencies = []
+    start = time.perf_counter()
+    for item in items:
+        t = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - t)
+    return latencies, time.perf_counter() - start
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> dict:
+    return dict(revision=_git_revision(), python=sys.version.split()[0], platform=platform.platform(),
+                cpus=os.cpu_count(), time=time.strftime("%Y-%m-%dT%H:%M:%S"))
+
+def save(results: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1, min_ms: float = 0.1) -> list[str]:
+    """
+    Stages whose throughput dropped, or whose p90 latency rose, by more than
+    threshold (a fraction) relative to the baseline results. p90 latencies
+    under min_ms are timer noise and not compared.
+    """
+    regressions = []
+    for stage, now in current["stages"].items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        if before["per_second"] and now["per_second"] < before["per_second"] * (1 - threshold):
+            regressions.append(f"{stage}: {now['per_second']:,.1f}/s vs {before['per_second']:,.1f}/s")
+        elif now["p90_ms"] >= min_ms and now["p90_ms"] > max(before["p90_ms"], min_ms) * (1 + threshold):
+            regressions.append(f"{stage}: p90 {now['p90_ms']:.2f}ms vs {before['p90_ms']:.2f}ms")
+    return regressions
+
+def report(results: dict, baseline: dict | None = None):
+    """
+    Print a table of the stages (with the change against baseline, if given).
+    """
+    print(f"{'stage':<20} {'count':>7} {'per second':>12} {'MB/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'vs base':>8}")
+    for stage, stats in results["stages"].items():
+        change = ""
+        before = (baseline or {}).get("stages", {}).get(stage)
+        if before and before["per_second"]:
+            change = f"{stats['per_second'] / before['per_second'] - 1:+.0%}"
+        mb = f"{stats['mb_per_second']:.1f}" if "mb_per_second" in stats else ""
+        print(f"{stage:<20} {stats['count']:>7} {stats['per_second']:>12,.1f} {mb:>9} "
+              f"{stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} {change:>8}")
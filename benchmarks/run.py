@@ -0,0 +1,187 @@
+"""
+Benchmark indexing, hashing, local resolution and hydration on a synthetic corpus.
+
+    python -m benchmarks.run --n 2000 --depth 3 --sizes lognormal:256k,1.0
+    python -m benchmarks.run --compare benchmarks/results/baseline.json
+
+Stages:
+    index_cold / index_warm    DocumentHandler.index on a new store, then on an unchanged tree
+    hash_cold / hash_warm      DocumentHandler.compute_hash reading every file, then from the hash cache
+    resolve_build / resolve    the shared local index, then Retriever._get_local per paper
+    process                    Paper.process per paper against a local stand-in arXiv server
+    pipeline                   HydrationPipeline with --workers (and its per-stage timings)
+
+Results are written as JSON (--out). With --compare, stages that got slower
+than the baseline by more than --threshold are listed and the exit status is 1.
+"""
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks import harness
+from benchmarks.corpus import make_corpus
+from benchmarks.server import StandInServer
+
+STAGES = ("index", "hash", "resolve", "process", "pipeline")
+
+def bench_index(work, corpus_dir, documents, repeat):
+    from hugo_dataset.evidence import DocumentHandler
+    cold = []
+    for i in range(repeat):
+        handler = DocumentHandler(doc_dir=os.path.join(work, f"index-{i}"), local_dir=[corpus_dir])
+        start = time.perf_counter()
+        handler.index()
+        cold.append(time.perf_counter() - start)
+        handler.close()
+    handler = DocumentHandler(doc_dir=os.path.join(work, "index-0"), local_dir=[corpus_dir])
+    warm, _ = harness.time_each(lambda _: handler.index(), range(repeat))
+    handler.close()
+    n = len(documents)
+    return {"index_cold": harness.summarize(cold, items=n * repeat),
+            "index_warm": harness.summarize(warm, items=n * repeat)}
+
+def bench_hash(work, documents):
+    from hugo_dataset.evidence import DocumentHandler
+    handler = DocumentHandler(doc_dir=os.path.join(work, "hash"))
+    paths = [path for _, path, _ in documents]
+    nbytes = sum(size for _, _, size in documents)
+    cold, cold_seconds = harness.time_each(lambda p: handler.compute_hash(p, force=True), paths)
+    warm, warm_seconds = harness.time_each(handler.compute_hash, paths)
+    handler.close()
+    return {"hash_cold": harness.summarize(cold, cold_seconds, nbytes),
+            "hash_warm": harness.summarize(warm, warm_seconds)}
+
+def bench_resolve(work, corpus_dir, documents):
+    from hugo_dataset.retrievers import arxiv, local_index
+    target = os.path.join(work, "resolved")
+    os.makedirs(target, exist_ok=True)
+    local_index.clear_local_indexes()
+    start = time.perf_counter()
+    local_index.get_local_index(corpus_dir)
+    build = time.perf_counter() - start
+    urls = [f"https://arxiv.org/abs/{id}" for id, _, _ in documents]
+    latencies, seconds = harness.time_each(lambda url: arxiv._get_local(url, target, local_dir=corpus_dir), urls)
+    return {"resolve_build": harness.summarize([build], items=len(documents)),
+            "resolve": harness.summarize(latencies, seconds, sum(size for _, _, size in documents))}
+
+def _papers(documents):
+    from hugo_dataset.evidence import Paper
+    return [Paper(id=id, url=f"https://arxiv.org/pdf/{id}.pdf", source="arxiv") for id, _, _ in documents]
+
+def bench_process(work, documents):
+    from hugo_dataset.evidence import DocumentHandler
+    handler = DocumentHandler(doc_dir=os.path.join(work, "process"))
+    latencies, seconds = harness.time_each(lambda paper: paper.process(handler), _papers(documents))
+    handler.close()
+    return {"process": harness.summarize(latencies, seconds, sum(size for _, _, size in documents))}
+
+def bench_pipeline(work, documents, workers):
+    from hugo_dataset.evidence import DocumentHandler
+    from hugo_dataset.pipeline import HydrationPipeline
+    handler = DocumentHandler(doc_dir=os.path.join(work, "pipeline"))
+    pipeline = HydrationPipeline(document_handler=handler, workers=workers)
+    start = time.perf_counter()
+    results = pipeline.run(_papers(documents))
+    seconds = time.perf_counter() - start
+    handler.close()
+    failed = [r for r in results if r.error is not None or not r.path]
+    if failed:
+        print(f"pipeline: {len(failed)} papers failed, e.g. {failed[0].error}", file=sys.stderr)
+    totals = [sum(r.timings.values()) for r in results]
+    stats = {"pipeline": harness.summarize(totals, seconds, sum(size for _, _, size in documents))}
+    for stage in ("resolve", "download", "metadata", "hash"):
+        stats[f"pipeline.{stage}"] = harness.summarize([r.timings.get(stage, 0.0) for r in results])
+    return stats
+
+def run(args) -> dict:
+    from hugo_dataset.retrievers import arxiv, policy, transport
+    from hugo_dataset.retrievers.policy import RequestPolicy
+
+    stages = args.stages.split(",") if args.stages else STAGES
+    work = tempfile.mkdtemp(prefix="hugo-bench-", dir=args.work_dir)
+    results = dict(environment=harness.environment(),
+                   config=dict(n=args.n, depth=args.depth, fanout=args.fanout, sizes=args.sizes, seed=args.seed,
+                               repeat=args.repeat, remote=args.remote, workers=args.workers, latency=args.latency),
+                   stages={})
+    try:
+        corpus_dir = os.path.join(work, "corpus")
+        start = time.perf_counter()
+        documents = make_corpus(corpus_dir, args.n, depth=args.depth, fanout=args.fanout,
+                                sizes=args.sizes, seed=args.seed)
+        print(f"Generated {len(documents)} documents ({sum(d[2] for d in documents) / (1 << 20):.1f} MiB) "
+              f"in {time.perf_counter() - start:.1f}s")
+        if "index" in stages:
+            results["stages"].update(bench_index(work, corpus_dir, documents, args.repeat))
+        if "hash" in stages:
+            results["stages"].update(bench_hash(work, documents))
+        if "resolve" in stages:
+            results["stages"].update(bench_resolve(work, corpus_dir, documents))
+        remote = documents[:args.remote]
+        if remote and ("process" in stages or "pipeline" in stages):
+            with StandInServer({id: path for id, path, _ in remote}, latency=args.latency) as server:
+                transport.set_transport(transport.Transport(host_map=server.host_map()))
+                # The stand-in server has no rate limit to respect.
+                arxiv_policy, arxiv.policy = arxiv.policy, RequestPolicy()
+                policy.reset()
+                try:
+                    if "process" in stages:
+                        results["stages"].update(bench_process(work, remote))
+                    if "pipeline" in stages:
+                        results["stages"].update(bench_pipeline(work, remote, args.workers))
+                finally:
+                    arxiv.policy = arxiv_policy
+                    policy.reset()
+                    transport.set_transport(None)
+    finally:
+        if args.keep:
+            print(f"Kept {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--n", type=int, default=1000, help="Number of documents in the corpus")
+    parser.add_argument("--depth", type=int, default=2, help="Directory levels below the corpus root")
+    parser.add_argument("--fanout", type=int, default=16, help="Subdirectories per level")
+    parser.add_argument("--sizes", default="lognormal:256k,1.0",
+                        help="Size distribution: fixed:64k, uniform:4k-1m or lognormal:MEDIAN,SIGMA")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of the whole-tree index stages")
+    parser.add_argument("--remote", type=int, default=200, help="Documents hydrated from the stand-in server")
+    parser.add_argument("--workers", type=int, default=8, help="Workers of the pipeline stage")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every stand-in server response")
+    parser.add_argument("--stages", default=None, help=f"Comma-separated subset of {','.join(STAGES)}")
+    parser.add_argument("--work-dir", default=None, help="Where to create the corpus (default: the system temp dir)")
+    parser.add_argument("--keep", action="store_true", help="Keep the corpus and outputs")
+    parser.add_argument("--out", default=None,
+                        help="Results file (default: benchmarks/results/<time>-<revision>.json)")
+    parser.add_argument("--compare", default=None, help="Baseline results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Slowdown (fraction) flagged as a regression")
+    parser.add_argument("--log", action="store_true", help="Keep hugo_dataset's logging on")
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+    results = run(args)
+    env = results["environment"]
+    out = args.out or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results",
+                                   f"{env['time'].replace(':', '')}-{env['revision'] or 'unknown'}.json")
+    harness.save(results, out)
+    baseline = harness.load(args.compare) if args.compare else None
+    harness.report(results, baseline)
+    print(f"Saved {out}")
+    if baseline is not None:
+        regressions = harness.compare(baseline, results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
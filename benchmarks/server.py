@@ -0,0 +1,107 @@
+"""
+A local stand-in for the arXiv endpoints the retrievers use, so hydration
+can be benchmarked without the network or rate limits.
+
+    /pdf/<id>.pdf              the document (with ETag and Range support)
+    /api/query?id_list=a,b     an Atom feed with one entry per id
+"""
+import os
+import shutil
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from xml.sax.saxutils import escape
+
+ENTRY = """<entry><id>http://arxiv.org/abs/{id}v1</id><published>2021-01-01T00:00:00Z</published>
+<title>Synthetic paper {id}</title><summary>Abstract of synthetic paper {id}.</summary></entry>"""
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without this, delayed ACKs add ~40ms per response.
+    disable_nagle_algorithm = True
+    server : "StandInServer"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", content_type="text/plain", headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        parts = urlsplit(self.path)
+        if parts.path == "/api/query":
+            ids = parse_qs(parts.query).get("id_list", [""])[0].split(",")
+            entries = "".join(ENTRY.format(id=escape(id)) for id in ids if id in self.server.documents)
+            body = f'<feed xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode()
+            return self._send(200, body, "application/atom+xml")
+        if parts.path.startswith("/pdf/"):
+            id = os.path.splitext(parts.path[len("/pdf/"):])[0]
+            path = self.server.documents.get(id)
+            if path is not None:
+                return self._send_file(path)
+        self._send(404, b"not found")
+
+    def _send_file(self, path):
+        st = os.stat(path)
+        etag = f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+        start = 0
+        status = 200
+        headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+        range_header = self.headers.get("Range", "")
+        if range_header.startswith("bytes=") and self.headers.get("If-Range", etag) == etag:
+            start = int(range_header[len("bytes="):].split("-")[0] or 0)
+            if start >= st.st_size:
+                return self._send(416, headers={"Content-Range": f"bytes */{st.st_size}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{st.st_size - 1}/{st.st_size}"
+        self.send_response(status)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(st.st_size - start))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(start)
+            shutil.copyfileobj(f, self.wfile, 1 << 20)
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Serve documents (id -> path) on a free local port in a background thread.
+
+        with StandInServer(documents) as server:
+            transport.set_transport(transport.Transport(host_map=server.host_map()))
+    """
+    daemon_threads = True
+    handler_class = _Handler # Subclass to change responses, e.g. in tests
+
+    def __init__(self, documents: dict[str, str], latency: float = 0.0, host: str = "127.0.0.1"):
+        super().__init__((host, 0), self.handler_class)
+        self.documents = documents
+        self.latency = latency # Seconds added to every response
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def host_map(self) -> dict[str, str]:
+        return {"arxiv.org": self.url, "export.arxiv.org": self.url}
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
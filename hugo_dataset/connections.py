@@ -0,0 +1,48 @@
+import sqlite3
+import threading
+from collections.abc import Callable
+
+class ThreadConnections:
+    """
+    One SQLite connection per thread (a connection cannot be used by two
+    threads at once), opened on first use by `connect`.
+
+    Every connection handed out is registered, so close() closes those of all
+    threads rather than only the caller's: a connection left open keeps the
+    database's -wal/-shm files around.
+    """
+    def __init__(self, connect: Callable[[], sqlite3.Connection]):
+        self._connect = connect
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def get(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Close the connections of all threads. Call once the other threads are
+        done with them; a later get() opens a new connection.
+        """
+        with self._lock:
+            conns, self._all = self._all, []
+            self._local = threading.local()
+        for conn in conns:
+            conn.close()
+
+def connect_wal(path: str, timeout: float, **kwargs) -> sqlite3.Connection:
+    """
+    Open `path` in WAL mode. The connection may be closed from another thread
+    (ThreadConnections.close) but is otherwise used by the thread that opened it.
+    """
+    conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False, **kwargs)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
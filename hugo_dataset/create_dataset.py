@@ -1,29 +1,120 @@
-from datasets import Dataset, DatasetDict 
+import argparse
+import os
+import threading
+import time
+from typing import Iterable
+from hugo_dataset import metrics, profiling
 from hugo_dataset.evidence import DocumentHandler, Paper
-from pydantic import BaseModel
+from hugo_dataset.manifest import RunManifest, restore
+from hugo_dataset.pipeline import HydrationPipeline
+from hugo_dataset.retrievers import cache
+from hugo_dataset.sharding import check_shard, in_shard, shard_file, shard_store_file
+from hugo_dataset.table import PaperTable
+from pydantic import BaseModel, ConfigDict
 
 from hugo_dataset.logger import get_logger
 logger = get_logger(__name__ + ".create_dataset")
 
+TABLE_BATCH = 1024 # Papers streamed through process_all are converted to Arrow this many at a time
+
 class DatasetManager(BaseModel): 
+  model_config = ConfigDict(arbitrary_types_allowed=True)
   # Define an initial list of Paper objects. 
-  papers : list[Paper]
+  papers : list[Paper] = []
+  table : PaperTable | None = None # Papers streamed through process_all(papers=...), kept columnar
   document_handler : DocumentHandler = DocumentHandler()
   dataset_dir: str ="data/evidence_dataset"
+  workers : int = 1 # Number of workers per hydration stage (1 processes papers sequentially)
+  source_concurrency : dict[str, int] = {} # Maximum concurrent downloads per source
+  metadata_cache : str | None = None # Metadata cache location (default: doc_dir/.metadata.sqlite, per shard when sharding)
+  metadata_ttl : float = 30 # Days before cached metadata is revalidated
+  use_metadata_cache : bool = True
+  num_shards : int = 1 # Split process_all between num_shards runs by a stable hash of the paper ids
+  shard_index : int = 0 # The shard this run processes
+  manifest : str | None = None # Run manifest location (default: doc_dir/.manifest.sqlite)
+  metrics_file : str | None = None # Prometheus textfile written after process_all (default: doc_dir/.metrics.prom); a JSON summary goes next to it
 
-  def process_all(self, additional_directories : list[str]=None, store_file : str = None):
+  def process_all(self, additional_directories : list[str]=None, store_file : str = None, resume : bool = False,
+                  papers : Iterable[Paper] | None = None):
     """
     Process (download and compute hash for) all papers in the list.
+    The outcome of every paper is recorded in the run manifest; with resume,
+    papers it records as done are skipped and keep their recorded hash.
+    With papers (e.g. a generator), those are processed instead as they are
+    produced and then appended to self.table, TABLE_BATCH at a time, rather
+    than kept as Paper objects.
     """
-    self.document_handler.store_file=store_file
-    self.document_handler.index(additional_directories=additional_directories)
-    for paper in self.papers:
-        try:
-            path = paper.process(self.document_handler)
-            logger.info(f"Processed {paper.id}, computed hash: {paper.hash}")
-        except Exception as e:
-            logger.debug(f"Error processing {paper.id}: {e}")
-    self.document_handler.close()
+    start = time.perf_counter()
+    check_shard(self.num_shards, self.shard_index)
+    # The registry is process-wide; the exported metrics cover this run only.
+    metrics.get_metrics().reset()
+    self.document_handler.store_file=store_file or shard_store_file(
+        self.document_handler.doc_dir, self.num_shards, self.shard_index)
+    if self.document_handler.hash_cache is None:
+        self.document_handler.hash_cache = shard_file(self.document_handler.doc_dir, "hashes", self.num_shards, self.shard_index)
+    if self.use_metadata_cache:
+        cache.configure(self.metadata_cache
+                        or shard_file(self.document_handler.doc_dir, "metadata", self.num_shards, self.shard_index)
+                        or os.path.join(self.document_handler.doc_dir, ".metadata.sqlite"),
+                        ttl=self.metadata_ttl * cache.DAY)
+    with profiling.stage("index"):
+      self.document_handler.index(additional_directories=additional_directories)
+
+    doc_dir = self.document_handler.doc_dir
+    manifest = RunManifest(self.manifest or shard_file(doc_dir, "manifest", self.num_shards, self.shard_index)
+                           or os.path.join(doc_dir, ".manifest.sqlite"))
+    completed = manifest.completed() if resume else {}
+
+    chunks = [] # PaperTables of the streamed papers
+    batch = []
+    lock = threading.Lock() # Papers are kept from the dispatching thread and from on_result
+
+    def keep(paper):
+        with lock:
+            batch.append(paper)
+            if len(batch) >= TABLE_BATCH:
+                chunks.append(PaperTable.from_papers(batch))
+                batch.clear()
+
+    def report(result):
+        manifest.record_result(result)
+        if papers is not None:
+            keep(result.paper)
+        if result.error:
+            logger.debug(f"Error processing {result.paper.id}: {result.error}")
+        else:
+            logger.info(f"Processed {result.paper.id}, computed hash: {result.paper.hash}")
+
+    pipeline = HydrationPipeline(
+        document_handler=self.document_handler,
+        workers=self.workers,
+        source_concurrency=self.source_concurrency
+        )
+
+    def jobs():
+      for paper in self.papers if papers is None else papers:
+        if in_shard(paper.id, self.num_shards, self.shard_index) and not restore(paper, completed.get(paper.id)):
+          yield paper
+        elif papers is not None:
+          # Kept in the dataset, like the papers of self.papers that are not processed.
+          keep(paper)
+
+    try:
+      pipeline.run(jobs(), on_result=report, collect=False)
+      if papers is not None:
+        previous = [self.table] if self.table is not None else []
+        self.table = PaperTable.concat([*previous, *chunks, PaperTable.from_papers(batch)])
+      summary = manifest.summary()
+    finally:
+      manifest.close()
+      self.document_handler.close()
+      try:
+        metrics.export(self.metrics_file or shard_file(doc_dir, "metrics", self.num_shards, self.shard_index, "prom")
+                       or os.path.join(doc_dir, ".metrics.prom"), time.perf_counter() - start)
+      except Exception as e:
+        # Must not replace an exception raised by the run.
+        logger.warning(f"Failed to export metrics: {e}")
+    logger.info(f"Run manifest {manifest.path}: {summary}")
 
   def add_paper_from_url(self, url):
     """
@@ -42,17 +133,21 @@ class DatasetManager(BaseModel):
     Convert the papers list and sources into a DatasetDict and save
     the dataset to disk.
     """
-    # Convert each Paper instance to its dictionary representation.
-    papers_data = [paper.__dict__ for paper in self.papers]
-    papers_dataset = Dataset.from_list(papers_data)
-    #sources_dataset = Dataset.from_list(self.sources)
-    dataset = DatasetDict({
-        "papers": papers_dataset,
-    })
-    dataset.save_to_disk(self.dataset_dir)
+    from datasets import DatasetDict
+    with profiling.stage("save"):
+      # Build the Arrow table column-wise; the Dataset shares its buffers.
+      table = PaperTable.from_papers(self.papers)
+      if self.table is not None:
+        table = PaperTable.concat([self.table, table])
+      papers_dataset = table.to_dataset()
+      #sources_dataset = Dataset.from_list(self.sources)
+      dataset = DatasetDict({
+          "papers": papers_dataset,
+      })
+      dataset.save_to_disk(self.dataset_dir)
     logger.info(f"Dataset successfully saved to '{self.dataset_dir}'")
 
-def main(): 
+def build():
   manager = DatasetManager(papers=[ 
     Paper( id="1809.09600", url="https://arxiv.org/pdf/1809.09600.pdf", source="arXiv", year="2018"), 
     Paper( id="2009.07758", url="https://arxiv.org/pdf/2009.07758.pdf", source="arXiv", year="2020"), 
@@ -70,5 +165,35 @@ def main():
   # Save the dataset.
   manager.save_dataset()
 
+def main(): 
+  parser = argparse.ArgumentParser(description="Build the example dataset.")
+  parser.add_argument(
+      "--profile",
+      nargs="?",
+      const="all",
+      default=None,
+      metavar="STAGES",
+      help=f"Sample the stacks of the given stages (comma-separated, from {','.join(profiling.STAGES)}; default: all) "
+           "and write collapsed stacks, a speedscope file and a hotspot table to --profile-dir"
+  )
+  parser.add_argument(
+      "--profile-dir",
+      default="profile",
+      type=str,
+      help="Where --profile writes its output (default: profile)"
+  )
+  parser.add_argument(
+      "--profile-interval",
+      default=0.005,
+      type=float,
+      help="Seconds between --profile samples (default: 0.005)"
+  )
+  args = parser.parse_args()
+  with profiling.profile(args.profile_dir if args.profile else None, profiling.parse_stages(args.profile),
+                         args.profile_interval) as profiler:
+    build()
+  if profiler is not None:
+    print(profiler.hotspots())
+
 if __name__ == "__main__": 
   main()
\ No newline at end of file
@@ -1,9 +1,12 @@
-import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 #import shutil 
 #import requests 
-import hashlib
-from hugo_dataset import retrievers
+from hugo_dataset import profiling, retrievers
+from hugo_dataset.hashing import HashCache, file_digest
+from hugo_dataset.retrievers.local_index import LocalIndex
+from hugo_dataset.store import IndexStore, open_store
 from pydantic import BaseModel, ConfigDict, StringConstraints
 from typing_extensions import Annotated
 
@@ -13,38 +16,102 @@ logger = get_logger("evidence")
 DEFAULT_LICENSES = lambda x: retrievers.GETTERS.get(x, retrievers.base.Retriever).license
 UNKNOWN_LICENSE = DEFAULT_LICENSES("None")
 
+# Directory mtimes this close to the scan time may still change without the
+# mtime moving (coarse timestamps), so their listings are not reused.
+RACY_MTIME_NS = 2 * 10**9
+
+def _scan_tree(root: str, previous: dict) -> tuple[list, dict, int]:
+    """
+    Walk root with os.scandir, reusing the listing of every directory whose
+    signature (mtime, link count) matches the previous scan.
+
+    Returns:
+        tuple: ((id, path) for every file, the new directory signatures, the number of directories listed).
+    """
+    files = []
+    signatures = {}
+    listed = 0
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            st = os.stat(d)
+        except OSError:
+            continue
+        key = os.path.abspath(d)
+        prev = previous.get(key)
+        if (prev and prev["mtime_ns"] == st.st_mtime_ns and prev["nlink"] == st.st_nlink
+                and prev["scanned_ns"] - st.st_mtime_ns > RACY_MTIME_NS):
+            sig = prev
+        else:
+            names, dirs = [], []
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_dir():
+                            # Like os.walk, do not descend into symlinked directories.
+                            if not entry.is_symlink():
+                                dirs.append(entry.name)
+                        elif not entry.name.startswith(".") and not entry.name.endswith((".part", ".part.json")):
+                            # Skip hidden files (indexes, temporary downloads) and partial downloads.
+                            names.append(entry.name)
+            except OSError:
+                continue
+            listed += 1
+            sig = dict(mtime_ns=st.st_mtime_ns, nlink=st.st_nlink, scanned_ns=time.time_ns(),
+                       count=len(names) + len(dirs), files=names, dirs=dirs)
+        signatures[key] = sig
+        files += [(os.path.splitext(name)[0], os.path.join(d, name)) for name in sig["files"]]
+        stack += [os.path.join(d, sub) for sub in sig["dirs"]]
+    return files, signatures, listed
+
 class DocumentHandler(BaseModel): 
     doc_dir : str = "data/docs"
     local_dir : str | list[str] = []
-    store_file : str | None = None
-    _local_store : dict[str, str] | None = None
+    store_file : str | None = None # A JSON id -> path mapping (imported again when edited) or a .sqlite store
+    store_backend : str = "sqlite" # "sqlite" or the legacy "json"
+    _local_store : IndexStore | None = None
     move : bool = False # Whether a file should be copied or moved.
+    hash_cache : str | None = None # Location of the file-hash cache (default: doc_dir/.hashes.sqlite)
+    use_hash_cache : bool = True
+    rehash : bool = False # Ignore cached digests (they are still refreshed)
+    _hashes : HashCache | None = None
+    _local_index : LocalIndex | None = None # Built by index(); matches normalized ids
 
     @property
-    def local_store(self):
+    def local_store(self) -> IndexStore:
         if self._local_store is None:
-            if not self.store_file:
-                self.store_file = os.path.join(self.doc_dir, ".store.json")
-            if os.path.isfile(self.store_file):
-                with open(self.store_file) as inp:
-                    try:
-                        self._local_store = json.load(inp)
-                    except:
-                        logger.info("Failed to load index from {self.store_file}.")
-                        self._local_store = {}
-            else:
-                self._local_store = {}
+            self._local_store = open_store(self.doc_dir, self.store_file, self.store_backend)
+            self.store_file = self._local_store.path
         return self._local_store
     
+    @property
+    def hashes(self) -> HashCache | None:
+        """
+        The file-hash cache. Point several handlers at the same hash_cache to share it.
+        """
+        if self._hashes is None and self.use_hash_cache:
+            self._hashes = HashCache(self.hash_cache or os.path.join(self.doc_dir, ".hashes.sqlite"))
+            self.hash_cache = self._hashes.path
+        return self._hashes
+
     def close(self):
-        """WARNING: Your index will be overwritten when you call close()"""
-        with open(self.store_file, 'w') as out:
-            logger.debug(self._local_store)
-            json.dump(self._local_store, out)
+        """
+        Release the store. With the json backend this writes (and overwrites) the index file.
+        """
+        if self._local_store is not None:
+            self._local_store.close()
+        if self._hashes is not None:
+            self._hashes.close()
     
-    def index(self, additional_directories: list[str] | None=None):
+    def index(self, additional_directories: list[str] | None=None, prune: bool=True, workers: int=8):
         """
-        re-index the doc dir. Do not remove non-existent files.
+        re-index the doc dir, local dirs and additional directories.
+
+        Directories whose signature (mtime, link count) is unchanged since the
+        last run are not listed again. Roots are scanned in parallel threads.
+        Entries pointing into a scanned root whose file no longer exists are
+        removed unless prune is False.
         """
         indexes = [self.doc_dir]
         if type(self.local_dir) == str:
@@ -54,35 +121,77 @@ class DocumentHandler(BaseModel):
         if additional_directories:
             # Add the destination location last to reduce unnecessary copying
             indexes = additional_directories + indexes
-        for _dir in indexes:
+
+        def scan(d):
+            with profiling.stage("index"):
+                return _scan_tree(d, previous)
+
+        previous = self.local_store.get_signatures()
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(indexes)))) as pool:
+            scans = list(pool.map(scan, indexes))
+
+        signatures = {}
+        seen = set()
+        current = dict(self.local_store.items())
+        changes = {}
+        for _dir, (files, sigs, listed) in zip(indexes, scans):
             logger.debug(f"indexing documents in {_dir}")
-            found = 0
+            signatures.update(sigs)
             updated = 0
-            pre = len(self.local_store)
-            for d, sub, f in os.walk(_dir):
-                for _f in f:
-                    id = os.path.splitext(_f)[0]
-                    existing = self.local_store.get(id)
-                    self.local_store[id] = os.path.join(d, _f)
-                    found += 1
-                    updated += 1 if existing != self.local_store[id] else 0
-            logger.info(f"Found {found} files in {_dir}. Updated {updated} out of {pre} provided file paths")
-
-    def compute_hash(self, file_path, hash_algo="md5"):
+            pre = len(current)
+            for id, path in files:
+                existing = current.get(id)
+                current[id] = path
+                seen.add(os.path.abspath(path))
+                if existing != path:
+                    changes[id] = path
+                    updated += 1
+            logger.info(f"Found {len(files)} files in {_dir} (listed {listed} of {len(sigs)} directories). Updated {updated} out of {pre} provided file paths")
+
+        if prune:
+            roots = tuple(os.path.join(os.path.abspath(d), "") for d in indexes)
+            stale = [id for id, path in current.items()
+                     if os.path.abspath(path).startswith(roots) and os.path.abspath(path) not in seen]
+            self.local_store.delete_many(stale)
+            for id in stale:
+                del current[id]
+            if stale:
+                logger.info(f"Removed {len(stale)} stale entries from the index")
+        self.local_store.update(changes)
+        self.local_store.set_signatures(signatures)
+        # Used by hydrate for ids the store has under another form; dropped with the handler.
+        self._local_index = LocalIndex(current)
+
+    def _record_digest(self, file_path, hash_algo, digest):
+        # We wrote the file ourselves, so its fresh mtime is not a concern.
+        if self.hashes is not None:
+            self.hashes.store(file_path, hash_algo, digest, trusted=True)
+
+    def compute_hash(self, file_path, hash_algo="md5", force=False):
         """
         Compute the hash of a file using a given algorithm.
+        Digests are served from the hash cache while the file's device, inode,
+        size and mtime are unchanged, unless force (or self.rehash) is set.
         """
-        if hash_algo == "md5":
-            hasher = hashlib.md5()
-        elif hash_algo == "sha256":
-            hasher = hashlib.sha256()
-        else:
-            raise ValueError("Unsupported hash algorithm.")
+        if self.hashes is None:
+            return file_digest(file_path, hash_algo)
+        return self.hashes.digest(file_path, hash_algo, force=force or self.rehash)
 
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
-        return hasher.hexdigest()
+    def locate(self, paper_id: str, source: str) -> str | None:
+        """
+        The stored path of a document, also found under another form of its id
+        (e.g. an arXiv id with another version, or a DOI stored with "_" for
+        "/"), or None. Other forms are matched through the index built by
+        index(), or only as the retriever's normalized id before that.
+        """
+        path = self.local_store.get(paper_id)
+        if path is None:
+            getter = retrievers.GETTERS.get(source, retrievers.base.Retriever)
+            if self._local_index is not None:
+                path = self._local_index.lookup(getter, paper_id)
+            elif getter.normalize_id(paper_id) != paper_id:
+                path = self.local_store.get(getter.normalize_id(paper_id))
+        return path
 
     def hydrate(self, paper, local_dir=None, ext='pdf', offline=False):
         """
@@ -99,12 +208,27 @@ class DocumentHandler(BaseModel):
         target_dir = os.path.join(self.doc_dir, license_type, source)
         os.makedirs(target_dir, exist_ok=True)
 
-        local_dir = self.local_store.get(paper_id, local_dir)
+        stored = self.local_store.get(paper_id)
+        local_path = stored if stored is not None else self.locate(paper_id, source)
+        local_dir = local_path or local_dir
         if local_dir and not os.path.exists(local_dir):
             logger.info(f"Warning: A doc path was provided for {paper_id} but the file was not found.")
 
         logger.info(f"retrieving {doc_url} from {local_dir if local_dir else doc_url}")
-        ret = retrievers.get_document(source, doc_url, target=target_dir, local_dir=local_dir, offline=offline, evidence=paper)
+        downloaded = []
+        def on_download(file_path, hash_algo, digest):
+            downloaded.append(file_path)
+            self._record_digest(file_path, hash_algo, digest)
+        ret = retrievers.get_document(source, doc_url, target=target_dir, local_dir=local_dir, offline=offline, evidence=paper,
+                                      on_download=on_download)
+        paper._origin = ("remote" if downloaded else "local") if ret else None
+        if ret and ret != stored:
+            # Committed now, so the next run finds the document without re-indexing.
+            self.local_store[paper_id] = ret
+        if (ret and not downloaded and local_dir and self.hashes is not None and os.path.isfile(local_dir)
+                and os.path.abspath(ret) != os.path.abspath(local_dir)):
+            # A copy of a file whose digest is cached needs no second read.
+            self.hashes.inherit(local_dir, ret)
         logger.info(f"hydration - retrieved to {ret}")
         return ret
 
@@ -122,13 +246,29 @@ class Paper(Evidence):
     hash : str | None = None
     title : str | None = None
     abs : str | None = None
+    _expected_hash : str | None = None
+    _origin : str | None = None # Where the last hydration found the document: "local" or "remote"
     
     @classmethod
     def from_metadata(cls, metadata):
         """
         Create a Paper instance from a dictionary containing metadata.
+        The hash recorded in the metadata is kept as expected_hash.
+        """
+        paper = cls(**metadata)
+        paper._expected_hash = paper.hash
+        return paper
+
+    @property
+    def expected_hash(self):
         """
-        return cls(**metadata)
+        The hash the paper's metadata says the document should have.
+        """
+        return self._expected_hash
+
+    @property
+    def origin(self):
+        return self._origin
 
     @classmethod
     def from_url(cls, url):
@@ -137,38 +277,77 @@ class Paper(Evidence):
         """
         if "arxiv.org" in url:
             # Try to extract the arXiv id.
-            return cls(**retrievers.arxiv.from_url(url))
+            return cls(**retrievers.GETTERS["arxiv"].from_url(url))
         elif "aclanthology.org" in url:
             # Try to extract the ACL Anthology id.
-            return cls(**retrievers.acl.from_url(url)) 
+            return cls(**retrievers.GETTERS["acl anthology"].from_url(url))
         else:
             raise ValueError("url must be either an arXiv or ACL Anthology link.")
 
-    def process(self, document_handler: DocumentHandler, offline=False):
+    def resolve(self):
         """
-        Download the paper's PDF and compute its hash.
+        Fill in defaults (e.g. the license) before the paper is hydrated.
         """
         if self.license_type == UNKNOWN_LICENSE:
             self.license_type = DEFAULT_LICENSES(self.source)
-            
+
+    def download(self, document_handler: DocumentHandler, offline=False):
+        """
+        Retrieve the paper's document into the document handler's doc_dir.
+        """
         logger.info(f"Hydrating {self.source}-{self.id}")
-        doc_path = document_handler.hydrate(self)
+        return document_handler.hydrate(self, offline=offline)
+
+    def fetch_metadata(self):
+        """
+        Retrieve the title and abstract if either is missing.
+        """
+        self.fetch_metadata_many([self])
 
-        if not self.title or not self.abs:
-            logger.info(f"retrieving metadata: {self.id}")
+    @classmethod
+    def fetch_metadata_many(cls, papers):
+        """
+        Retrieve missing titles and abstracts for several papers with one
+        batched retrievers.get_many call per source.
+        """
+        by_source = {}
+        for paper in papers:
+            if not paper.title or not paper.abs:
+                logger.info(f"retrieving metadata: {paper.id}")
+                by_source.setdefault(paper.source, []).append(paper)
+        for source, group in by_source.items():
             try:
-                data = retrievers.get(self.source, self.id)
-                self.title = data['title']
-                self.abs = data['abs']
+                data = retrievers.get_many(source, [paper.id for paper in group])
             except Exception as e:
-                logger.debug(f"Failed to retrieve metadata for {self.id}: {e}")
+                logger.debug(f"Failed to retrieve metadata for {len(group)} {source} papers: {e}")
+                continue
+            for paper in group:
+                if paper.id not in data:
+                    logger.debug(f"Failed to retrieve metadata for {paper.id}")
+                    continue
+                paper.title = data[paper.id]['title']
+                paper.abs = data[paper.id]['abs']
 
+    def compute_hash(self, document_handler: DocumentHandler, doc_path):
+        """
+        Compute the hash of the retrieved document.
+        """
         if doc_path:
             logger.info(f"Computing hash for {self.id}")
             self.hash = document_handler.compute_hash(doc_path)
         else:
             logger.info(f"Unable to compute hash for {self.id}, no file found")
-        return doc_path
-
-
 
+    def process(self, document_handler: DocumentHandler, offline=False):
+        """
+        Download the paper's PDF and compute its hash.
+        """
+        with profiling.stage("resolve"):
+            self.resolve()
+        with profiling.stage("download"):
+            doc_path = self.download(document_handler, offline=offline)
+        with profiling.stage("metadata"):
+            self.fetch_metadata()
+        with profiling.stage("hash"):
+            self.compute_hash(document_handler, doc_path)
+        return doc_path
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+from hugo_dataset import metrics
+from hugo_dataset.connections import ThreadConnections, connect_wal
+
+CHUNK_SIZE = 1 << 20
+HASH_ALGOS = ("md5", "sha256")
+
+# A file modified this close to the moment it was hashed could change again
+# without its mtime moving (coarse timestamps), so its digest is not cached.
+RACY_MTIME_NS = 2 * 10**9
+
+def new_hasher(hash_algo: str = "md5"):
+    if hash_algo not in HASH_ALGOS:
+        raise ValueError("Unsupported hash algorithm.")
+    return hashlib.new(hash_algo)
+
+def file_digest(file_path: str, hash_algo: str = "md5") -> str:
+    """
+    Read a file and return its hex digest.
+    """
+    hasher = new_hasher(hash_algo)
+    size = 0
+    with open(file_path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+            size += len(chunk)
+    metrics.get_metrics().counter("hugo_hashed_bytes_total", "Bytes read to hash documents").inc(size)
+    return hasher.hexdigest()
+
+class HashCache:
+    """
+    Persistent (SQLite) cache of file digests keyed by (device, inode, size,
+    mtime_ns, algorithm).
+
+    A cached digest is returned only while the file still has the same device,
+    inode, size and mtime. Digests of files modified within RACY_MTIME_NS of
+    being hashed are not stored unless the caller wrote the file itself (trusted).
+    Several processes may share one cache file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._connections = ThreadConnections(lambda: connect_wal(self.path, 60))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS hashes (
+                    dev INTEGER NOT NULL,
+                    ino INTEGER NOT NULL,
+                    algo TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    digest TEXT NOT NULL,
+                    path TEXT,
+                    PRIMARY KEY (dev, ino, algo)
+                )""")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def close(self):
+        self._connections.close()
+
+    def lookup(self, file_path: str, hash_algo: str = "md5", st: os.stat_result | None = None) -> str | None:
+        """
+        Return the cached digest if the file is unchanged since it was hashed.
+        """
+        st = st or os.stat(file_path)
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, digest FROM hashes WHERE dev = ? AND ino = ? AND algo = ?",
+            (st.st_dev, st.st_ino, hash_algo)).fetchone()
+        if row and row[:2] == (st.st_size, st.st_mtime_ns):
+            return row[2]
+        return None
+
+    def store(self, file_path: str, hash_algo: str, digest: str, st: os.stat_result | None = None, trusted: bool = False):
+        """
+        Remember the digest of file_path. st should be the stat taken before hashing.
+        """
+        st = st or os.stat(file_path)
+        if not trusted and time.time_ns() - st.st_mtime_ns < RACY_MTIME_NS:
+            return
+        with self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (st.st_dev, st.st_ino, hash_algo, st.st_size, st.st_mtime_ns, digest,
+                                os.path.abspath(file_path)))
+
+    def inherit(self, source: str, copy: str, hash_algo: str = "md5"):
+        """
+        Record for copy the cached digest of source, if any (copy must be a
+        byte-for-byte copy of source that the caller just made).
+        """
+        digest = self.lookup(source, hash_algo)
+        if digest is not None and os.stat(copy).st_size == os.stat(source).st_size:
+            self.store(copy, hash_algo, digest, trusted=True)
+
+    def invalidate(self, file_path: str):
+        st = os.stat(file_path)
+        with self._conn:
+            self._conn.execute("DELETE FROM hashes WHERE dev = ? AND ino = ?", (st.st_dev, st.st_ino))
+
+    def merge(self, paths: list[str]):
+        """
+        Merge other hash caches (e.g. one per shard) into this one, keeping
+        the entry of the most recently modified file where they disagree.
+        """
+        for path in paths:
+            with self._conn:
+                self._conn.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                with self._conn:
+                    self._conn.execute("""
+                        INSERT INTO hashes SELECT dev, ino, algo, size, mtime_ns, digest, path FROM other.hashes WHERE true
+                        ON CONFLICT(dev, ino, algo) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns,
+                            digest = excluded.digest, path = excluded.path
+                        WHERE excluded.mtime_ns > hashes.mtime_ns""")
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+
+    def digest(self, file_path: str, hash_algo: str = "md5", force: bool = False) -> str:
+        """
+        Return the digest of file_path, from the cache unless force is set.
+        """
+        st = os.stat(file_path)
+        if not force:
+            cached = self.lookup(file_path, hash_algo, st)
+            metrics.record_cache("hash", cached is not None)
+            if cached is not None:
+                return cached
+        digest = file_digest(file_path, hash_algo)
+        # Only keep the digest if the file did not change while it was read.
+        after = os.stat(file_path)
+        if (after.st_size, after.st_mtime_ns) == (st.st_size, st.st_mtime_ns):
+            self.store(file_path, hash_algo, digest, st)
+        return digest
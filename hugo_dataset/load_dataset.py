@@ -1,12 +1,24 @@
 import argparse
+import os
+import time
+from typing import TYPE_CHECKING
 from typing_extensions import Annotated
-from datasets import load_from_disk, load_dataset
+from hugo_dataset import metrics, profiling
 from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.manifest import RunManifest, restore
+from hugo_dataset.pipeline import HydrationPipeline
+from hugo_dataset.retrievers import cache
+from hugo_dataset.sharding import check_shard, shard_file, shard_store_file
+from hugo_dataset.table import PaperFilter, PaperTable
+from hugo_dataset.verify import failed as verification_failed, verify_documents, write_report
 from pydantic import BaseModel, ConfigDict, StringConstraints
 
 from hugo_dataset.logger import get_logger
 logger = get_logger("loader", "INFO")
 
+if TYPE_CHECKING:
+    import pyarrow as pa
+
 try:
     from rich import print
 except:
@@ -21,10 +33,32 @@ class DatasetLoader(BaseModel):
     _doc_handler : DocumentHandler | None = None
     local_dirs : list[str] = []
     sources_mapping : dict[str, str] = {}
-    papers : list[Paper] = []
+    table : PaperTable | None = None # The loaded papers; Paper objects are built from it per batch
     dataset : any = None
     move : bool = False
     store_file : str | None = None
+    store_backend : str = "sqlite"
+    hash_cache : str | None = None # Share with other loaders/managers to reuse digests
+    rehash : bool = False
+    workers : int = 1
+    source_concurrency : dict[str, int] = {}
+    metadata_cache : str | None = None # Metadata cache location (default: target_dir/.metadata.sqlite, per shard when sharding)
+    metadata_ttl : float = 30 # Days before cached metadata is revalidated
+    use_metadata_cache : bool = True
+    streaming : bool = False # Read the dataset lazily instead of loading self.table
+    batch_size : int = 1024 # Rows per Arrow record batch turned into papers at a time
+    # Pushed down to the Arrow/parquet scan: rows and columns left out are never read into papers.
+    licenses : list[str] = []
+    sources : list[str] = []
+    ids : list[str] = []
+    min_year : int | None = None
+    max_year : int | None = None
+    columns : list[str] | None = None
+    num_shards : int = 1 # Split the papers between num_shards runs by a stable hash of their id
+    shard_index : int = 0 # The shard this run processes (0 to num_shards - 1)
+    manifest : str | None = None # Run manifest location (default: target_dir/.manifest.sqlite)
+    resume : bool = False # Skip papers the manifest records as done
+    metrics_file : str | None = None # Prometheus textfile written after process_papers (default: target_dir/.metrics.prom); a JSON summary goes next to it
 
     @property
     def doc_handler(self):
@@ -33,49 +67,222 @@ class DatasetLoader(BaseModel):
                 local_dir=self.local_dirs, 
                 doc_dir=self.target_dir, 
                 move=self.move,
-                store_file=self.store_file
+                # Shards default to their own store and hash cache; merge them with hugo_dataset.sharding.
+                store_file=self.store_file or shard_store_file(self.target_dir, self.num_shards, self.shard_index),
+                store_backend=self.store_backend,
+                hash_cache=self.hash_cache or shard_file(self.target_dir, "hashes", self.num_shards, self.shard_index),
+                rehash=self.rehash
                 )
         return self._doc_handler
 
+    @property
+    def paper_filter(self) -> PaperFilter:
+        """
+        The loader's filters. Without local dirs, papers with disallowed
+        licenses would be skipped anyway, so allowed_licenses is pushed down too.
+        """
+        licenses = [license.lower() for license in self.licenses] or None
+        if not self.local_dirs and "all" not in self.allowed_licenses:
+            allowed = self.allowed_licenses
+            licenses = allowed if licenses is None else [license for license in licenses if license in allowed]
+        check_shard(self.num_shards, self.shard_index)
+        return PaperFilter(licenses=licenses, sources=self.sources, ids=self.ids,
+                           min_year=self.min_year, max_year=self.max_year, columns=self.columns,
+                           num_shards=self.num_shards, shard_index=self.shard_index)
+
+    def _remote_schema(self) -> "pa.Schema | None":
+        """
+        The Arrow schema of the remote dataset, from its builder info or else
+        the parquet metadata of its first data file. None if neither is available.
+        """
+        from datasets import load_dataset_builder
+        try:
+            builder = load_dataset_builder(self.dataset_location)
+            if builder.info.features is not None:
+                return builder.info.features.arrow_schema
+            import fsspec
+            import pyarrow.parquet as pq
+            data_files = builder.config.data_files or {}
+            splits = sorted(data_files, key=lambda split: split != "papers")
+            for split in splits:
+                for path in data_files[split]:
+                    with fsspec.open(path, "rb") as f:
+                        return pq.read_schema(f)
+        except Exception as e:
+            logger.debug(f"Could not read the schema of {self.dataset_location}: {e}")
+        return None
+
+    def _load_remote(self, paper_filter: PaperFilter):
+        from datasets import load_dataset
+        from datasets.exceptions import DatasetGenerationError
+        kwargs = {}
+        schema = self._remote_schema() if paper_filter else None
+        # Typed against the schema, so an integer year column is not compared to strings.
+        expression = paper_filter.expression(schema)
+        if expression is not None:
+            kwargs["filters"] = expression
+        if paper_filter.columns is not None:
+            names = schema.names if schema is not None else list(Paper.model_fields)
+            # The predicate is evaluated on the projected columns, so they must include what it reads.
+            keep = set(paper_filter.projection(names)) | paper_filter.predicate_columns()
+            kwargs["columns"] = [name for name in names if name in keep]
+        try:
+            return load_dataset(self.dataset_location, streaming=self.streaming, **kwargs)
+        except (TypeError, ValueError, DatasetGenerationError) as e:
+            if not kwargs:
+                raise
+            # Not a parquet dataset: load everything, rows are filtered after reading.
+            logger.info(f"Could not push filters down to {self.dataset_location} ({e}), filtering after load.")
+            return load_dataset(self.dataset_location, streaming=self.streaming)
+
     def load_dataset(self):
+        paper_filter = self.paper_filter
         # Load the Hugging Face DatasetDict from disk.
         if not self.dataset:
             if  not self.remote:
                 logger.debug("Trying to load from local directory")
+                from datasets import load_from_disk
                 self.dataset = load_from_disk(self.dataset_location)
             else:
                 logger.debug("Trying to load from remote directory")
-                self.dataset = load_dataset(self.dataset_location)
+                self.dataset = self._load_remote(paper_filter)
+
+        if self.streaming:
+            # Papers are created on demand by iter_papers.
+            return
+        # Filter and validate column-wise once; papers are built from the table by iter_papers.
+        self.table = PaperTable.from_dataset(self.dataset["papers"], paper_filter=paper_filter)
+
+    @property
+    def papers(self) -> list[Paper]:
+        """
+        Every paper of the loaded table, built on access (empty when
+        streaming). Prefer iter_papers(), which builds them a batch at a time.
+        """
+        if self.streaming or self.table is None:
+            return []
+        return list(self.table.iter_papers(self.batch_size))
 
-        self.papers = [Paper.from_metadata(paper) for paper in self.dataset["papers"]]
+    def iter_papers(self):
+        """
+        Yield the dataset's papers. When streaming, rows are read lazily (the
+        datasets streaming API for remote datasets, Arrow record batches of the
+        memory-mapped files for local ones), so memory use does not grow with
+        the size of the dataset. Otherwise papers are built from self.table
+        batch_size rows at a time.
+        """
+        if not self.streaming:
+            if self.table is None:
+                self.load_dataset()
+            yield from self.table.iter_papers(self.batch_size)
+            return
+        if self.dataset is None:
+            self.load_dataset()
+        from datasets import IterableDataset
+        papers = self.dataset["papers"]
+        paper_filter = self.paper_filter
+        if isinstance(papers, IterableDataset):
+            import pyarrow as pa
+            batches = (pa.table(batch) for batch in papers.iter(batch_size=self.batch_size))
+        else:
+            batches = papers.with_format("arrow").iter(batch_size=self.batch_size)
+        for batch in batches:
+            if paper_filter:
+                batch = paper_filter.apply(batch)
+            yield from PaperTable(batch).iter_papers()
 
     def process_papers(self):
         logger.info("\nProcessing papers:")
+        start = time.perf_counter()
+        # The registry is process-wide; the exported metrics cover this run only.
+        metrics.get_metrics().reset()
+        if self.use_metadata_cache:
+            cache.configure(self.metadata_cache
+                            or shard_file(self.doc_handler.doc_dir, "metadata", self.num_shards, self.shard_index)
+                            or os.path.join(self.doc_handler.doc_dir, ".metadata.sqlite"),
+                            ttl=self.metadata_ttl * cache.DAY)
+        with profiling.stage("index"):
+            self.doc_handler.index(additional_directories=self.local_dirs)
+
+        manifest = RunManifest(self.manifest or shard_file(self.doc_handler.doc_dir, "manifest", self.num_shards, self.shard_index)
+                               or os.path.join(self.doc_handler.doc_dir, ".manifest.sqlite"))
+        completed = manifest.completed() if self.resume else {}
+
+        def report(result):
+            manifest.record_result(result)
+            self._report(result)
+
+        pipeline = HydrationPipeline(
+            document_handler=self.doc_handler,
+            workers=self.workers,
+            source_concurrency=self.source_concurrency
+            )
+        try:
+            pipeline.run(self._jobs(manifest, completed), on_result=report, collect=False)
+            summary = manifest.summary()
+        finally:
+            manifest.close()
+            try:
+                metrics.export(self.metrics_file or shard_file(self.doc_handler.doc_dir, "metrics", self.num_shards, self.shard_index, "prom")
+                               or os.path.join(self.doc_handler.doc_dir, ".metrics.prom"), time.perf_counter() - start)
+            except Exception as e:
+                # Must not replace an exception raised by the run.
+                logger.warning(f"Failed to export metrics: {e}")
+        logger.info(f"Run manifest {manifest.path}: {summary}")
+
+    def verify(self, report_file: str | None = None, workers: int | None = None) -> dict:
+        """
+        Check the documents already on disk against the hashes in the dataset,
+        hashing them in a process pool, and write a JSON report.
+
+        Returns:
+            dict: The report (see hugo_dataset.verify.verify_documents).
+        """
         self.doc_handler.index(additional_directories=self.local_dirs)
+        # Like process_papers, documents with other licenses count when local dirs are searched.
+        allowed = None if self.local_dirs else self._allowed
+        report = verify_documents(self.iter_papers(), self.doc_handler, allowed=allowed, workers=workers)
+        report["dataset"] = self.dataset_location
+        write_report(report, report_file or os.path.join(self.doc_handler.doc_dir, "verify_report.json"))
+        logger.info(f"Verified {report['throughput']['files']} documents "
+                    f"({report['throughput']['mb_per_second'] or 0:.1f} MB/s): {report['summary']}")
+        return report
+
+    def _allowed(self, paper):
+        return "all" in self.allowed_licenses or paper.license_type in self.allowed_licenses
 
-        for paper in self.papers:
+    def _jobs(self, manifest: RunManifest | None = None, completed: dict | None = None):
+        resumed = 0
+        for paper in self.iter_papers():
+            if completed and restore(paper, completed.get(paper.id)):
+                resumed += 1
+                continue
             offline=False
-            if "all" not in self.allowed_licenses and paper.license_type not in self.allowed_licenses:
+            if not self._allowed(paper):
                 if self.local_dirs:
                     logger.info("License not found, searching local dirs only.")
                     offline = True
                 else:
                     logger.info(f"Skipping {paper.id} due to disallowed license '{paper.license_type}'.")
+                    if manifest:
+                        manifest.record(paper.id, "skipped", source=paper.source, origin="skipped",
+                                        error=f"license '{paper.license_type}' not allowed")
                     continue
+            yield paper, offline
+        if resumed:
+            logger.info(f"Resumed: {resumed} papers already done according to the manifest.")
 
-            try:
-                # Download and verify the paper.
-                pdf_path = paper.process(self.doc_handler, offline=offline)
-            except Exception as e:
-                logger.info(f"Error processing {paper.id}: {e}")
+    def _report(self, result):
+        paper = result.paper
+        if result.error:
+            logger.info(f"Error processing {paper.id}: {result.error}")
 
-            try:
-                if paper.hash == paper.hash:
-                    logger.info(f"{paper.id} verified successfully with hash {paper.hash}")
-                else:
-                    logger.info(f"Hash mismatch for {paper.id}: Expected {paper.hash}, got {paper.hash}")
-            except Exception as e:
-                logger.info(f"Error computing hash for {paper.id}: {e}")
+        if not paper.expected_hash or not paper.hash:
+            return
+        if paper.hash == paper.expected_hash:
+            logger.info(f"{paper.id} verified successfully with hash {paper.hash}")
+        else:
+            logger.info(f"Hash mismatch for {paper.id}: Expected {paper.expected_hash}, got {paper.hash}")
 
 
 def main():
@@ -129,7 +336,186 @@ def main():
         "--store_file",
         default=None,
         type=str,
-        help="A json mapping from id to filepath"
+        help="A json mapping from id to filepath (imported once into a SQLite store next to it), or a .sqlite store"
+    )
+
+    parser.add_argument(
+        "--store-backend",
+        default="sqlite",
+        choices=["sqlite", "json"],
+        help="How the id to filepath index is stored (default: sqlite)"
+    )
+
+    parser.add_argument(
+        "--hash-cache",
+        default=None,
+        type=str,
+        help="File-hash cache to use (default: TARGET_DIR/.hashes.sqlite, per shard when sharding)"
+    )
+
+    parser.add_argument(
+        "--rehash",
+        action="store_true",
+        default=False,
+        help="Re-read every document instead of trusting cached digests"
+    )
+
+    parser.add_argument(
+        "--workers",
+        default=1,
+        type=int,
+        help="Number of workers per hydration stage (default: 1, sequential)"
+    )
+
+    parser.add_argument(
+        "--source-concurrency",
+        metavar="SOURCE=N",
+        nargs="+",
+        default=[],
+        type=str,
+        help="Maximum concurrent downloads for a source (e.g. materialsproject=2)"
+    )
+    parser.add_argument(
+        "--metadata-cache",
+        default=None,
+        type=str,
+        help="Where to cache retrieved metadata (default: TARGET_DIR/.metadata.sqlite, per shard when sharding)"
+    )
+
+    parser.add_argument(
+        "--metadata-ttl",
+        default=30,
+        type=float,
+        help="Days before cached metadata is revalidated (default: 30)"
+    )
+
+    parser.add_argument(
+        "--no-metadata-cache",
+        action="store_true",
+        default=False,
+        help="Always fetch metadata from the remote sources"
+    )
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        default=False,
+        help="Check documents already on disk against the dataset's hashes instead of hydrating"
+    )
+
+    parser.add_argument(
+        "--verify-report",
+        default=None,
+        type=str,
+        help="Where to write the verification report (default: TARGET_DIR/verify_report.json)"
+    )
+
+    parser.add_argument(
+        "--verify-workers",
+        default=None,
+        type=int,
+        help="Number of hashing processes for --verify (default: one per CPU)"
+    )
+    parser.add_argument(
+        "--allow-missing",
+        action="store_true",
+        default=False,
+        help="With --verify, exit successfully when documents are missing (mismatches still fail)"
+    )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        default=False,
+        help="Read papers lazily instead of loading the whole dataset into memory first"
+    )
+    parser.add_argument(
+        "--license",
+        dest="licenses",
+        nargs="+",
+        default=[],
+        help="Only load papers with these licenses"
+    )
+
+    parser.add_argument(
+        "--source",
+        dest="sources",
+        nargs="+",
+        default=[],
+        help="Only load papers from these sources (e.g. arxiv acl)"
+    )
+
+    parser.add_argument(
+        "--years",
+        metavar="FROM-TO",
+        default=None,
+        type=str,
+        help="Only load papers published in this range (e.g. 2018-2022, 2018- or -2015)"
+    )
+
+    parser.add_argument(
+        "--ids",
+        nargs="+",
+        default=[],
+        help="Only load these paper ids (or @FILE with one id per line)"
+    )
+
+    parser.add_argument(
+        "--columns",
+        nargs="+",
+        default=None,
+        help="Only read these columns (id, url, source and license_type are always read)"
+    )
+    parser.add_argument(
+        "--num-shards",
+        default=1,
+        type=int,
+        help="Split the papers between this many runs (e.g. one per node)"
+    )
+
+    parser.add_argument(
+        "--shard-index",
+        default=0,
+        type=int,
+        help="The shard processed by this run, from 0 to NUM_SHARDS - 1"
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        type=str,
+        help="Where to record the outcome of every paper (default: TARGET_DIR/.manifest.sqlite)"
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Skip papers the manifest records as done; retry failed and unprocessed ones"
+    )
+    parser.add_argument(
+        "--metrics-file",
+        default=None,
+        type=str,
+        help="Prometheus textfile of the run's metrics, with a JSON summary next to it (default: TARGET_DIR/.metrics.prom)"
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="all",
+        default=None,
+        metavar="STAGES",
+        help=f"Sample the stacks of the given stages (comma-separated, from {','.join(profiling.STAGES)}; default: all) "
+             "and write collapsed stacks, a speedscope file and a hotspot table to --profile-dir"
+    )
+    parser.add_argument(
+        "--profile-dir",
+        default="profile",
+        type=str,
+        help="Where --profile writes its output (default: profile)"
+    )
+    parser.add_argument(
+        "--profile-interval",
+        default=0.005,
+        type=float,
+        help="Seconds between --profile samples (default: 0.005)"
     )
     args = parser.parse_args()
     allowed_licenses = [e.lower() for e in args.allowed_licenses]
@@ -141,6 +527,15 @@ def main():
     target_dir = args.target_dir
     move = args.move
     store_file = args.store_file
+    source_concurrency = {k.lower(): int(v) for k, v in (e.rsplit("=", 1) for e in args.source_concurrency)}
+    min_year, max_year = (int(y) if y else None for y in (args.years or "-").split("-", 1))
+    ids = []
+    for id in args.ids:
+        if id.startswith("@"):
+            with open(id[1:]) as inp:
+                ids.extend(line.strip() for line in inp if line.strip())
+        else:
+            ids.append(id)
 
     # Initialize and load DatasetLoader
     dataset_loader = DatasetLoader(dataset_location=dataset_location,
@@ -149,14 +544,44 @@ def main():
                                    local_dirs=local_dirs, 
                                    remote=remote,
                                    move=move,
-                                   store_file=store_file
+                                   store_file=store_file,
+                                   store_backend=args.store_backend,
+                                   hash_cache=args.hash_cache,
+                                   rehash=args.rehash,
+                                   workers=args.workers,
+                                   source_concurrency=source_concurrency,
+                                   metadata_cache=args.metadata_cache,
+                                   metadata_ttl=args.metadata_ttl,
+                                   use_metadata_cache=not args.no_metadata_cache,
+                                   streaming=args.streaming,
+                                   licenses=args.licenses,
+                                   sources=args.sources,
+                                   ids=ids,
+                                   min_year=min_year,
+                                   max_year=max_year,
+                                   columns=args.columns,
+                                   num_shards=args.num_shards,
+                                   shard_index=args.shard_index,
+                                   manifest=args.manifest,
+                                   resume=args.resume,
+                                   metrics_file=args.metrics_file
                                    )
     dataset_loader.load_dataset()
 
+    if args.verify:
+        report = dataset_loader.verify(report_file=args.verify_report, workers=args.verify_workers)
+        print(report["summary"])
+        raise SystemExit(1 if verification_failed(report["summary"], args.allow_missing) else 0)
+
     # Process papers with allowed licenses
-    dataset_loader.process_papers()
+    with profiling.profile(args.profile_dir if args.profile else None, profiling.parse_stages(args.profile),
+                           args.profile_interval) as profiler:
+        dataset_loader.process_papers()
+    if profiler is not None:
+        print(profiler.hotspots())
     print(dataset_loader.dataset)
-    print(dataset_loader.papers)
+    if dataset_loader.table is not None:
+        print(f"{len(dataset_loader.table)} papers")
 
 
 if __name__ == "__main__":
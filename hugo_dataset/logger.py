@@ -1,5 +1,18 @@
 import logging
 
+_rich_handler_class = None # RichHandler once imported, False if rich is not installed
+
+def _rich_handler():
+    # Imported once: every module calls get_logger at import time.
+    global _rich_handler_class
+    if _rich_handler_class is None:
+        try:
+            from rich.logging import RichHandler
+            _rich_handler_class = RichHandler
+        except ImportError:
+            _rich_handler_class = False
+    return _rich_handler_class
+
 def get_logger(name: str, log_level: str = 'DEBUG') -> logging.Logger:
     """
     Configures and returns a logger instance.
@@ -14,15 +27,14 @@ def get_logger(name: str, log_level: str = 'DEBUG') -> logging.Logger:
     # Set the logging level
     logger.setLevel(log_level)  # Options: DEBUG, INFO, WARNING, ERROR, CRITICAL
 
-    try:
+    handler_class = _rich_handler()
+    # Calling get_logger again for the same name must not add a second handler.
+    if handler_class and not any(isinstance(handler, handler_class) for handler in logger.handlers):
         # Add RichHandler for beautifully formatted output
-        from rich.logging import RichHandler
-        rich_handler = RichHandler(rich_tracebacks=True)  # Enable rich tracebacks
+        rich_handler = handler_class(rich_tracebacks=True)  # Enable rich tracebacks
         logger.addHandler(rich_handler)
 
         # Optional: Customize format
         formatter = logging.Formatter("%(message)s")
         rich_handler.setFormatter(formatter)
-    except:
-        pass
     return logger
@@ -0,0 +1,156 @@
+import os
+import sqlite3
+import threading
+import time
+
+from hugo_dataset.connections import ThreadConnections, connect_wal
+from hugo_dataset.logger import get_logger
+logger = get_logger("manifest")
+
+STATUSES = ("done", "failed", "skipped")
+STAGES = ("resolve", "download", "metadata", "hash")
+
+COLUMNS = ("id", "source", "status", "origin", "path", "size", "hash", "error",
+           *(f"{stage}_seconds" for stage in STAGES), "updated")
+
+class RunManifest:
+    """
+    Per-paper record of a processing run, kept in SQLite (WAL mode).
+
+    Results are buffered and written in batches (every batch_size records or
+    interval seconds) in one transaction, so a crashed or killed run loses at
+    most one batch. Rows are keyed by paper id; the latest outcome wins.
+    """
+    def __init__(self, path: str, batch_size: int = 256, interval: float = 5.0, timeout: float = 60):
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self._pending = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._connections = ThreadConnections(lambda: connect_wal(self.path, self.timeout))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn:
+            self._conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS papers (
+                    id TEXT PRIMARY KEY,
+                    source TEXT,
+                    status TEXT NOT NULL,
+                    origin TEXT,
+                    path TEXT,
+                    size INTEGER,
+                    hash TEXT,
+                    error TEXT,
+                    {", ".join(f"{stage}_seconds REAL" for stage in STAGES)},
+                    updated REAL NOT NULL
+                )""")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def record(self, id: str, status: str, source: str | None = None, origin: str | None = None,
+               path: str | None = None, hash: str | None = None, error: str | None = None,
+               timings: dict[str, float] | None = None):
+        """
+        Queue the outcome of one paper; written with the next batch.
+        """
+        if status not in STATUSES:
+            raise ValueError(f"Unknown status {status}.")
+        size = None
+        if path:
+            try:
+                size = os.stat(path).st_size
+            except OSError:
+                pass
+        timings = timings or {}
+        row = (id, source, status, origin, path, size, hash, error,
+               *(timings.get(stage) for stage in STAGES), time.time())
+        with self._lock:
+            self._pending.append(row)
+            due = len(self._pending) >= self.batch_size or time.monotonic() - self._flushed >= self.interval
+        if due:
+            self.flush()
+
+    def record_result(self, result):
+        """
+        Record a HydrationResult (see hugo_dataset.pipeline).
+        """
+        paper = result.paper
+        error = None
+        if result.error is not None:
+            error = f"{type(result.error).__name__}: {result.error}"
+        elif not result.path:
+            error = "No document found"
+        self.record(paper.id, "failed" if error else "done", source=paper.source, origin=result.origin,
+                    path=result.path, hash=paper.hash, error=error, timings=result.timings)
+
+    def flush(self):
+        with self._lock:
+            rows, self._pending = self._pending, []
+            self._flushed = time.monotonic()
+        if not rows:
+            return
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO papers VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+    def completed(self) -> dict[str, tuple[str, int | None, str | None]]:
+        """
+        Papers that finished successfully: id -> (path, size, hash).
+        """
+        return {id: (path, size, hash) for id, path, size, hash in self._conn.execute(
+            "SELECT id, path, size, hash FROM papers WHERE status = 'done'")}
+
+    def summary(self) -> dict[str, int]:
+        self.flush()
+        counts = {status: 0 for status in STATUSES}
+        counts.update(self._conn.execute("SELECT status, COUNT(*) FROM papers GROUP BY status").fetchall())
+        return counts
+
+    def failures(self) -> list[tuple[str, str]]:
+        return self._conn.execute("SELECT id, error FROM papers WHERE status = 'failed'").fetchall()
+
+    def merge(self, paths: list[str]):
+        """
+        Merge other manifests (e.g. one per shard) into this one. A successful
+        record is never replaced by an unsuccessful one.
+        """
+        self.flush()
+        updates = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS[1:])
+        for path in paths:
+            with self._conn:
+                self._conn.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                with self._conn:
+                    self._conn.execute(f"""
+                        INSERT INTO papers SELECT {", ".join(COLUMNS)} FROM other.papers WHERE true
+                        ON CONFLICT(id) DO UPDATE SET {updates}
+                        WHERE papers.status != 'done' OR excluded.status = 'done'""")
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+            logger.info(f"Merged {path}")
+
+    def close(self):
+        self.flush()
+        self._connections.close()
+
+def restore(paper, record: tuple[str, int | None, str | None] | None) -> bool:
+    """
+    Restore paper's hash from a completed() record if the recorded file still
+    exists with the recorded size.
+
+    Returns:
+        bool: Whether the paper can be skipped.
+    """
+    if not record or not record[0]:
+        return False
+    path, size, hash = record
+    try:
+        if size is not None and os.stat(path).st_size != size:
+            return False
+    except OSError:
+        return False
+    paper.hash = hash
+    return True
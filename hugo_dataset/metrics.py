@@ -0,0 +1,251 @@
+import bisect
+import json
+import os
+import sys
+import threading
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("metrics")
+
+# Seconds; covers cache lookups up to slow downloads.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def _lines(self):
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{_labels(key)} {value}"
+
+    def prometheus(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._lines()])
+
+    def summary(self) -> list[dict]:
+        return [dict(labels=dict(key), value=value) for key, value in sorted(self._values.items())]
+
+class Counter(_Metric):
+    """
+    A value that only goes up (papers processed, bytes downloaded).
+    """
+    kind = "counter"
+
+    def inc(self, value: float = 1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+class Gauge(_Metric):
+    """
+    A value that can go up and down (peak RSS, run duration).
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def set_max(self, value: float, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = max(value, self._values.get(key, value))
+
+    def value(self, **labels) -> float | None:
+        return self._values.get(_key(labels))
+
+class Histogram(_Metric):
+    """
+    Observations (e.g. latencies) counted in cumulative buckets, with their sum.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = _key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def quantile(self, q: float, **labels) -> float | None:
+        """
+        Estimate the q-quantile (0-1) by interpolating within its bucket.
+        """
+        entry = self._values.get(_key(labels))
+        return self._quantile(entry, q) if entry else None
+
+    def _quantile(self, entry, q):
+        counts, _, count = entry
+        rank = q * count
+        seen = 0
+        for i, n in enumerate(counts):
+            if n and seen + n >= rank:
+                low = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    # Past the last bucket: all we know is that it is larger.
+                    return low
+                return low + (self.buckets[i] - low) * (rank - seen) / n
+            seen += n
+        return 0.0
+
+    def _lines(self):
+        for key, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield f"{self.name}_bucket{_labels(key, (('le', repr(float(bound))),))} {cumulative}"
+            yield f"{self.name}_bucket{_labels(key, (('le', '+Inf'),))} {count}"
+            yield f"{self.name}_sum{_labels(key)} {total}"
+            yield f"{self.name}_count{_labels(key)} {count}"
+
+    def summary(self) -> list[dict]:
+        return [dict(labels=dict(key), count=entry[2], sum=entry[1], mean=entry[1] / entry[2],
+                     p50=self._quantile(entry, 0.5), p90=self._quantile(entry, 0.9), p99=self._quantile(entry, 0.99))
+                for key, entry in sorted(self._values.items())]
+
+class Metrics:
+    """
+    A registry of counters, gauges and histograms, exported as a Prometheus
+    textfile (for node_exporter's textfile collector) or a JSON summary.
+    Metrics are created on first use; recording is thread-safe.
+    """
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is a {metric.kind}, not a {cls.kind}.")
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def prometheus(self) -> str:
+        return "\n".join(metric.prometheus() for _, metric in sorted(self._metrics.items())) + "\n"
+
+    def summary(self) -> dict:
+        return {name: dict(type=metric.kind, help=metric.help, values=metric.summary())
+                for name, metric in sorted(self._metrics.items())}
+
+    def write_textfile(self, path: str):
+        # Written to a temporary file and renamed, so a collector never reads a partial file.
+        _write(path, self.prometheus())
+
+    def write_json(self, path: str):
+        _write(path, json.dumps(self.summary(), indent=2))
+
+def _write(path: str, text: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+_metrics = Metrics()
+
+def get_metrics() -> Metrics:
+    """
+    The process-wide registry the pipeline, retrievers and caches record into.
+    """
+    return _metrics
+
+def peak_rss_bytes() -> int | None:
+    """
+    The peak resident set size of this process, or None where unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+def record_cache(cache: str, hit: bool):
+    _metrics.counter("hugo_cache_requests_total", "Cache lookups by cache and result").inc(
+        cache=cache, result="hit" if hit else "miss")
+
+def record_result(result):
+    """
+    Record a HydrationResult (see hugo_dataset.pipeline): the stages it went
+    through, their duration per source, and its outcome.
+    """
+    source = result.paper.source
+    stages = _metrics.counter("hugo_stage_papers_total", "Papers that went through each hydration stage")
+    seconds = _metrics.histogram("hugo_stage_seconds", "Seconds per paper in each hydration stage")
+    for stage, duration in result.timings.items():
+        stages.inc(stage=stage, source=source)
+        seconds.observe(duration, stage=stage, source=source)
+    if result.error is not None:
+        status = "failed"
+        _metrics.counter("hugo_errors_total", "Failed papers by error class").inc(
+            error=type(result.error).__name__, source=source)
+    elif not result.path:
+        status = "missing"
+    else:
+        status = result.origin or "done"
+    _metrics.counter("hugo_papers_total", "Papers hydrated, by outcome (local, remote, missing or failed)").inc(
+        status=status, source=source)
+
+def export(path: str, run_seconds: float | None = None):
+    """
+    Write the metrics as a Prometheus textfile at path and a JSON summary
+    next to it (path with a .json extension), after updating the peak RSS
+    and, if given, the run duration.
+    """
+    rss = peak_rss_bytes()
+    if rss is not None:
+        _metrics.gauge("hugo_peak_rss_bytes", "Peak resident set size of the process").set_max(rss)
+    if run_seconds is not None:
+        _metrics.gauge("hugo_run_seconds", "Duration of the last processing run").set(run_seconds)
+    _metrics.write_textfile(path)
+    _metrics.write_json(f"{os.path.splitext(path)[0]}.json")
+    logger.info(f"Wrote metrics to {path}")
@@ -0,0 +1,293 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+
+from pydantic import BaseModel, ConfigDict
+
+from hugo_dataset import metrics, profiling
+from hugo_dataset.evidence import DocumentHandler, Paper
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("pipeline")
+
+# Sentinel telling a stage worker to shut down.
+_DONE = object()
+
+@contextmanager
+def _timed(timings: dict, stage: str):
+    start = time.perf_counter()
+    try:
+        with profiling.stage(stage):
+            yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+class HydrationResult(BaseModel):
+    """
+    The outcome of hydrating a single paper.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    paper : Paper
+    path : str | None = None
+    error : Exception | None = None
+    timings : dict[str, float] = {} # Seconds spent in each stage (metadata: the paper's share of its batch)
+
+    @property
+    def origin(self):
+        return self.paper.origin if self.path else None
+
+class HydrationPipeline(BaseModel):
+    """
+    Hydrate papers in pipelined stages: resolve -> download -> metadata -> hash.
+
+    With workers <= 1 papers run through the stages inline, metadata_batch_size
+    papers at a time, so that metadata is fetched with one batched request per
+    source (see Paper.fetch_metadata_many). Otherwise each stage runs in its own
+    thread pool connected by bounded queues. Downloads get a queue and pool per source, capped by
+    source_concurrency, so a slow source cannot occupy every download worker. Dispatching to
+    the download queues never blocks on one source; max_in_flight bounds the papers held at once.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    document_handler : DocumentHandler
+    workers : int = 1
+    queue_size : int = 64 # Maximum number of papers waiting in front of the metadata and hash stages.
+    max_in_flight : int = 1024 # Maximum number of papers dispatched but not yet finished
+    source_concurrency : dict[str, int] = {} # Download workers per source (default: workers)
+    metadata_batch_size : int = 100 # Maximum papers per batched metadata request
+
+    def run(self, jobs: Iterable, on_result: Callable[[HydrationResult], None] | None = None,
+            collect: bool = True) -> list[HydrationResult]:
+        """
+        Hydrate every job and return the results in completion order.
+
+        Args:
+            jobs: Papers, or (paper, offline) tuples. May be a lazy iterator;
+                at most a few queues' worth of papers are held at once.
+            on_result: Optional callback invoked (serially) as each paper finishes.
+            collect: Keep the results. Pass False to stream a large dataset in
+                constant memory and consume results through on_result only.
+
+        Returns:
+            list[HydrationResult]: One result per job (empty if collect is False).
+        """
+        if self.workers <= 1:
+            return self._run_inline(jobs, on_result, collect)
+        return self._run_staged(jobs, on_result, collect)
+
+    @staticmethod
+    def _unpack(job):
+        if isinstance(job, tuple):
+            return job
+        return job, False
+
+    def _run_inline(self, jobs, on_result, collect):
+        results = []
+        batch = []
+
+        def flush():
+            downloaded = []
+            for paper, offline in batch:
+                result = HydrationResult(paper=paper)
+                try:
+                    with _timed(result.timings, "resolve"):
+                        paper.resolve()
+                    with _timed(result.timings, "download"):
+                        result.path = paper.download(self.document_handler, offline=offline)
+                    downloaded.append(result)
+                except Exception as e:
+                    result.error = e
+                    self._emit(results, result, on_result, collect)
+            start = time.perf_counter()
+            with profiling.stage("metadata"):
+                Paper.fetch_metadata_many([r.paper for r in downloaded])
+            share = (time.perf_counter() - start) / max(1, len(downloaded))
+            for result in downloaded:
+                result.timings["metadata"] = share
+                try:
+                    with _timed(result.timings, "hash"):
+                        result.paper.compute_hash(self.document_handler, result.path)
+                except Exception as e:
+                    result.error = e
+                self._emit(results, result, on_result, collect)
+            batch.clear()
+
+        for job in jobs:
+            batch.append(self._unpack(job))
+            if len(batch) >= self.metadata_batch_size:
+                flush()
+        flush()
+        return results
+
+    @staticmethod
+    def _emit(results, result, on_result, collect=True):
+        metrics.record_result(result)
+        if collect:
+            results.append(result)
+        if on_result:
+            on_result(result)
+
+    def _run_staged(self, jobs, on_result, collect):
+        results = []
+        lock = threading.Lock()
+        in_flight = threading.BoundedSemaphore(max(1, self.max_in_flight))
+        metadata_queue = queue.Queue(maxsize=self.queue_size)
+        hash_queue = queue.Queue(maxsize=self.queue_size)
+        # Unbounded, so a backed-up source never stops dispatch to the others.
+        download_queues = {}
+        download_threads = {}
+        running = {"download": 0, "metadata": self.workers}
+        errors = [] # Exceptions that stopped a worker; the run is abandoned and the first re-raised
+        failed = threading.Event()
+
+        def emit(result):
+            with lock:
+                try:
+                    self._emit(results, result, on_result, collect)
+                except Exception as e:
+                    logger.debug(f"on_result failed for {result.paper.id}: {e}")
+            in_flight.release()
+
+        def finished(stage, downstream, n):
+            # The last worker of a stage to exit, normally or not, shuts down the next stage.
+            with lock:
+                running[stage] -= 1
+                last = running[stage] == 0
+            if last:
+                for _ in range(n):
+                    put(downstream, _DONE)
+
+        # Once a worker has failed, the others stop: get returns _DONE and put gives up,
+        # so no worker waits on a stage that is gone.
+        def get(q):
+            while not failed.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return _DONE
+
+        def put(q, item):
+            while not failed.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return
+                except queue.Full:
+                    pass
+
+        def download_worker(q):
+            try:
+                while (job := get(q)) is not _DONE:
+                    paper, offline, timings = job
+                    try:
+                        with _timed(timings, "download"):
+                            path = paper.download(self.document_handler, offline=offline)
+                    except Exception as e:
+                        emit(HydrationResult(paper=paper, error=e, timings=timings))
+                        continue
+                    put(metadata_queue, (paper, path, timings))
+            finally:
+                finished("download", metadata_queue, self.workers)
+
+        def metadata_worker():
+            try:
+                done = False
+                while not done:
+                    item = get(metadata_queue)
+                    if item is _DONE:
+                        break
+                    # Batch up whatever else is already waiting, without blocking.
+                    batch = [item]
+                    while len(batch) < self.metadata_batch_size:
+                        try:
+                            item = metadata_queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if item is _DONE:
+                            done = True
+                            break
+                        batch.append(item)
+                    start = time.perf_counter()
+                    try:
+                        with profiling.stage("metadata"):
+                            Paper.fetch_metadata_many([paper for paper, _, _ in batch])
+                    except Exception as e:
+                        logger.debug(f"Failed to retrieve metadata for {len(batch)} papers: {e}")
+                    share = (time.perf_counter() - start) / len(batch)
+                    for item in batch:
+                        item[2]["metadata"] = share
+                        put(hash_queue, item)
+            finally:
+                finished("metadata", hash_queue, self.workers)
+
+        def hash_worker():
+            while (item := get(hash_queue)) is not _DONE:
+                paper, path, timings = item
+                result = HydrationResult(paper=paper, path=path, timings=timings)
+                try:
+                    with _timed(result.timings, "hash"):
+                        paper.compute_hash(self.document_handler, path)
+                except Exception as e:
+                    result.error = e
+                emit(result)
+
+        def guarded(target, *args):
+            try:
+                target(*args)
+            except BaseException as e:
+                logger.error(f"{threading.current_thread().name} stopped: {e!r}")
+                errors.append(e)
+                failed.set()
+
+        def start(target, n, name, *args):
+            threads = [threading.Thread(target=guarded, args=(target, *args), name=f"{name}-{i}", daemon=True) for i in range(n)]
+            for t in threads:
+                t.start()
+            return threads
+
+        def download_queue(source):
+            if source not in download_queues:
+                n = max(1, min(self.workers, self.source_concurrency.get(source, self.workers)))
+                download_queues[source] = queue.Queue()
+                with lock:
+                    running["download"] += n
+                download_threads[source] = start(download_worker, n, f"download-{source}", download_queues[source])
+            return download_queues[source]
+
+        metadata_threads = start(metadata_worker, self.workers, "metadata")
+        hash_threads = start(hash_worker, self.workers, "hash")
+
+        # The calling thread acts as the resolve stage and dispatcher.
+        try:
+            for job in jobs:
+                paper, offline = self._unpack(job)
+                timings = {}
+                while not in_flight.acquire(timeout=0.1):
+                    if failed.is_set():
+                        break
+                if failed.is_set():
+                    break
+                try:
+                    with _timed(timings, "resolve"):
+                        paper.resolve()
+                except Exception as e:
+                    emit(HydrationResult(paper=paper, error=e, timings=timings))
+                    continue
+                download_queue(paper.source).put((paper, offline, timings))
+        finally:
+            if not download_queues:
+                # No download workers to shut down the later stages.
+                with lock:
+                    running["download"] += 1
+                finished("download", metadata_queue, self.workers)
+            for source, q in download_queues.items():
+                for _ in download_threads[source]:
+                    q.put(_DONE)
+            for t in [*(t for threads in download_threads.values() for t in threads), *metadata_threads, *hash_threads]:
+                t.join()
+        if errors:
+            raise RuntimeError("A hydration worker stopped unexpectedly; the run is incomplete.") from errors[0]
+        return results
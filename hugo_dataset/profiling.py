@@ -0,0 +1,217 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("profiling")
+
+STAGES = ("index", "resolve", "download", "metadata", "hash", "save")
+
+_NULL = nullcontext()
+
+class Profiler:
+    """
+    Wall-clock sampling profiler for the processing stages.
+
+    A background thread reads the stacks of every thread (sys._current_frames)
+    each `interval` seconds and counts those of threads inside an enabled
+    stage (see stage()), so time spent blocked on the network or disk shows
+    up as well as CPU time. Samples are kept per stage as collapsed stacks.
+    """
+    def __init__(self, stages: list[str] | None = None, interval: float = 0.005, max_depth: int = 128):
+        self.stages = set(stages or STAGES)
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = {} # stage -> {stack (root first): count}
+        self._active = {} # thread id -> stack of stage names
+        self._names = {} # code object -> frame name
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self._started
+        return self
+
+    @contextmanager
+    def _stage(self, name: str):
+        tid = threading.get_ident()
+        stack = self._active.setdefault(tid, [])
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+            if not stack:
+                self._active.pop(tid, None)
+
+    def stage(self, name: str):
+        if name not in self.stages:
+            return _NULL
+        return self._stage(name)
+
+    def _frame_name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            name = self._names[code] = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        return name
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for tid, stages in list(self._active.items()):
+                frame = frames.get(tid)
+                try:
+                    # The thread may leave its stage while we look.
+                    current = stages[-1]
+                except IndexError:
+                    continue
+                if tid == me or frame is None:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    stack.append(self._frame_name(frame.f_code))
+                    frame = frame.f_back
+                counts = self.samples.setdefault(current, {})
+                key = tuple(reversed(stack))
+                counts[key] = counts.get(key, 0) + 1
+
+    def collapsed(self, stage: str) -> str:
+        """
+        The stage's samples in collapsed-stack format (flamegraph.pl, speedscope, inferno).
+        """
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.samples.get(stage, {}).items()))
+
+    def speedscope(self) -> dict:
+        """
+        All stages as one speedscope file, one sampled profile per stage.
+        """
+        frames = []
+        index = {}
+        profiles = []
+        for stage, counts in sorted(self.samples.items()):
+            samples, weights = [], []
+            for stack, count in counts.items():
+                ids = []
+                for name in stack:
+                    if name not in index:
+                        index[name] = len(frames)
+                        frames.append(dict(name=name))
+                    ids.append(index[name])
+                samples.append(ids)
+                weights.append(count * self.interval)
+            profiles.append(dict(type="sampled", name=stage, unit="seconds", startValue=0,
+                                 endValue=sum(weights), samples=samples, weights=weights))
+        return {"$schema": "https://www.speedscope.app/file-format-schema.json", "name": "hugo_dataset",
+                "exporter": "hugo_dataset.profiling", "shared": dict(frames=frames), "profiles": profiles}
+
+    def hotspots(self, top: int = 20) -> str:
+        """
+        A table of the functions with the most samples per stage: self (on top
+        of the stack) and total (anywhere in it), in seconds of wall-clock time.
+        """
+        lines = []
+        for stage, counts in sorted(self.samples.items()):
+            total_samples = sum(counts.values())
+            own, cumulative = {}, {}
+            for stack, count in counts.items():
+                own[stack[-1]] = own.get(stack[-1], 0) + count
+                for name in set(stack):
+                    cumulative[name] = cumulative.get(name, 0) + count
+            lines.append(f"\n{stage}: {total_samples} samples ({total_samples * self.interval:.2f}s)")
+            lines.append(f"{'self s':>8} {'self %':>7} {'total s':>8}  function")
+            for name, count in sorted(own.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"{count * self.interval:>8.2f} {100 * count / total_samples:>6.1f}% "
+                             f"{cumulative[name] * self.interval:>8.2f}  {name}")
+        return "\n".join(lines).lstrip("\n") + "\n"
+
+    def write(self, out_dir: str, top: int = 20) -> str:
+        """
+        Write <stage>.collapsed, profile.speedscope.json and hotspots.txt to out_dir.
+
+        Returns:
+            str: The hotspot table.
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        for stage in self.samples:
+            with open(os.path.join(out_dir, f"{stage}.collapsed"), "w") as f:
+                f.write(self.collapsed(stage))
+        with open(os.path.join(out_dir, "profile.speedscope.json"), "w") as f:
+            json.dump(self.speedscope(), f)
+        table = self.hotspots(top)
+        with open(os.path.join(out_dir, "hotspots.txt"), "w") as f:
+            f.write(table)
+        logger.info(f"Wrote profiles of {', '.join(sorted(self.samples)) or 'no stages'} to {out_dir}")
+        return table
+
+_profiler : Profiler | None = None
+
+def stage(name: str):
+    """
+    Context manager marking the current thread as working on stage `name`.
+    A shared no-op context when profiling is off.
+    """
+    if _profiler is None:
+        return _NULL
+    return _profiler.stage(name)
+
+def enable(stages: list[str] | None = None, interval: float = 0.005) -> Profiler:
+    """
+    Start profiling the given stages (default: all of STAGES).
+    """
+    global _profiler
+    disable()
+    unknown = set(stages or ()) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown stages {', '.join(sorted(unknown))}; expected some of {', '.join(STAGES)}.")
+    _profiler = Profiler(stages, interval).start()
+    return _profiler
+
+def disable() -> Profiler | None:
+    """
+    Stop profiling and return the profiler with its samples (None if it was off).
+    """
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler.stop() if profiler is not None else None
+
+@contextmanager
+def profile(out_dir: str | None, stages: list[str] | None = None, interval: float = 0.005, top: int = 20):
+    """
+    Profile the enclosed code and write the results to out_dir.
+    Does nothing (and yields None) if out_dir is None. Nothing is printed:
+    the hotspot table is in out_dir/hotspots.txt, or call hotspots() on the
+    yielded profiler afterwards.
+    """
+    if out_dir is None:
+        yield None
+        return
+    profiler = enable(stages, interval)
+    try:
+        yield profiler
+    finally:
+        disable()
+        profiler.write(out_dir, top)
+
+def parse_stages(value: str | None) -> list[str] | None:
+    """
+    Parse a --profile value: "all" (or empty) or a comma-separated list of stages.
+    """
+    if not value or value == "all":
+        return None
+    return [stage.strip() for stage in value.split(",") if stage.strip()]
@@ -1,27 +1,96 @@
-from .acl import acl
-from .arxiv import arxiv
-from .wikipedia import wikipedia
-from .mp import mp
-from .elsevier import elsevier
-from .springer import springer
-from .aps import aps
-from .sciencedirect import sciencedirect
+import importlib
+import threading
+from collections.abc import MutableMapping
+
+from . import cache
 
 from hugo_dataset.logger import get_logger
 logger = get_logger(__name__+".retrievers")
 
-# Build the initial GETTERS dictionary from all included retrievers
-GETTERS = {
-    acl.source: acl,
-    arxiv.source: arxiv,
-    wikipedia.source: wikipedia,
-    mp.source: mp,
-    elsevier.source : elsevier,
-    springer.source : springer,
-    aps.source: aps,
-    sciencedirect.source: sciencedirect,
+# The included retrievers: source -> module defining the class of the same name.
+# They are imported the first time their source is looked up in GETTERS or
+# retrievers.<name> is accessed, which is then the class. A retriever module
+# imported directly (import hugo_dataset.retrievers.mp) is bound on the package
+# as the module until its source is first looked up.
+RETRIEVERS = {
+    "acl anthology": "acl",
+    "arxiv": "arxiv",
+    "wikipedia": "wikipedia",
+    "materialsproject": "mp",
+    "elsevier": "elsevier",
+    "springer": "springer",
+    "aps": "aps",
+    "sciencedirect": "sciencedirect",
 }
 
+_SUBMODULES = ("base", "cache", "local_index", "policy", "router", "transport")
+
+class _Getters(MutableMapping):
+    """
+    source -> retriever class. The included retrievers are imported on first
+    lookup, so importing the package does not import every retriever and its
+    dependencies. `version` changes whenever a retriever is (re)registered.
+    """
+    def __init__(self, modules: dict[str, str]):
+        self._modules = dict(modules)
+        self._classes = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def __getitem__(self, source):
+        cls = self._classes.get(source)
+        if cls is not None:
+            return cls
+        if source not in self._modules:
+            raise KeyError(source)
+        with self._lock:
+            cls = self._classes.get(source)
+            if cls is None:
+                name = self._modules[source]
+                cls = getattr(importlib.import_module(f"{__name__}.{name}"), name)
+                self._classes[source] = cls
+                # Importing the module bound it on the package; retrievers.<name> is the class.
+                globals()[name] = cls
+        return cls
+
+    def __setitem__(self, source, cls):
+        with self._lock:
+            self._classes[source] = cls
+            self._modules.pop(source, None)
+            self.version += 1
+
+    def __delitem__(self, source):
+        with self._lock:
+            if source not in self:
+                raise KeyError(source)
+            self._classes.pop(source, None)
+            self._modules.pop(source, None)
+            self.version += 1
+
+    def __iter__(self):
+        return iter(dict.fromkeys([*self._modules, *self._classes]))
+
+    def __len__(self):
+        return len(self._modules.keys() | self._classes.keys())
+
+    def __contains__(self, source):
+        return source in self._classes or source in self._modules
+
+GETTERS = _Getters(RETRIEVERS)
+
+def __getattr__(name):
+    # retrievers.arxiv is the arxiv class, retrievers.policy the policy module,
+    # both imported on first access (PEP 562).
+    for source, module in RETRIEVERS.items():
+        if module == name:
+            return GETTERS[source]
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def __dir__():
+    return sorted({*globals(), *RETRIEVERS.values(), *_SUBMODULES})
+
 def register_retriever(retriever_cls):
     """
     Register a new retriever class.
@@ -39,6 +108,21 @@ def register_retriever(retriever_cls):
         raise AttributeError("The retriever class must have a 'source' attribute.")
     GETTERS[retriever_cls.source] = retriever_cls
 
+_router = None
+_router_version = None
+
+def get_router():
+    """
+    The UrlRouter of the registered retrievers, rebuilt when GETTERS changes.
+    """
+    global _router, _router_version
+    if _router is None or GETTERS.version != _router_version:
+        from .router import UrlRouter
+        # Routing needs every retriever's hosts, so this imports them all.
+        _router = UrlRouter(GETTERS.values())
+        _router_version = GETTERS.version
+    return _router
+
 def get(source, id, **kwargs):
     """
     Retrieve metadata using the retriever associated with the given source.
@@ -54,8 +138,32 @@ def get(source, id, **kwargs):
     if not getter:
         logger.debug(f"get: No getter for {source} has been implemented")
         raise NotImplementedError(f"No getter for {source} has been implemented")
+    metadata_cache = cache.get_cache()
+    if metadata_cache is not None:
+        return metadata_cache.get(getter, id, **kwargs)
     return getter.get(id, **kwargs)
 
+def get_many(source, ids, **kwargs):
+    """
+    Retrieve metadata for several documents of the same source in as few
+    requests as the source's API allows.
+
+    Args:
+        source (str): The key identifying the source.
+        ids (list[str]): The identifiers of the documents.
+
+    Returns:
+        dict: Metadata keyed by id. Ids whose lookup failed are left out.
+    """
+    getter = GETTERS.get(source)
+    if not getter:
+        logger.debug(f"get_many: No getter for {source} has been implemented")
+        raise NotImplementedError(f"No getter for {source} has been implemented")
+    metadata_cache = cache.get_cache()
+    if metadata_cache is not None:
+        return metadata_cache.get_many(getter, ids, **kwargs)
+    return getter.get_many(ids, **kwargs)
+
 def get_document(source, url, target, **kwargs):
     """
     Download the document from the given URL using the retriever associated with the source.
@@ -76,19 +184,18 @@ def get_document(source, url, target, **kwargs):
 
 def get_id_from_url(source=None, url=None, **kwargs):
     """
-    Retrieve metadata using the retriever associated with the given source.
+    Extract the document id from a URL.
 
     Args:
-        source (str): The key identifying the source.
-        id (str): The identifier for the document.
+        source (str): The key identifying the source. If None, it is found from the URL's host.
+        url (str): The URL of the document.
 
     Returns:
-        dict: Metadata about the document.
+        str: The document id.
     """
     logger.debug(f"getting id from url: {url}")
     if source is None:
-        import urllib
-        source = urllib.parse.urlparse(url).netloc.split(".")[-2] 
+        return get_router().route(url)[1]
     getter = GETTERS.get(source)
     if not getter:
         logger.debug(f"get_id_for_url: No getter for {source} has been implemented")
@@ -1,28 +1,24 @@
-import re
-import requests
-from bs4 import BeautifulSoup
 from .base import Retriever
+from .policy import RequestPolicy
 
 class acl(Retriever):
     source = "acl anthology"
     license = "acl"
+    policy = RequestPolicy(rate=2, burst=2)
+    metadata_url = "https://aclanthology.org/{id}"
+    hosts = ("aclanthology.org",)
+    url_pattern = r'aclanthology\.org/([a-zA-Z0-9.\-]+)'
 
     @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'aclanthology.org/([a-zA-Z0-9.\-]+)', url)
-        if not match:
-            raise ValueError("Invalid ACL Anthology URL format.")
-        acl_id = match.group(1)
-        if acl_id.endswith(".pdf"):
-            acl_id = acl_id[:-4]
-        return acl_id
+    def clean_id(cls, id):
+        return id[:-4] if id.endswith(".pdf") else id
 
     @classmethod
     def get(cls, id, **kwargs):
-        paper_url = f"https://aclanthology.org/{id}"
-        response = requests.get(paper_url)
-        if response.status_code != 200:
-            raise ValueError(f"Failed to fetch ACL Anthology page: {response.status_code}")
+        paper_url = cls.metadata_url.format(id=id)
+        response = cls.request(paper_url)
+        cls.check_response(response, "Failed to fetch ACL Anthology page")
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(response.text, 'html.parser')
         title_tag = soup.find('h2', id="title")
         title = title_tag.text.strip() if title_tag else ""
@@ -1,7 +1,5 @@
 import os
 import shutil
-import requests
-import re
 
 from .base import Retriever
 
@@ -9,14 +7,12 @@ class aps(Retriever):
     source : str = "aps"
     extension : str = "pdf"
     license = "aps"
+    hosts = ("aps.org",)
+    url_pattern = r'doi/([a-zA-Z0-9\/\.]+)'
 
     @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'doi/([a-zA-Z0-9\/\.]+)', url)
-        if not match:
-            raise ValueError("Invalid aps URL format.")
-        el_id = match.group(1)
-        return el_id.replace("/", "_")
+    def clean_id(cls, id):
+        return id.replace("/", "_")
 
     @classmethod
     def _get_remote(cls, url: str, target: str, **kwargs):
@@ -1,38 +1,39 @@
 import re
-import requests
 import xml.etree.ElementTree as ET
 from .base import Retriever
+from .policy import RequestPolicy
+
+ATOM = "{http://www.w3.org/2005/Atom}"
 
 class arxiv(Retriever):
     source = "arxiv"
     license = "cc by 4.0"
+    # arXiv asks API clients for no more than one request every three seconds.
+    policy = RequestPolicy(rate=1/3, burst=1)
+    metadata_url = "http://export.arxiv.org/api/query?id_list={id}"
+    batch_url = "http://export.arxiv.org/api/query?id_list={ids}&max_results={n}"
+    batch_size = 200
+    hosts = ("arxiv.org",)
+    url_pattern = r'arxiv\.org/(?:abs|pdf)/([a-zA-Z0-9.]+)'
 
     @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'arxiv.org/(?:abs|pdf)/([a-zA-Z0-9.]+)', url)
-        if not match:
-            raise ValueError("Invalid arXiv URL format.")
-        arxiv_id = match.group(1)
-        if arxiv_id.endswith(".pdf"):
-            arxiv_id = arxiv_id[:-4]
-        return arxiv_id
+    def clean_id(cls, id):
+        return id[:-4] if id.endswith(".pdf") else id
+
+    @staticmethod
+    def _strip_version(id):
+        return re.sub(r'v\d+$', '', id)
 
     @classmethod
-    def get(cls, id, **kwargs):
-        metadata_url = f"http://export.arxiv.org/api/query?id_list={id}"
-        response = requests.get(metadata_url)
-        if response.status_code != 200:
-            raise ValueError(f"Unable to fetch metadata for arXiv ID {id}.")
-        try:
-            root = ET.fromstring(response.content)
-            entry = root.find("{http://www.w3.org/2005/Atom}entry")
-            if entry is None:
-                raise ValueError(f"No metadata found for arXiv ID {id}.")
-            title = entry.find("{http://www.w3.org/2005/Atom}title").text.strip()
-            abstract = entry.find("{http://www.w3.org/2005/Atom}summary").text.strip()
-            year = entry.find("{http://www.w3.org/2005/Atom}published").text.strip().split("-")[0]
-        except Exception as e:
-            raise ValueError(f"Error parsing metadata for arXiv ID {id}: {e}")
+    def normalize_id(cls, id):
+        # 2101.00001v2 and 2101.00001 are the same paper.
+        return super().normalize_id(cls._strip_version(id))
+
+    @classmethod
+    def _parse_entry(cls, entry, id):
+        title = entry.find(f"{ATOM}title").text.strip()
+        abstract = entry.find(f"{ATOM}summary").text.strip()
+        year = entry.find(f"{ATOM}published").text.strip().split("-")[0]
         return dict(
             id=id,
             url=f"https://arxiv.org/pdf/{id}.pdf",
@@ -41,3 +42,56 @@ class arxiv(Retriever):
             abs=abstract,
             year=year
         )
+
+    @classmethod
+    def get(cls, id, **kwargs):
+        response = cls.request(cls.metadata_url.format(id=id))
+        cls.check_response(response, f"Unable to fetch metadata for arXiv ID {id}")
+        try:
+            root = ET.fromstring(response.content)
+            entry = root.find(f"{ATOM}entry")
+            if entry is None:
+                raise ValueError(f"No metadata found for arXiv ID {id}.")
+            return cls._parse_entry(entry, id)
+        except Exception as e:
+            raise ValueError(f"Error parsing metadata for arXiv ID {id}: {e}")
+
+    @classmethod
+    def get_many(cls, ids, failed: set | None = None, **kwargs):
+        """
+        Retrieve metadata for up to batch_size ids per Atom request. The ids
+        of a request that fails are added to failed.
+        """
+        from . import logger
+        ids = list(dict.fromkeys(ids))
+        results = {}
+        for start in range(0, len(ids), cls.batch_size):
+            chunk = ids[start:start + cls.batch_size]
+            # Entries come back as http://arxiv.org/abs/<id>v<n>; match them versionless.
+            wanted = {}
+            for id in chunk:
+                wanted.setdefault(cls._strip_version(id), []).append(id)
+            response = cls.request(cls.batch_url.format(ids=",".join(chunk), n=len(chunk)))
+            if response.status_code != 200:
+                logger.debug(f"Unable to fetch metadata for {len(chunk)} arXiv IDs: {response.status_code}")
+                if failed is not None:
+                    failed.update(chunk)
+                continue
+            try:
+                root = ET.fromstring(response.content)
+            except ET.ParseError as e:
+                logger.debug(f"Error parsing arXiv batch response: {e}")
+                if failed is not None:
+                    failed.update(chunk)
+                continue
+            for entry in root.iterfind(f"{ATOM}entry"):
+                entry_id = entry.findtext(f"{ATOM}id", "")
+                if "/abs/" not in entry_id:
+                    # arXiv reports bad ids as error entries.
+                    continue
+                for id in wanted.get(cls._strip_version(entry_id.split("/abs/", 1)[1]), []):
+                    try:
+                        results[id] = cls._parse_entry(entry, id)
+                    except Exception as e:
+                        logger.debug(f"Error parsing metadata for arXiv ID {id}: {e}")
+        return results
@@ -1,15 +1,146 @@
+import json
 import os
+import re
 import shutil
-import requests
+import tempfile
+from typing import TYPE_CHECKING
+
+from hugo_dataset import metrics
+from hugo_dataset.hashing import new_hasher
+
+from . import cache
+from . import policy as policies
+from .local_index import get_local_index
+from .policy import RequestPolicy
+
+if TYPE_CHECKING:
+    from .transport import Transport
+
+CHUNK_SIZE = 1 << 20
+# Statuses saying the document does not exist, as opposed to a failure worth retrying later.
+PERMANENT_STATUSES = (404, 410)
+JOURNAL_INTERVAL = 8 << 20 # Bytes received between journal updates of a partial download
+
+def write_atomic(target: str, chunks, hash_algo: str = "md5"):
+    """
+    Write an iterable of byte chunks to target, hashing them on the way.
+
+    The chunks go to a temporary file in the target's directory that is renamed
+    into place once complete, so target never holds a partial file.
+
+    Returns:
+        tuple[str, str]: The target path and the hex digest of its contents.
+    """
+    hasher = new_hasher(hash_algo)
+    directory, name = os.path.split(os.path.abspath(target))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f".{name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                hasher.update(chunk)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return target, hasher.hexdigest()
+
+class HTTPStatusError(ValueError):
+    """
+    A metadata request answered with a status other than 200.
+    """
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def permanent(self) -> bool:
+        return self.status_code in PERMANENT_STATUSES
+
+def _read_journal(path: str) -> dict | None:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_journal(path: str, **state):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
 
 class Retriever:
     source : str = "None"
     extension : str = "pdf"
     license : str = "unknown"
+    policy : RequestPolicy = RequestPolicy()
+    transport : "Transport | None" = None # None: the shared transport (see transport.set_transport)
+    hosts : tuple[str, ...] = () # Hostnames whose URLs (including subdomains) belong to this source
+    url_pattern : str | None = None # Regex whose first group is the id in a document URL
+    _url_re : re.Pattern | None = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Compile once per retriever instead of on every id_from_url call.
+        cls._url_re = re.compile(cls.url_pattern) if cls.url_pattern else None
+
+    @classmethod
+    def request(cls, url: str, method: str = "GET", **kwargs):
+        """
+        Send an HTTP request subject to this retriever's policy (rate limit,
+        retries with backoff, timeout and circuit breaker).
+
+        Inside a cached metadata lookup the request is made conditional on the
+        cached validators, and cache.NotModified is raised on a 304.
+        """
+        cache.apply_conditional(method, kwargs)
+        response = policies.request(cls.source, cls.policy, url, method=method, transport=cls.transport, **kwargs)
+        cache.record_validators(response)
+        return response
+
+    @classmethod
+    def check_response(cls, response, message: str):
+        """
+        Raise HTTPStatusError(message) unless the response is a 200.
+        """
+        if response.status_code != 200:
+            raise HTTPStatusError(f"{message} (HTTP {response.status_code})", response.status_code)
+        return response
 
     @classmethod
     def id_from_url(cls, url):
-        raise NotImplementedError("id_from_url not implemented")
+        if cls._url_re is None:
+            raise NotImplementedError("id_from_url not implemented")
+        match = cls._url_re.search(url)
+        if not match:
+            raise ValueError(f"Invalid {cls.source} URL format.")
+        return cls.clean_id(match.group(1))
+
+    @classmethod
+    def clean_id(cls, id):
+        """
+        Turn the id matched by url_pattern into the document id.
+        """
+        return id
+
+    @classmethod
+    def normalize_id(cls, id):
+        """
+        The form of id used to match local files. Ids may contain slashes
+        (e.g. DOIs), which file names cannot, so they are stored as "_".
+        """
+        return id.replace("/", "_")
 
     @classmethod
     def from_url(cls, url):
@@ -19,6 +150,31 @@ class Retriever:
     def get(cls, id, **kwargs):
         raise NotImplementedError("get not implemented")
 
+    @classmethod
+    def get_many(cls, ids, failed: set | None = None, **kwargs):
+        """
+        Retrieve metadata for several ids. Retrievers whose API accepts many ids
+        per call should override this; the default calls get() once per id.
+
+        Args:
+            ids: The document ids.
+            failed: Optional set the ids whose request failed are added to,
+                as opposed to ids the source has no metadata for.
+
+        Returns:
+            dict: Metadata keyed by id. Ids whose lookup failed are left out.
+        """
+        from . import logger
+        results = {}
+        for id in ids:
+            try:
+                results[id] = cls.get(id, **kwargs)
+            except Exception as e:
+                logger.debug(f"get_many: failed to retrieve {cls.source} {id}: {e}")
+                if failed is not None and not (isinstance(e, cache.NEGATIVE_ERRORS) and getattr(e, "permanent", True)):
+                    failed.add(id)
+        return results
+
     @classmethod
     def _copy_file(cls, source, target):
         from . import logger
@@ -38,50 +194,141 @@ class Retriever:
             raise e
         
     @classmethod
-    def _get_local(cls, url: str, target: str, local_dir: str, walk=True, **kwargs):
+    def _get_local(cls, url: str, target: str, local_dir: str | list[str], walk=True, **kwargs):
         """
         Attempt to retrieve the file from a local directory if 'local_dir' is specified in kwargs.
-        if walk == False, don't recursively search the directory
+        local_dir is a file, a directory or a list of directories. Directories are
+        looked up in a shared id -> path index (see local_index.get_local_index),
+        built once per set of roots; {id}.{extension} directly in them is tried
+        too, which is all that is tried if walk == False.
         """
-        from . import logger
-        if os.path.isfile(local_dir):
-            return cls._copy_file(local_dir, target)
-        elif walk:
-            id = cls.id_from_url(url)
-            for d, sub, f in os.walk(local_dir):
-                for _f in f:
-                    if id == os.path.splitext(_f):
-                        p = os.path.join(d, _f)
-                        cls._copy_file(p, target)
-                        return target
-        else:
-            id = cls.id_from_url(url)
-            p = os.path.join(local_dir, f"{p}.{cls.extension}")
+        if isinstance(local_dir, str):
+            if os.path.isfile(local_dir):
+                return cls._copy_file(local_dir, target)
+            if not os.path.isdir(local_dir):
+                # e.g. a stored path whose file is gone: nothing to index or look in.
+                return None
+        id = cls.id_from_url(url)
+        roots = [local_dir] if isinstance(local_dir, str) else local_dir
+        # Also finds files added since the shared index was built.
+        candidates = [os.path.join(d, f"{i}.{cls.extension}") for d in roots for i in dict.fromkeys((id, cls.normalize_id(id)))]
+        if walk:
+            p = get_local_index(local_dir).lookup(cls, id)
+            if p:
+                candidates.insert(0, p)
+        for p in candidates:
             if os.path.isfile(p):
-                cls._copy_file(p, target)
-                return target
+                return cls._copy_file(p, target)
         return None
 
     @classmethod
-    def _get_remote(cls, url: str, target: str, **kwargs):
+    def _download(cls, url: str, target: str, hash_algo: str = "md5"):
+        """
+        Stream url into the file target, hashing it in the same pass.
+
+        Bytes are written to target.part, which is renamed into place once
+        complete. A journal (target.part.json) records the url, the validator
+        (ETag or Last-Modified) and the number of bytes safely on disk, so an
+        interrupted download resumes with a Range request if the server
+        supports it, and starts over if it does not.
+
+        Returns:
+            tuple[str, str]: The target path and the hex digest of the document.
+        """
+        from . import logger
+        part = f"{target}.part"
+        journal = f"{part}.json"
+        state = _read_journal(journal)
+        offset = 0
+        # Ranges count encoded bytes, so documents are fetched unencoded.
+        headers = {"Accept-Encoding": "identity"}
+        if state and state.get("url") == url and state.get("validator") and os.path.isfile(part):
+            offset = min(state.get("bytes", 0), os.path.getsize(part))
+            if offset:
+                headers.update({"Range": f"bytes={offset}-", "If-Range": state["validator"]})
+
+        response = cls.request(url, stream=True, headers=headers)
+        try:
+            if offset and response.status_code == 416:
+                # Nothing left to fetch if the journal already covers the whole document.
+                total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                if total != str(offset):
+                    _remove(part, journal)
+                    response.close()
+                    return cls._download(url, target, hash_algo)
+            elif offset and response.status_code == 206:
+                if not response.headers.get("Content-Range", "").startswith(f"bytes {offset}-"):
+                    # Not the range we asked for: the same request would fail again, so start over.
+                    logger.debug(f"Unexpected Content-Range for {url}: {response.headers.get('Content-Range')}")
+                    _remove(part, journal)
+                    response.close()
+                    return cls._download(url, target, hash_algo)
+                logger.info(f"Resuming {url} at byte {offset}")
+            elif response.status_code == 200:
+                offset = 0
+            else:
+                raise Exception(f"Failed to download document from {url}: {response.status_code}")
+
+            validator = response.headers.get("ETag")
+            if not validator or validator.startswith("W/"):
+                # Weak ETags cannot be used with If-Range.
+                validator = response.headers.get("Last-Modified")
+            state = dict(url=url, validator=state["validator"] if offset else validator)
+
+            hasher = new_hasher(hash_algo)
+            with open(part, "r+b" if offset else "wb") as f:
+                if offset:
+                    f.truncate(offset)
+                    for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                        hasher.update(chunk)
+                received = synced = offset
+                _write_journal(journal, bytes=received, **state)
+                try:
+                    if response.status_code != 416:
+                        for chunk in response.iter_content(CHUNK_SIZE):
+                            f.write(chunk)
+                            hasher.update(chunk)
+                            received += len(chunk)
+                            if received - synced >= JOURNAL_INTERVAL:
+                                f.flush()
+                                os.fsync(f.fileno())
+                                synced = received
+                                _write_journal(journal, bytes=synced, **state)
+                finally:
+                    f.flush()
+                    os.fsync(f.fileno())
+                    _write_journal(journal, bytes=received, **state)
+            os.replace(part, target)
+            _remove(journal)
+            metrics.get_metrics().counter("hugo_download_bytes_total", "Bytes downloaded by source").inc(
+                received - offset, source=cls.source)
+            return target, hasher.hexdigest()
+        finally:
+            response.close()
+
+    @classmethod
+    def _get_remote(cls, url: str, target: str, hash_algo: str = "md5", on_download=None, **kwargs):
         """
         Retrieve the file from the remote URL.
+        on_download(path, hash_algo, digest) is called with the digest computed
+        while downloading, so the document does not have to be read again.
+
+        The request is retried by the retriever's policy; a transfer interrupted
+        after that is resumed from its journal by the next call.
         """
         from . import logger
         logger.info(f"Retrieving {url} from remote source")
+        if os.path.isdir(target):
+            target = os.path.join(target, f"{cls.id_from_url(url)}.{cls.extension}")
         try:
-            response = requests.get(url)
+            target, digest = cls._download(url, target, hash_algo)
         except Exception as e:
             logger.debug(e)
-        if response.status_code == 200:
-            if os.path.isdir(target):
-                target = os.path.join(target, f"{cls.id_from_url(url)}.{cls.extension}")
-            with open(target, "wb") as f:
-                f.write(response.content)
-            return target
-        else:
             logger.debug(f"Failed to retrieve {url}!")
-            raise Exception(f"Failed to download document from {url}")
+            raise Exception(f"Failed to download document from {url}") from e
+        if on_download:
+            on_download(target, hash_algo, digest)
+        return target
 
     @classmethod
     def get_document(cls, url: str, target: str, offline=False, **kwargs):
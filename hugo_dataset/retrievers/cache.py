@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import TYPE_CHECKING
+
+from hugo_dataset import metrics
+from hugo_dataset.connections import ThreadConnections, connect_wal
+from hugo_dataset.logger import get_logger
+logger = get_logger("retrievers.cache")
+
+if TYPE_CHECKING:
+    import requests
+
+# Validators (etag, last_modified) for the metadata lookup in progress on this
+# thread. Retriever.request turns them into conditional request headers and
+# records the validators of the response it receives.
+conditional : ContextVar[dict | None] = ContextVar("conditional", default=None)
+
+class NotModified(Exception):
+    """
+    Raised by Retriever.request when a conditional request returns 304.
+    """
+
+# Failures that say something about the document rather than the connection.
+# Only these are cached; transient errors are retried on the next lookup. An
+# error with a `permanent` attribute (base.HTTPStatusError) is cached only if
+# it is set, so a 429 or 5xx left over after retries is not.
+NEGATIVE_ERRORS = (ValueError, NotImplementedError)
+
+# Lookups whose access time is held in memory before it is written.
+ACCESS_BATCH = 256
+
+DAY = 24 * 60 * 60
+
+class MetadataCache:
+    """
+    Persistent (SQLite) cache of retrievers.get results keyed by (source, id).
+
+    Entries are served until they are older than `ttl` seconds, after which they
+    are revalidated with If-None-Match/If-Modified-Since where the server sent
+    validators, and refetched otherwise. Lookups that failed permanently are
+    cached for `negative_ttl`. Once the cache holds more than `max_entries`, the
+    least recently used entries are evicted. Access times are written in
+    batches rather than on every lookup.
+    """
+    def __init__(self, path: str, ttl: float = 30 * DAY, negative_ttl: float = DAY, max_entries: int = 1_000_000):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._connections = ThreadConnections(lambda: connect_wal(self.path, 30))
+        self._writes = 0
+        self._accessed = {} # (source, id) -> access time not yet written
+        self._accessed_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS metadata (
+                    source TEXT NOT NULL,
+                    id TEXT NOT NULL,
+                    data TEXT,
+                    error TEXT,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (source, id)
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS metadata_accessed ON metadata (accessed_at)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def close(self):
+        self.flush()
+        self._connections.close()
+
+    def lookup(self, source: str, id: str) -> dict | None:
+        """
+        Return the cached entry for (source, id) with a 'fresh' flag, or None.
+        """
+        row = self._conn.execute(
+            "SELECT data, error, etag, last_modified, fetched_at FROM metadata WHERE source = ? AND id = ?",
+            (source, id)).fetchone()
+        if row is None:
+            return None
+        data, error, etag, last_modified, fetched_at = row
+        now = time.time()
+        with self._accessed_lock:
+            self._accessed[(source, id)] = now
+            full = len(self._accessed) >= ACCESS_BATCH
+        if full:
+            self.flush()
+        ttl = self.negative_ttl if error is not None else self.ttl
+        return dict(
+            data=json.loads(data) if data is not None else None,
+            error=error,
+            etag=etag,
+            last_modified=last_modified,
+            fresh=now - fetched_at < ttl,
+        )
+
+    def flush(self):
+        """
+        Write the access times of recent lookups.
+        """
+        with self._accessed_lock:
+            accessed, self._accessed = self._accessed, {}
+        if accessed:
+            with self._conn:
+                self._conn.executemany("UPDATE metadata SET accessed_at = ? WHERE source = ? AND id = ?",
+                                       [(now, source, id) for (source, id), now in accessed.items()])
+
+    def store(self, source: str, id: str, data: dict | None = None, error: str | None = None,
+              etag: str | None = None, last_modified: str | None = None):
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (source, id, json.dumps(data) if data is not None else None, error, etag, last_modified, now, now))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self.evict()
+
+    def touch(self, source: str, id: str):
+        """
+        Mark an entry as freshly validated.
+        """
+        now = time.time()
+        with self._conn:
+            self._conn.execute("UPDATE metadata SET fetched_at = ?, accessed_at = ? WHERE source = ? AND id = ?",
+                               (now, now, source, id))
+
+    def evict(self):
+        """
+        Drop the least recently used entries beyond max_entries.
+        """
+        self.flush()
+        with self._conn:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM metadata").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM metadata WHERE rowid IN (SELECT rowid FROM metadata ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,))
+
+    def merge(self, paths: list[str]):
+        """
+        Merge other metadata caches (e.g. one per shard) into this one, keeping
+        the most recently fetched entry of each (source, id).
+        """
+        self.flush()
+        for path in paths:
+            with self._conn:
+                self._conn.execute("ATTACH DATABASE ? AS other", (path,))
+            try:
+                with self._conn:
+                    self._conn.execute("""
+                        INSERT INTO metadata SELECT source, id, data, error, etag, last_modified, fetched_at, accessed_at
+                        FROM other.metadata WHERE true
+                        ON CONFLICT(source, id) DO UPDATE SET data = excluded.data, error = excluded.error,
+                            etag = excluded.etag, last_modified = excluded.last_modified,
+                            fetched_at = excluded.fetched_at, accessed_at = MAX(metadata.accessed_at, excluded.accessed_at)
+                        WHERE excluded.fetched_at > metadata.fetched_at""")
+            finally:
+                self._conn.execute("DETACH DATABASE other")
+        self.evict()
+
+    def clear(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM metadata")
+
+    def get(self, getter, id: str, **kwargs) -> dict:
+        """
+        Return getter.get(id) from the cache, revalidating or refetching stale entries.
+        """
+        entry = self.lookup(getter.source, id)
+        metrics.record_cache("metadata", bool(entry and entry["fresh"]))
+        if entry and entry["fresh"]:
+            if entry["error"] is not None:
+                raise ValueError(entry["error"])
+            return entry["data"]
+        return self._fetch(getter, id, entry, **kwargs)
+
+    def _fetch(self, getter, id: str, entry: dict | None, **kwargs) -> dict:
+        # Fetch id, conditionally if the stale entry has validators. If the
+        # fetch fails other than permanently, the stale data is served instead.
+        source = getter.source
+        stale = entry["data"] if entry else None
+        validators = {}
+        if stale is not None:
+            validators = dict(etag=entry["etag"], last_modified=entry["last_modified"])
+        token = conditional.set(validators)
+        try:
+            data = getter.get(id, **kwargs)
+        except NotModified:
+            self.touch(source, id)
+            return stale
+        except Exception as e:
+            if isinstance(e, NEGATIVE_ERRORS) and getattr(e, "permanent", True):
+                self.store(source, id, error=str(e))
+                raise
+            if stale is None:
+                raise
+            logger.debug(f"Serving stale metadata for {source} {id}: {e}")
+            return stale
+        finally:
+            conditional.reset(token)
+        self.store(source, id, data, etag=validators.get("etag"), last_modified=validators.get("last_modified"))
+        return data
+
+    def get_many(self, getter, ids, **kwargs) -> dict:
+        """
+        Return getter.get_many(ids), following the rules of get: only ids
+        without a fresh entry are fetched, stale entries with validators are
+        revalidated (one conditional request each, since a batch has no
+        per-id validators), ids the batch did not return are cached as not
+        found, and stale data is served for ids whose request failed.
+        """
+        from .base import Retriever
+        results = {}
+        if getter.get_many.__func__ is Retriever.get_many.__func__:
+            # Not batched: look ids up one at a time so failures are cached too.
+            for id in ids:
+                try:
+                    results[id] = self.get(getter, id, **kwargs)
+                except Exception as e:
+                    logger.debug(f"get_many: failed to retrieve {getter.source} {id}: {e}")
+            return results
+
+        source = getter.source
+        missing = []
+        stale = {} # id -> stale data of a missing id
+        for id in dict.fromkeys(ids):
+            entry = self.lookup(source, id)
+            metrics.record_cache("metadata", bool(entry and entry["fresh"]))
+            if entry and entry["fresh"]:
+                if entry["data"] is not None:
+                    results[id] = entry["data"]
+            elif entry and entry["data"] is not None and (entry["etag"] or entry["last_modified"]):
+                try:
+                    results[id] = self._fetch(getter, id, entry, **kwargs)
+                except Exception as e:
+                    logger.debug(f"get_many: failed to retrieve {source} {id}: {e}")
+            else:
+                missing.append(id)
+                if entry and entry["data"] is not None:
+                    stale[id] = entry["data"]
+        if not missing:
+            return results
+        failed = set()
+        try:
+            fetched = getter.get_many(missing, failed=failed, **kwargs)
+        except Exception as e:
+            logger.debug(f"get_many: failed to retrieve {len(missing)} {source} ids: {e}")
+            fetched, failed = {}, set(missing)
+        for id in missing:
+            if id in fetched:
+                self.store(source, id, fetched[id])
+                results[id] = fetched[id]
+            elif id in failed:
+                if id in stale:
+                    logger.debug(f"Serving stale metadata for {source} {id}")
+                    results[id] = stale[id]
+            else:
+                # The source answered without it.
+                self.store(source, id, error=f"No metadata found for {source} ID {id}.")
+        return results
+
+def apply_conditional(method: str, kwargs: dict):
+    """
+    Add conditional request headers for the metadata lookup in progress, if any.
+    """
+    validators = conditional.get()
+    if validators is None or method != "GET":
+        return
+    headers = dict(kwargs.get("headers") or {})
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    kwargs["headers"] = headers
+
+def record_validators(response: "requests.Response"):
+    """
+    Raise NotModified for a 304, otherwise remember the response's validators.
+    """
+    validators = conditional.get()
+    if validators is None:
+        return
+    if response.status_code == 304:
+        raise NotModified()
+    if response.status_code == 200:
+        validators["etag"] = response.headers.get("ETag")
+        validators["last_modified"] = response.headers.get("Last-Modified")
+
+_cache : MetadataCache | None = None
+
+def configure(path: str | None, **kwargs) -> MetadataCache | None:
+    """
+    Set (or, with path=None, disable) the metadata cache used by retrievers.get.
+    """
+    global _cache
+    if _cache is not None and (path is None or os.path.abspath(path) != os.path.abspath(_cache.path)):
+        _cache.close()
+        _cache = None
+    if path is not None:
+        if _cache is None:
+            _cache = MetadataCache(path, **kwargs)
+        else:
+            for k, v in kwargs.items():
+                setattr(_cache, k, v)
+    return _cache
+
+def get_cache() -> MetadataCache | None:
+    return _cache
@@ -1,7 +1,5 @@
 import os
 import shutil
-import requests
-import re
 
 from .base import Retriever
 
@@ -9,14 +7,8 @@ class elsevier(Retriever):
     source : str = "elsevier"
     extension : str = "pdf"
     license = "elsevier"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'pii/([a-zA-Z0-9]+)', url)
-        if not match:
-            raise ValueError("Invalid elsevier URL format.")
-        el_id = match.group(1)
-        return el_id
+    hosts = ("elsevier.com",)
+    url_pattern = r'pii/([a-zA-Z0-9]+)'
 
     @classmethod
     def _get_remote(cls, url: str, target: str, **kwargs):
@@ -0,0 +1,97 @@
+import os
+import threading
+from typing import Iterable
+
+from hugo_dataset.logger import get_logger
+logger = get_logger(__name__)
+
+class LocalIndex:
+    """
+    id -> path of the documents under a set of local roots, where a
+    document's id is its file name without the extension.
+
+    Ids are matched exactly first, then after the retriever's normalize_id
+    (e.g. "10.1103/PhysRevB.1" finds 10.1103_PhysRevB.1.pdf and "2101.00001v2"
+    finds 2101.00001v1.pdf for arxiv). The aliases of a retriever are built on
+    its first lookup, so every lookup is a dictionary access.
+    """
+    def __init__(self, entries: dict[str, str] | Iterable[tuple[str, str]] = ()):
+        self._paths = entries if isinstance(entries, dict) else dict(entries)
+        self._aliases = {} # retriever -> normalized id -> path, for ids that are not already normalized
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_roots(cls, roots: Iterable[str]) -> "LocalIndex":
+        """
+        Walk every root once. Later roots win when an id appears twice.
+        """
+        paths = {}
+        for root in roots:
+            for d, dirs, files in os.walk(root):
+                for name in files:
+                    # Skip hidden files (indexes, temporary downloads) and partial downloads.
+                    if not name.startswith(".") and not name.endswith((".part", ".part.json")):
+                        paths[os.path.splitext(name)[0]] = os.path.join(d, name)
+        return cls(paths)
+
+    def __len__(self):
+        return len(self._paths)
+
+    def _aliases_for(self, retriever) -> dict[str, str]:
+        aliases = self._aliases.get(retriever)
+        if aliases is None:
+            with self._lock:
+                aliases = self._aliases.get(retriever)
+                if aliases is None:
+                    normalize = retriever.normalize_id
+                    aliases = {}
+                    for id, path in self._paths.items():
+                        key = normalize(id)
+                        if key != id:
+                            aliases.setdefault(key, path)
+                    self._aliases[retriever] = aliases
+        return aliases
+
+    def lookup(self, retriever, id: str) -> str | None:
+        """
+        The path of the document id of retriever's source, or None.
+        """
+        path = self._paths.get(id)
+        if path is None:
+            key = retriever.normalize_id(id)
+            path = self._paths.get(key) or self._aliases_for(retriever).get(key)
+        return path
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def _key(roots) -> tuple[str, ...]:
+    if isinstance(roots, str):
+        roots = [roots]
+    return tuple(os.path.abspath(root) for root in roots)
+
+def get_local_index(roots) -> LocalIndex:
+    """
+    The shared index of a root or list of roots, walked on first use and
+    kept for the life of the process. It does not see files added to the
+    roots afterwards: call clear_local_indexes() after adding documents to a
+    directory that is passed as local_dir again.
+    """
+    key = _key(roots)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = LocalIndex.from_roots(key)
+                logger.info(f"Indexed {len(index)} local documents in {', '.join(key)}")
+                _indexes[key] = index
+    return index
+
+def clear_local_indexes():
+    """
+    Forget the shared indexes, so they are walked again on next use and
+    their memory is released.
+    """
+    with _indexes_lock:
+        _indexes.clear()
@@ -1,8 +1,9 @@
 import json
 import os
-import re
 
-from .base import Retriever
+from . import policy as policies
+from .base import Retriever, write_atomic
+from .policy import RequestPolicy
 
 from pydantic import BaseModel
 
@@ -18,14 +19,9 @@ class mp(Retriever):
     source : str = "materialsproject"
     extension : str = "json"
     license = "materialsproject"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'materialsproject.org/materials/([a-zA-Z0-9.-]+)', url)
-        if not match:
-            raise ValueError("Invalid materialsproject URL format.")
-        mp_id = match.group(1)
-        return mp_id
+    policy = RequestPolicy(rate=5, burst=5)
+    hosts = ("materialsproject.org",)
+    url_pattern = r'materialsproject\.org/materials/([a-zA-Z0-9.-]+)'
 
     @classmethod
     def from_url(cls, url):
@@ -36,22 +32,25 @@ class mp(Retriever):
         raise NotImplementedError(f"{cls} - get not implemented - ensure metadata in entry")
 
     @classmethod
-    def _get_remote(cls, url: str, target: str, **kwargs):
+    def _get_remote(cls, url: str, target: str, hash_algo: str = "md5", on_download=None, **kwargs):
         """
         Retrieve the file from the remote URL.
         """
         from . import logger
         logger.info(f"Retrieving {url} from remote source")
         try:
-            response = get_mp(cls.id_from_url(url))
+            mp_id = cls.id_from_url(url)
+            response = policies.call(cls.source, "api.materialsproject.org", cls.policy, lambda: get_mp(mp_id))
         except Exception as e:
             logger.debug(e)
             logger.debug(f"Failed to retrieve {url}!")
             raise Exception(f"Failed to download document from {url}")
         if os.path.isdir(target):
             target = os.path.join(target, f"{cls.id_from_url(url)}.{cls.extension}")
-            with open(target, "w") as f:
-                json.dump([r.dict() for r in response], f)
+            content = json.dumps([r.dict() for r in response]).encode()
+            target, digest = write_atomic(target, [content], hash_algo)
+            if on_download:
+                on_download(target, hash_algo, digest)
             return target
         else:
             logger.debug(f"Failed to write document {url}!")
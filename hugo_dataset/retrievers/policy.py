@@ -0,0 +1,217 @@
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from pydantic import BaseModel
+
+from hugo_dataset import metrics
+
+class CircuitOpenError(Exception):
+    """
+    Raised when requests to a host are suspended by its circuit breaker.
+    """
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Callers reserve a token and sleep until it is due,
+    so concurrent callers are served in arrival order at `rate` per second.
+    """
+    def __init__(self, rate: float, burst: int = 1, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = float(self.burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait > 0:
+            self.sleep(wait)
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures and rejects calls for `cooldown`
+    seconds. After the cooldown a single trial call is let through: success closes
+    the breaker, failure opens it again.
+    """
+    def __init__(self, threshold: int, cooldown: float, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and self.clock() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.clock() - self.opened_at < self.cooldown or self._trial:
+                return False
+            self._trial = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+class RequestPolicy(BaseModel):
+    """
+    How a retriever talks to its remote hosts. Declared per Retriever subclass
+    (see Retriever.policy); runtime state is kept per source and host.
+    """
+    rate : float | None = None # Requests per second per host (None: unlimited)
+    burst : int = 1
+    timeout : float | None = None # Seconds (None: the transport's default)
+    max_retries : int = 3
+    backoff : float = 1.0 # Base delay (seconds) for exponential backoff
+    max_backoff : float = 60.0 # Longest delay, including Retry-After, we are willing to wait
+    retry_statuses : tuple[int, ...] = (429, 500, 502, 503, 504)
+    breaker_threshold : int = 5 # Consecutive failed calls (after their retries) before a host is suspended
+    breaker_cooldown : float = 60.0 # Seconds a suspended host is left alone
+
+    def delay(self, attempt: int) -> float:
+        """
+        Exponential backoff with full jitter for the given (0-based) attempt.
+        """
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+class _HostState:
+    def __init__(self, policy: RequestPolicy):
+        self.bucket = TokenBucket(policy.rate, policy.burst) if policy.rate else None
+        self.breaker = CircuitBreaker(policy.breaker_threshold, policy.breaker_cooldown)
+
+_STATES : dict[tuple[str, str], _HostState] = {}
+_STATES_LOCK = threading.Lock()
+
+def _state(source: str, host: str, policy: RequestPolicy) -> _HostState:
+    key = (source, host)
+    with _STATES_LOCK:
+        if key not in _STATES:
+            _STATES[key] = _HostState(policy)
+        return _STATES[key]
+
+def reset():
+    """
+    Forget all rate limiter and circuit breaker state.
+    """
+    with _STATES_LOCK:
+        _STATES.clear()
+
+def retry_after(response) -> float | None:
+    """
+    Parse a Retry-After header (delta-seconds or HTTP date) into seconds.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def call(source: str, host: str, policy: RequestPolicy, fn, sleep=time.sleep):
+    """
+    Run fn() under the policy for (source, host).
+
+    fn may return a requests.Response; responses with a status in
+    policy.retry_statuses are retried and the last one is returned when retries
+    run out. Exceptions raised by fn are retried and re-raised when retries run out.
+    The circuit breaker counts the outcome of the call, not each attempt.
+
+    Raises:
+        CircuitOpenError: If the host's circuit breaker is open.
+    """
+    state = _state(source, host, policy)
+    if not state.breaker.allow():
+        raise CircuitOpenError(f"{host} suspended after repeated failures ({source})")
+    try:
+        result = _attempt(state, policy, fn, sleep)
+    except BaseException:
+        state.breaker.record_failure()
+        raise
+    if getattr(result, "status_code", None) in policy.retry_statuses:
+        state.breaker.record_failure()
+    else:
+        state.breaker.record_success()
+    return result
+
+def _attempt(state: _HostState, policy: RequestPolicy, fn, sleep):
+    # fn() with rate limiting and retries; see call().
+    for attempt in range(policy.max_retries + 1):
+        if state.bucket:
+            state.bucket.acquire()
+        last = attempt == policy.max_retries
+        try:
+            result = fn()
+        except Exception:
+            if last:
+                raise
+            sleep(policy.delay(attempt))
+            continue
+
+        status = getattr(result, "status_code", None)
+        if status not in policy.retry_statuses:
+            return result
+        wait = retry_after(result)
+        if wait is None:
+            wait = policy.delay(attempt)
+        if last or wait > policy.max_backoff:
+            return result
+        close = getattr(result, "close", None)
+        if close is not None:
+            # A streamed response holds its pooled connection until closed.
+            close()
+        sleep(wait)
+
+def request(source: str, policy: RequestPolicy, url: str, method: str = "GET", transport=None, **kwargs):
+    """
+    Send an HTTP request through transport (default: the shared one) under the
+    policy for the source and the url's host.
+    """
+    from .transport import get_transport
+    transport = transport or get_transport()
+    kwargs.setdefault("timeout", policy.timeout)
+    registry = metrics.get_metrics()
+    start = time.perf_counter()
+    try:
+        response = call(source, urlparse(url).netloc, policy, lambda: transport.request(method, url, **kwargs))
+    except Exception as e:
+        registry.counter("hugo_request_errors_total", "Failed requests by source and error class").inc(
+            source=source, error=type(e).__name__)
+        raise
+    finally:
+        registry.histogram("hugo_request_seconds", "Request latency by source, including rate limiting and retries").observe(
+            time.perf_counter() - start, source=source)
+    status = getattr(response, "status_code", None)
+    if status is not None and status >= 400 and status != 416:
+        registry.counter("hugo_request_errors_total", "Failed requests by source and error class").inc(
+            source=source, error=f"HTTP {status}")
+    return response
@@ -1,27 +1,24 @@
 import re
-import requests
 from .base import Retriever
+from .policy import RequestPolicy
 
 class pubmed(Retriever):
     source = "pubmed"
     extension = "pdf"
     license = "pubmed"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)', url)
-        if not match:
-            raise ValueError("Invalid PubMed URL format.")
-        return match.group(1)
+    # NCBI E-utilities allow three requests per second without an API key.
+    policy = RequestPolicy(rate=3, burst=3)
+    metadata_url = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id={id}&retmode=json"
+    hosts = ("pubmed.ncbi.nlm.nih.gov",)
+    url_pattern = r'pubmed\.ncbi\.nlm\.nih\.gov/(\d+)'
 
     @classmethod
     def get(cls, id, **kwargs):
         raise ValueError("PubMed terms and conditions prevents use of this function")
         return False
-        api_url = f"https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi?db=pubmed&id={id}&retmode=json"
-        response = requests.get(api_url)
-        if response.status_code != 200:
-            raise ValueError(f"Failed to fetch PubMed metadata for id {id}")
+        api_url = cls.metadata_url.format(id=id)
+        response = cls.request(api_url)
+        cls.check_response(response, f"Failed to fetch PubMed metadata for id {id}")
         data = response.json()
         result = data.get("result", {}).get(id)
         if not result:
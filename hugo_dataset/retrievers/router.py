@@ -0,0 +1,92 @@
+import re
+from typing import Iterable
+
+from hugo_dataset.logger import get_logger
+logger = get_logger(__name__)
+
+# Scheme, optional userinfo, then the host (without port).
+HOST_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*://(?:[^@/?#]*@)?([^/?#:]+)')
+
+class UrlRouter:
+    """
+    Map document URLs to (source, id) with the hosts and precompiled
+    url_patterns of a set of retrievers.
+
+    A URL's host (or its closest parent domain, e.g. "en.wikipedia.org" ->
+    "wikipedia.org") selects the retriever; lookups are cached per host, so
+    routing a URL costs one host regex and one id regex.
+    """
+    def __init__(self, retrievers: Iterable):
+        self._hosts = {}
+        for retriever in retrievers:
+            for host in retriever.hosts:
+                if host in self._hosts:
+                    logger.warning(f"Host {host} is claimed by {self._hosts[host].source} and {retriever.source}; using the first.")
+                    continue
+                self._hosts[host] = retriever
+        self._cache = {}
+
+    def retriever(self, url: str):
+        """
+        The retriever for url's host, or None.
+        """
+        match = HOST_RE.match(url) if url else None
+        if not match:
+            return None
+        host = match.group(1).lower()
+        try:
+            return self._cache[host]
+        except KeyError:
+            pass
+        domain = host
+        retriever = self._hosts.get(domain)
+        while retriever is None and "." in domain:
+            domain = domain.split(".", 1)[1]
+            retriever = self._hosts.get(domain)
+        self._cache[host] = retriever
+        return retriever
+
+    def source(self, url: str) -> str | None:
+        retriever = self.retriever(url)
+        return retriever.source if retriever is not None else None
+
+    def route(self, url: str) -> tuple[str, str]:
+        """
+        Returns:
+            tuple: (source, id) of url.
+
+        Raises:
+            NotImplementedError: No retriever handles url's host.
+            ValueError: url does not match the retriever's url_pattern.
+        """
+        retriever = self.retriever(url)
+        if retriever is None:
+            raise NotImplementedError(f"No getter for {url} has been implemented")
+        return retriever.source, retriever.id_from_url(url)
+
+    def route_many(self, urls) -> tuple[list, list]:
+        """
+        Route a batch of URLs (a list, or a pyarrow Array/ChunkedArray of strings).
+        URLs that cannot be routed get None for both source and id.
+
+        Returns:
+            tuple: (sources, ids); pyarrow string arrays if urls is a pyarrow array, otherwise lists.
+        """
+        arrow = hasattr(urls, "to_pylist")
+        values = urls.to_pylist() if arrow else urls
+        sources = []
+        ids = []
+        for url in values:
+            retriever = self.retriever(url)
+            id = None
+            if retriever is not None:
+                try:
+                    id = retriever.id_from_url(url)
+                except (ValueError, NotImplementedError):
+                    pass
+            sources.append(retriever.source if id is not None else None)
+            ids.append(id)
+        if arrow:
+            import pyarrow as pa
+            return pa.array(sources, pa.string()), pa.array(ids, pa.string())
+        return sources, ids
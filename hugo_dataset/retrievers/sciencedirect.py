@@ -1,7 +1,5 @@
 import os
 import shutil
-import requests
-import re
 
 from .base import Retriever
 
@@ -9,14 +7,8 @@ class sciencedirect(Retriever):
     source : str = "sciencedirect"
     extension : str = "pdf"
     license = "sciencedirect"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'pii/([a-zA-Z0-9]+)', url)
-        if not match:
-            raise ValueError("Invalid elsevier URL format.")
-        el_id = match.group(1)
-        return el_id
+    hosts = ("sciencedirect.com",)
+    url_pattern = r'pii/([a-zA-Z0-9]+)'
 
     @classmethod
     def _get_remote(cls, url: str, target: str, **kwargs):
@@ -1,7 +1,5 @@
 import os
 import shutil
-import requests
-import re
 
 from .base import Retriever
 
@@ -9,14 +7,8 @@ class springer(Retriever):
     source : str = "springer"
     extension : str = "pdf"
     license = "springer"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'springer.com/([a-zA-Z0-9\.]+\/[0-9-_]+)', url)
-        if not match:
-            raise ValueError("Invalid springer URL format.")
-        el_id = match.group(1)
-        return el_id
+    hosts = ("springer.com",)
+    url_pattern = r'springer\.com/([a-zA-Z0-9\.]+\/[0-9-_]+)'
 
     @classmethod
     def _get_remote(cls, url: str, target: str, **kwargs):
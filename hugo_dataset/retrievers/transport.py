@@ -0,0 +1,79 @@
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "hugo-dataset/0.1.0 (+https://github.com/darpa-scify/hugo-dataset)"
+
+class Transport:
+    """
+    The HTTP client shared by all retrievers.
+
+    Wraps one requests.Session with keep-alive connection pools per host
+    (pool_connections hosts, pool_maxsize connections each), so connections
+    and TLS sessions are reused across papers. Headers (User-Agent), the
+    default timeout, proxies and gzip decoding are configured here once.
+    host_map reroutes hosts, e.g. {"export.arxiv.org": "http://127.0.0.1:8000"}
+    to point retrievers at a local stand-in server.
+    """
+    def __init__(self, pool_connections: int = 32, pool_maxsize: int = 16,
+                 timeout: float | tuple[float, float] = (10, 60), user_agent: str = USER_AGENT,
+                 headers: dict | None = None, proxies: dict | None = None,
+                 decode_gzip: bool = True, host_map: dict[str, str] | None = None):
+        self.timeout = timeout
+        self.decode_gzip = decode_gzip
+        self.host_map = dict(host_map or {})
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = user_agent
+        # Without gzip decoding, ask servers not to encode responses at all.
+        self.session.headers["Accept-Encoding"] = "gzip, deflate" if decode_gzip else "identity"
+        self.session.headers.update(headers or {})
+        if proxies:
+            self.session.proxies.update(proxies)
+
+    def url(self, url: str) -> str:
+        """
+        Apply host_map to url.
+        """
+        if not self.host_map:
+            return url
+        parts = urlsplit(url)
+        target = self.host_map.get(parts.netloc)
+        if target is None:
+            return url
+        base = urlsplit(target if "://" in target else f"{parts.scheme}://{target}")
+        return urlunsplit((base.scheme, base.netloc, parts.path, parts.query, parts.fragment))
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return self.session.request(method, self.url(url), **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+_transport : Transport | None = None
+
+def get_transport() -> Transport:
+    """
+    The transport used by retrievers that do not set their own.
+    """
+    global _transport
+    if _transport is None:
+        _transport = Transport()
+    return _transport
+
+def set_transport(transport: Transport | None):
+    """
+    Replace the shared transport (None restores a default one on next use).
+    """
+    global _transport
+    if _transport is not None and _transport is not transport:
+        _transport.close()
+    _transport = transport
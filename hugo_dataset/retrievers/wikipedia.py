@@ -1,25 +1,20 @@
-import re
-import requests
 from .base import Retriever
+from .policy import RequestPolicy
 
 class wikipedia(Retriever):
     source = "wikipedia"
     extension = "txt"
     license = "cc by 4.0"
-
-    @classmethod
-    def id_from_url(cls, url):
-        match = re.search(r'wikipedia\.org/wiki/([^#?]+)', url)
-        if not match:
-            raise ValueError("Invalid Wikipedia URL format.")
-        return match.group(1)
+    policy = RequestPolicy(rate=10, burst=10)
+    metadata_url = "https://en.wikipedia.org/api/rest_v1/page/summary/{id}"
+    hosts = ("wikipedia.org",)
+    url_pattern = r'wikipedia\.org/wiki/([^#?]+)'
 
     @classmethod
     def get(cls, id):
-        api_url = f"https://en.wikipedia.org/api/rest_v1/page/summary/{id}"
-        response = requests.get(api_url)
-        if response.status_code != 200:
-            raise ValueError(f"Failed to fetch Wikipedia article summary: {response.status_code}")
+        api_url = cls.metadata_url.format(id=id)
+        response = cls.request(api_url)
+        cls.check_response(response, "Failed to fetch Wikipedia article summary")
         data = response.json()
         title = data.get("title", "")
         summary = data.get("extract", "")
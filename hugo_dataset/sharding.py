@@ -0,0 +1,166 @@
+import argparse
+import glob
+import hashlib
+import os
+
+from hugo_dataset.hashing import HashCache
+from hugo_dataset.manifest import RunManifest
+from hugo_dataset.retrievers.cache import MetadataCache
+from hugo_dataset.store import IndexStore, JsonStore, SqliteStore, open_store
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("sharding")
+
+def shard_of(id: str, num_shards: int) -> int:
+    """
+    The shard a paper id belongs to. Stable across processes, machines and
+    Python versions (unlike hash()), so every node computes the same split.
+    """
+    digest = hashlib.blake2b(id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % num_shards
+
+def in_shard(id: str, num_shards: int, shard_index: int) -> bool:
+    return num_shards <= 1 or shard_of(id, num_shards) == shard_index
+
+def check_shard(num_shards: int, shard_index: int):
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard {shard_index} of {num_shards}.")
+
+def shard_file(doc_dir: str, name: str, num_shards: int, shard_index: int, extension: str = "sqlite") -> str | None:
+    """
+    Default location of one shard's file (index store, manifest, metrics), so
+    nodes sharing doc_dir never write the same file. None when not sharding.
+    """
+    if num_shards <= 1:
+        return None
+    return os.path.join(doc_dir, f".{name}.shard-{shard_index}-of-{num_shards}.{extension}")
+
+def shard_store_file(doc_dir: str, num_shards: int, shard_index: int) -> str | None:
+    return shard_file(doc_dir, "store", num_shards, shard_index)
+
+def _open(path: str) -> IndexStore:
+    return JsonStore(path) if path.endswith(".json") else SqliteStore(path)
+
+def merge_stores(target: IndexStore, sources: list[str], check_files: bool = True) -> dict:
+    """
+    Merge per-shard index stores into target.
+
+    When several stores (or target) map an id to different paths, the first
+    one whose file exists wins, in the order target, sources. With
+    check_files, entries whose file is missing are dropped. Directory
+    signatures are merged keeping the most recent scan of each directory.
+
+    Returns:
+        dict: Counts of added, replaced, conflicting and missing entries.
+    """
+    merged = dict(target.items())
+    signatures = target.get_signatures()
+    counts = dict(added=0, replaced=0, conflicts=0, missing=0)
+    for source in sources:
+        store = _open(source)
+        for id, path in store.items():
+            if check_files and not os.path.isfile(path):
+                counts["missing"] += 1
+                continue
+            existing = merged.get(id)
+            if existing is None:
+                counts["added"] += 1
+            elif existing != path:
+                counts["conflicts"] += 1
+                if check_files and os.path.isfile(existing):
+                    continue
+                counts["replaced"] += 1
+            else:
+                continue
+            merged[id] = path
+        for d, sig in store.get_signatures().items():
+            if d not in signatures or sig["scanned_ns"] > signatures[d]["scanned_ns"]:
+                signatures[d] = sig
+        store.close()
+        logger.info(f"Merged {source}")
+    target.update(merged)
+    target.set_signatures(signatures)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Merge the index stores, run manifests and caches written by sharded runs."
+    )
+    parser.add_argument(
+        "stores",
+        nargs="*",
+        help="Shard stores to merge (default: TARGET_DIR/.store.shard-*.sqlite)"
+    )
+    parser.add_argument(
+        "--manifests",
+        nargs="*",
+        default=None,
+        help="Shard manifests to merge (default: TARGET_DIR/.manifest.shard-*.sqlite)"
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        type=str,
+        help="Manifest to merge into (default: TARGET_DIR/.manifest.sqlite)"
+    )
+    parser.add_argument(
+        "--target-dir",
+        type=str,
+        default="data/docs",
+        help="The shared document directory"
+    )
+    parser.add_argument(
+        "--store_file",
+        default=None,
+        type=str,
+        help="Store to merge into (default: the document directory's store)"
+    )
+    parser.add_argument(
+        "--store-backend",
+        default="sqlite",
+        choices=["sqlite", "json"],
+        help="Backend of the merged store (default: sqlite)"
+    )
+    parser.add_argument(
+        "--keep-missing",
+        action="store_true",
+        default=False,
+        help="Keep entries whose file does not exist on this machine"
+    )
+    args = parser.parse_args()
+
+    def shard_files(name):
+        return sorted(glob.glob(os.path.join(args.target_dir, f".{name}.shard-*.sqlite")))
+
+    sources = args.stores or shard_files("store")
+    manifests = args.manifests
+    if manifests is None:
+        manifests = shard_files("manifest")
+    hash_caches = shard_files("hashes")
+    metadata_caches = shard_files("metadata")
+    if not sources and not manifests and not hash_caches and not metadata_caches:
+        parser.error(f"No shard stores, manifests or caches found in {args.target_dir}.")
+    if sources:
+        target = open_store(args.target_dir, args.store_file, args.store_backend)
+        counts = merge_stores(target, sources, check_files=not args.keep_missing)
+        logger.info(f"Merged {len(sources)} stores into {target.path}: {counts}")
+        target.close()
+    if manifests:
+        manifest = RunManifest(args.manifest or os.path.join(args.target_dir, ".manifest.sqlite"))
+        manifest.merge(manifests)
+        logger.info(f"Merged {len(manifests)} manifests into {manifest.path}: {manifest.summary()}")
+        manifest.close()
+    # The shard caches are merged into the defaults of an unsharded run.
+    if hash_caches:
+        hashes = HashCache(os.path.join(args.target_dir, ".hashes.sqlite"))
+        hashes.merge(hash_caches)
+        logger.info(f"Merged {len(hash_caches)} hash caches into {hashes.path}")
+        hashes.close()
+    if metadata_caches:
+        metadata = MetadataCache(os.path.join(args.target_dir, ".metadata.sqlite"))
+        metadata.merge(metadata_caches)
+        logger.info(f"Merged {len(metadata_caches)} metadata caches into {metadata.path}")
+        metadata.close()
+
+if __name__ == "__main__":
+    main()
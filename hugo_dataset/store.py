@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+from hugo_dataset.connections import ThreadConnections, connect_wal
+from hugo_dataset.logger import get_logger
+logger = get_logger("store")
+
+class IndexStore(MutableMapping):
+    """
+    Mapping from document id to file path, plus the directory signatures used
+    by DocumentHandler.index.
+    """
+    path : str
+
+    def update(self, other=(), **kwargs):
+        for id, path in dict(other, **kwargs).items():
+            self[id] = path
+
+    def delete_many(self, ids):
+        for id in ids:
+            self.pop(id, None)
+
+    def get_signatures(self) -> dict:
+        raise NotImplementedError
+
+    def set_signatures(self, signatures: dict):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class JsonStore(IndexStore):
+    """
+    The original store: the whole index is read from a JSON file on first use
+    and written back by close(). Not safe for concurrent writers.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._data = None
+
+    @property
+    def data(self) -> dict:
+        if self._data is None:
+            self._data = {}
+            if os.path.isfile(self.path):
+                with open(self.path) as inp:
+                    try:
+                        self._data = json.load(inp)
+                    except ValueError:
+                        logger.info(f"Failed to load index from {self.path}.")
+        return self._data
+
+    def __getitem__(self, id):
+        return self.data[id]
+
+    def __setitem__(self, id, path):
+        self.data[id] = path
+
+    def __delitem__(self, id):
+        del self.data[id]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def signatures_file(self):
+        return f"{os.path.splitext(self.path)[0]}.dirs.json"
+
+    def get_signatures(self) -> dict:
+        try:
+            with open(self.signatures_file) as inp:
+                return json.load(inp)
+        except (OSError, ValueError):
+            return {}
+
+    def set_signatures(self, signatures: dict):
+        os.makedirs(os.path.dirname(self.signatures_file) or ".", exist_ok=True)
+        with open(self.signatures_file, 'w') as out:
+            json.dump(signatures, out)
+
+    def close(self):
+        """WARNING: The index file is overwritten with this process's view of it."""
+        if self._data is None:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w') as out:
+            json.dump(self._data, out)
+
+class SqliteStore(IndexStore):
+    """
+    Index kept in SQLite (WAL mode). Every update is committed as it happens,
+    readers never load the whole index, and several processes can share one
+    store: writes take SQLite's write lock and wait up to `timeout` seconds
+    for other writers.
+    """
+    def __init__(self, path: str, timeout: float = 60):
+        self.path = path
+        self.timeout = timeout
+        self._connections = ThreadConnections(lambda: connect_wal(self.path, self.timeout, isolation_level=None))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self.transaction() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS store (id TEXT PRIMARY KEY, path TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS signatures (dir TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Take the write lock up front so concurrent writers queue instead of deadlocking.
+        """
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def __getitem__(self, id):
+        row = self._conn.execute("SELECT path FROM store WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            raise KeyError(id)
+        return row[0]
+
+    def __setitem__(self, id, path):
+        self._conn.execute("INSERT OR REPLACE INTO store VALUES (?, ?)", (id, path))
+
+    def __delitem__(self, id):
+        if self._conn.execute("DELETE FROM store WHERE id = ?", (id,)).rowcount == 0:
+            raise KeyError(id)
+
+    def __iter__(self):
+        return iter([row[0] for row in self._conn.execute("SELECT id FROM store")])
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM store").fetchone()[0]
+
+    def items(self):
+        return self._conn.execute("SELECT id, path FROM store").fetchall()
+
+    def update(self, other=(), **kwargs):
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR REPLACE INTO store VALUES (?, ?)", dict(other, **kwargs).items())
+
+    def delete_many(self, ids):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM store WHERE id = ?", ((id,) for id in ids))
+
+    def get_signatures(self) -> dict:
+        return {d: json.loads(data) for d, data in self._conn.execute("SELECT dir, data FROM signatures")}
+
+    def set_signatures(self, signatures: dict):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM signatures")
+            conn.executemany("INSERT INTO signatures VALUES (?, ?)",
+                             ((d, json.dumps(data)) for d, data in signatures.items()))
+
+    def migrate_json(self, json_path: str):
+        """
+        Import a .store.json index, and import it again whenever the file has
+        been modified since. On the first import existing entries win over
+        imported ones; on later imports the edited file's entries win.
+        """
+        key = f"migrated:{os.path.abspath(json_path)}"
+        if not os.path.isfile(json_path):
+            return
+        mtime_ns = os.stat(json_path).st_mtime_ns
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            try:
+                imported = json.loads(row[0])
+            except ValueError:
+                imported = None
+            if not isinstance(imported, dict):
+                # Recorded by a version that imported once only: treat the file as imported as it is.
+                with self.transaction() as conn:
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                 (key, json.dumps(dict(mtime_ns=mtime_ns, entries=row[0]))))
+                return
+            if mtime_ns <= imported.get("mtime_ns", 0):
+                return
+        legacy = JsonStore(json_path)
+        with self.transaction() as conn:
+            conn.executemany(f"INSERT OR {'IGNORE' if row is None else 'REPLACE'} INTO store VALUES (?, ?)",
+                             legacy.items())
+            conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         (key, json.dumps(dict(mtime_ns=mtime_ns, entries=len(legacy)))))
+        logger.info(f"Imported {len(legacy)} entries from {json_path} into {self.path}")
+
+    def close(self):
+        self._connections.close()
+
+def open_store(doc_dir: str, store_file: str | None = None, backend: str = "sqlite") -> IndexStore:
+    """
+    Open the index store for a document directory.
+
+    With the sqlite backend a JSON store_file (or doc_dir/.store.json) is
+    imported into a SQLite store next to it, and again after it is edited.
+    """
+    if backend == "json":
+        return JsonStore(store_file or os.path.join(doc_dir, ".store.json"))
+    if backend != "sqlite":
+        raise ValueError(f"Unsupported store backend {backend}.")
+    json_path = os.path.join(doc_dir, ".store.json")
+    if store_file and store_file.endswith(".json"):
+        json_path = store_file
+        store_file = f"{os.path.splitext(store_file)[0]}.sqlite"
+    store = SqliteStore(store_file or os.path.join(doc_dir, ".store.sqlite"))
+    store.migrate_json(json_path)
+    return store
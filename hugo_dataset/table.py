@@ -0,0 +1,275 @@
+from functools import cache
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+from pydantic import BaseModel
+
+from hugo_dataset.evidence import UNKNOWN_LICENSE, Paper
+from hugo_dataset.sharding import in_shard
+
+# pyarrow is imported on first use, like datasets, so importing the loaders stays cheap.
+if TYPE_CHECKING:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+REQUIRED_COLUMNS = ("id", "url", "source")
+LOWERCASE_COLUMNS = ("source", "license_type")
+
+@cache
+def paper_schema() -> "pa.Schema":
+    """
+    Column order and types of the "papers" split.
+    """
+    import pyarrow as pa
+    return pa.schema([(name, pa.string()) for name in Paper.model_fields])
+
+def __getattr__(name):
+    if name == "PAPER_SCHEMA":
+        return paper_schema()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+class PaperFilter(BaseModel):
+    """
+    Row predicates and column projection applied while papers are read.
+
+    None and empty lists mean "no restriction", except for licenses where an
+    empty list matches nothing. Years are compared as
+    integers for integer columns and as strings otherwise (fine for the
+    four-digit years the datasets store).
+    """
+    licenses : list[str] | None = None
+    sources : list[str] = []
+    ids : list[str] = []
+    min_year : int | None = None
+    max_year : int | None = None
+    columns : list[str] | None = None
+    num_shards : int = 1 # Keep only the papers of shard shard_index (see hugo_dataset.sharding)
+    shard_index : int = 0
+
+    def __bool__(self):
+        return bool(self.licenses is not None or self.sources or self.ids or self.columns is not None
+                    or self.min_year is not None or self.max_year is not None or self.num_shards > 1)
+
+    def expression(self, schema: "pa.Schema | None" = None) -> "pc.Expression | None":
+        """
+        The row predicate as a pyarrow expression (None if every row passes).
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        terms = []
+        if self.licenses is not None:
+            licenses = [license.lower() for license in self.licenses]
+            term = pc.field("license_type").isin(pa.array(licenses, pa.string()))
+            if UNKNOWN_LICENSE in licenses:
+                # Missing licenses become UNKNOWN_LICENSE when validated.
+                term = term | pc.field("license_type").is_null()
+            terms.append(term)
+        if self.sources:
+            terms.append(pc.field("source").isin(pa.array([source.lower() for source in self.sources], pa.string())))
+        if self.ids:
+            terms.append(pc.field("id").isin(pa.array(self.ids, pa.string())))
+        year = str
+        if schema is not None and "year" in schema.names and pa.types.is_integer(schema.field("year").type):
+            year = int
+        if self.min_year is not None:
+            terms.append(pc.field("year") >= year(self.min_year))
+        if self.max_year is not None:
+            terms.append(pc.field("year") <= year(self.max_year))
+        if not terms:
+            return None
+        expression = terms[0]
+        for term in terms[1:]:
+            expression = expression & term
+        return expression
+
+    def predicate_columns(self) -> set[str]:
+        """
+        The columns expression() reads.
+        """
+        columns = set()
+        if self.licenses is not None:
+            columns.add("license_type")
+        if self.sources:
+            columns.add("source")
+        if self.ids:
+            columns.add("id")
+        if self.min_year is not None or self.max_year is not None:
+            columns.add("year")
+        return columns
+
+    def projection(self, names: list[str]) -> list[str]:
+        """
+        The columns of names to keep. id, url, source and license_type are always kept.
+        """
+        if self.columns is None:
+            return list(names)
+        keep = set(self.columns) | set(REQUIRED_COLUMNS) | {"license_type"}
+        return [name for name in names if name in keep]
+
+    def apply(self, table: "pa.Table") -> "pa.Table":
+        """
+        Filter and project table. Only the projected columns and the small
+        columns the predicate needs are read before rows are selected.
+        """
+        columns = self.projection(table.column_names)
+        expression = self.expression(table.schema)
+        if expression is None and self.num_shards <= 1:
+            return table.select(columns)
+        scan = [name for name in table.column_names
+                if name in columns or name in ("id", "source", "year", "license_type")]
+        table = table.select(scan)
+        if expression is not None:
+            table = table.filter(expression)
+        if self.num_shards > 1:
+            # No Arrow kernel computes a stable hash, so the shard mask is built from the id column alone.
+            import pyarrow as pa
+            ids = table.column("id").to_pylist()
+            table = table.filter(pa.array([in_shard(id, self.num_shards, self.shard_index) for id in ids]))
+        return table.select(columns)
+
+class PaperRow:
+    """
+    Read-only view of one row of a PaperTable with the attributes of a Paper.
+    Values are read from the Arrow columns on access.
+    """
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "pa.Table", index: int):
+        self._table = table
+        self._index = index
+
+    def __getattr__(self, name):
+        if name not in Paper.model_fields:
+            raise AttributeError(name)
+        return self._table.column(name)[self._index].as_py()
+
+    @property
+    def expected_hash(self):
+        return self.hash
+
+    def to_dict(self) -> dict:
+        return {name: self._table.column(name)[self._index].as_py() for name in Paper.model_fields}
+
+    def to_paper(self) -> Paper:
+        return _construct(self.to_dict())
+
+    def __repr__(self):
+        return f"PaperRow({self.to_dict()})"
+
+def _construct(row: dict) -> Paper:
+    # Rows of a validated PaperTable already satisfy Paper's constraints.
+    paper = Paper.model_construct(**row)
+    paper._expected_hash = paper.hash
+    return paper
+
+class PaperTable:
+    """
+    Columnar collection of papers backed by a pyarrow Table.
+
+    Columns are exposed without copying (column()), rows as lightweight
+    PaperRow views, and validation is done once per column with Arrow compute
+    kernels instead of once per row with pydantic. Conversion to and from
+    datasets.Dataset shares the underlying Arrow buffers.
+    """
+    def __init__(self, table: "pa.Table", validate: bool = True):
+        self.table = self.validate(table) if validate else table
+
+    @staticmethod
+    def validate(table: "pa.Table") -> "pa.Table":
+        """
+        Bulk equivalent of Paper validation: require id, url and source,
+        coerce every column to string, lowercase source and license_type, and
+        default missing licenses. Columns Paper does not know are dropped.
+
+        Raises:
+            ValueError: If a required column is missing or has null values.
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        columns = []
+        for field in paper_schema():
+            name = field.name
+            if name in table.column_names:
+                column = table.column(name)
+                if column.type != pa.string():
+                    column = pc.cast(column, pa.string())
+            elif name in REQUIRED_COLUMNS:
+                raise ValueError(f"Missing required column '{name}'.")
+            else:
+                column = pa.nulls(len(table), pa.string())
+            if name in REQUIRED_COLUMNS and column.null_count:
+                raise ValueError(f"Column '{name}' has {column.null_count} missing values.")
+            if name == "license_type":
+                column = pc.fill_null(column, UNKNOWN_LICENSE)
+            if name in LOWERCASE_COLUMNS:
+                column = pc.utf8_lower(column)
+            columns.append(column)
+        return pa.Table.from_arrays(columns, schema=paper_schema())
+
+    @classmethod
+    def from_papers(cls, papers: Iterable[Paper | dict]) -> "PaperTable":
+        """
+        Build a table from Paper objects (or dicts with the same keys).
+        """
+        import pyarrow as pa
+        rows = [paper if isinstance(paper, dict) else paper.__dict__ for paper in papers]
+        columns = {name: [row.get(name) for row in rows] for name in Paper.model_fields}
+        return cls(pa.table(columns))
+
+    @classmethod
+    def concat(cls, tables: Iterable["PaperTable"]) -> "PaperTable":
+        """
+        The rows of every table, in order (an empty table if there are none).
+        """
+        import pyarrow as pa
+        return cls(pa.concat_tables([paper_schema().empty_table(), *(table.table for table in tables)]), validate=False)
+
+    @classmethod
+    def from_dataset(cls, dataset, paper_filter: PaperFilter | None = None, validate: bool = True) -> "PaperTable":
+        """
+        Wrap a datasets.Dataset without copying its Arrow data. With a
+        paper_filter only the matching rows and projected columns are copied
+        out of the (memory-mapped) dataset.
+        """
+        if dataset._indices is not None:
+            # A selected/filtered dataset: materialize the selected rows first.
+            dataset = dataset.flatten_indices()
+        table = dataset.data.table
+        if paper_filter:
+            table = paper_filter.apply(table)
+        return cls(table, validate=validate)
+
+    def to_dataset(self):
+        """
+        A datasets.Dataset sharing this table's Arrow buffers.
+        """
+        from datasets import Dataset
+        from datasets.table import InMemoryTable
+        return Dataset(InMemoryTable(self.table))
+
+    def column(self, name: str) -> "pa.ChunkedArray":
+        return self.table.column(name)
+
+    def filter(self, mask) -> "PaperTable":
+        return PaperTable(self.table.filter(mask), validate=False)
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getitem__(self, index: int) -> PaperRow:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return PaperRow(self.table, index)
+
+    def __iter__(self) -> Iterator[PaperRow]:
+        for index in range(len(self)):
+            yield PaperRow(self.table, index)
+
+    def iter_papers(self, batch_size: int = 4096) -> Iterator[Paper]:
+        """
+        Yield mutable Paper objects (e.g. for hydration) without re-validating each row.
+        """
+        for batch in self.table.to_batches(max_chunksize=batch_size):
+            for row in batch.to_pylist():
+                yield _construct(row)
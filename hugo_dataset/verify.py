@@ -0,0 +1,107 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Iterable
+
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.hashing import file_digest
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("verify")
+
+STATUSES = ("ok", "mismatch", "missing", "skipped", "error")
+
+def _hash_document(task):
+    """
+    Process-pool worker: hash one document. Returns (stat, digest, error).
+    """
+    path, hash_algo = task
+    try:
+        st = os.stat(path)
+        return st, file_digest(path, hash_algo), None
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}"
+
+def verify_documents(papers: Iterable[Paper], document_handler: DocumentHandler, allowed=None,
+                     workers: int | None = None, hash_algo: str = "md5", chunksize: int = 8) -> dict:
+    """
+    Hash the documents already in the document handler's store in a process
+    pool and compare them with each paper's expected_hash. Nothing is downloaded.
+
+    Args:
+        papers: The papers to check.
+        document_handler: Resolves paper ids to files (see DocumentHandler.locate).
+        allowed: Optional predicate; papers it rejects are reported as skipped.
+        workers: Hashing processes (default: one per CPU).
+
+    Returns:
+        dict: A report with a summary, throughput numbers and one entry per paper.
+    """
+    started = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    documents = []
+    tasks = []
+    for paper in papers:
+        record = dict(id=paper.id, source=paper.source, expected=paper.expected_hash, actual=None, path=None)
+        documents.append(record)
+        if allowed is not None and not allowed(paper):
+            record.update(status="skipped", reason=f"license '{paper.license_type}' not allowed")
+            continue
+        if not paper.expected_hash:
+            record.update(status="skipped", reason="no expected hash")
+            continue
+        path = document_handler.locate(paper.id, paper.source)
+        if not path or not os.path.isfile(path):
+            record.update(status="missing", path=path)
+            continue
+        record["path"] = path
+        tasks.append(record)
+
+    hashes = document_handler.hashes
+    total_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_hash_document, [(r["path"], hash_algo) for r in tasks], chunksize=chunksize)
+        for record, (st, digest, error) in zip(tasks, results):
+            if error:
+                record.update(status="error", reason=error)
+                continue
+            total_bytes += st.st_size
+            record["actual"] = digest
+            record["status"] = "ok" if digest == record["expected"] else "mismatch"
+            if record["status"] == "mismatch":
+                logger.info(f"Hash mismatch for {record['id']}: Expected {record['expected']}, got {digest}")
+            if hashes is not None:
+                hashes.store(record["path"], hash_algo, digest, st)
+
+    seconds = time.perf_counter() - start
+    summary = {status: 0 for status in STATUSES}
+    for record in documents:
+        summary[record["status"]] += 1
+    return dict(
+        started=started.isoformat(),
+        hash_algo=hash_algo,
+        seconds=seconds,
+        summary=summary,
+        throughput=dict(
+            files=len(tasks),
+            bytes=total_bytes,
+            files_per_second=len(tasks) / seconds if seconds else None,
+            mb_per_second=total_bytes / 1e6 / seconds if seconds else None,
+        ),
+        documents=documents,
+    )
+
+def failed(summary: dict, allow_missing: bool = False) -> bool:
+    """
+    Whether a verification summary should fail the run: any mismatch or
+    error, or any missing document unless allow_missing.
+    """
+    return bool(summary["mismatch"] or summary["error"] or (summary["missing"] and not allow_missing))
+
+def write_report(report: dict, path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as out:
+        json.dump(report, out, indent=2)
+    logger.info(f"Verification report written to {path}")
@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Iterable, Iterator, Mapping
+
+from pydantic import BaseModel, ConfigDict
+
+from hugo_dataset import metrics
+from hugo_dataset.evidence import Paper
+from hugo_dataset.hashing import HashCache, file_digest
+from hugo_dataset.retrievers.base import CHUNK_SIZE, write_atomic
+from hugo_dataset.retrievers.transport import get_transport
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("zotero")
+
+class AttachmentResult(BaseModel):
+    """
+    The outcome of fetching one Zotero attachment.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    paper : Paper
+    key : str | None = None
+    dest : str | None = None
+    status : str # "downloaded", "skipped" (already present), "missing" (no attachment) or "failed"
+    error : Exception | None = None
+
+class ZoteroDownloader(BaseModel):
+    """
+    Download Zotero attachments with at most `workers` transfers in flight.
+
+    Files are streamed to disk (through the shared transport when the client
+    is a pyzotero.Zotero, otherwise from client.file(key)) and renamed into
+    place once complete. Attachments whose local copy already has the size
+    and md5 Zotero reports are not downloaded again. The md5 is recorded in
+    the hash cache and set as Paper.hash, so the document is not read again
+    to hash it.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    client : object # pyzotero.zotero.Zotero, or anything with file(key) -> bytes
+    workers : int = 4
+    hash_cache : HashCache | None = None
+
+    def _chunks(self, key: str):
+        client = self.client
+        if all(hasattr(client, attr) for attr in ("endpoint", "library_type", "library_id", "api_key")):
+            url = f"{client.endpoint}/{client.library_type}/{client.library_id}/items/{key}/file"
+            headers = {"Zotero-API-Version": "3"}
+            if client.api_key:
+                # Not Zotero-API-Key: requests drops Authorization when the file redirects to another host (S3).
+                headers["Authorization"] = f"Bearer {client.api_key}"
+            with get_transport().get(url, headers=headers, stream=True) as response:
+                response.raise_for_status()
+                yield from response.iter_content(CHUNK_SIZE)
+            return
+        content = client.file(key)
+        for start in range(0, len(content), CHUNK_SIZE):
+            yield content[start:start + CHUNK_SIZE]
+
+    def _digest(self, path: str) -> str:
+        if self.hash_cache is not None:
+            return self.hash_cache.digest(path)
+        return file_digest(path)
+
+    def _present(self, dest: str, meta: dict) -> bool:
+        if not os.path.isfile(dest) or (meta.get("md5") is None and meta.get("size") is None):
+            return False
+        if meta.get("size") is not None and os.stat(dest).st_size != meta["size"]:
+            return False
+        return meta.get("md5") is None or self._digest(dest) == meta["md5"]
+
+    def fetch(self, paper: Paper, key: str | None, dest: str | None, meta: dict | None = None) -> AttachmentResult:
+        """
+        Make sure the attachment `key` is at dest.
+        """
+        if not key:
+            return AttachmentResult(paper=paper, status="missing")
+        meta = meta or {}
+        try:
+            present = self._present(dest, meta)
+            metrics.record_cache("zotero_attachment", present)
+            if present:
+                paper.hash = meta.get("md5") or paper.hash
+                return AttachmentResult(paper=paper, key=key, dest=dest, status="skipped")
+            os.makedirs(os.path.dirname(dest) or ".", exist_ok=True)
+            _, digest = write_atomic(dest, self._chunks(key))
+            metrics.get_metrics().counter("hugo_download_bytes_total", "Bytes downloaded by source").inc(
+                os.path.getsize(dest), source="zotero")
+            if meta.get("md5") and digest != meta["md5"]:
+                os.unlink(dest)
+                raise ValueError(f"md5 mismatch for attachment {key}: expected {meta['md5']}, got {digest}")
+            if self.hash_cache is not None:
+                self.hash_cache.store(dest, "md5", digest, trusted=True)
+            paper.hash = digest
+            return AttachmentResult(paper=paper, key=key, dest=dest, status="downloaded")
+        except Exception as e:
+            return AttachmentResult(paper=paper, key=key, dest=dest, status="failed", error=e)
+
+    def download(self, jobs: Iterable[tuple[Paper, str | None, str | None]],
+                 attachments: Mapping[str, dict] | None = None) -> Iterator[AttachmentResult]:
+        """
+        Fetch the attachment of every (paper, key, dest) job and yield the
+        results as they complete. jobs may be a lazy iterator; at most twice
+        `workers` jobs are held at once.
+
+        Args:
+            jobs: As produced by ZoteroProcessor.
+            attachments: Attachment key -> md5 and size (ZoteroProcessor.attachments), to skip files already present.
+        """
+        # Not `attachments or {}`: a processor's (still empty) mapping fills up as jobs are produced.
+        attachments = {} if attachments is None else attachments
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = set()
+            for paper, key, dest in jobs:
+                pending.add(pool.submit(self.fetch, paper, key, dest, attachments.get(key)))
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    yield from (future.result() for future in done)
+            for future in as_completed(pending):
+                yield future.result()
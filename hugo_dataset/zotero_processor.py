@@ -1,118 +1,217 @@
+import json
 import os
 import urllib
-from pydantic import BaseModel
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator
+from pydantic import BaseModel, PrivateAttr
 from hugo_dataset import retrievers
 from hugo_dataset.evidence import Paper
 
+from hugo_dataset.logger import get_logger
+logger = get_logger("zotero")
+
 def process_zotero_items(items, download_dir=None):
     """
     Process a list of Zotero JSON items and return a list of dictionaries
     representing papers with keys:
-      - 'id': the Zotero key
       - 'title': the paper title
       - 'abstract': the abstract (if any)
       - 'year': extracted from 'parsedDate' or 'date'
       - 'url': the URL of the paper
       - 'source': the publisher (extracted from extra or fallback fields)
+      - 'id': the paper id, derived from the URL
       - 'document_path': path to the downloaded document (if an attachment exists)
       
     Args:
-        items (list): A list of Zotero JSON dictionaries.
+        items (Iterable): Zotero JSON dictionaries (a list, pages or a lazy iterator).
         download_dir (str): Optional. The directory where downloaded documents reside.
     
     Returns:
         list: A list of processed paper dictionaries.
     """
-    # Build a mapping from parent item id to attachment data.
-    attachments = {}
-    for item in items:
-        data = item.get("data", {})
-        item_type = data.get("itemType", "")
-        if item_type == "attachment":
-            parent = data.get("parentItem")
-            if parent:
-                # For simplicity, if multiple attachments exist, take the first one.
-                attachments[parent] = data
-
+    zp = ZoteroProcessor(download_dir=download_dir)
     processed = []
-    for item in items:
-        data = item.get("data", {})
-        item_type = data.get("itemType", "")
-        # Skip attachment items—they will be merged with their parent.
-        if item_type == "attachment":
-            continue
+    for paper, key, _ in zp.stream(items):
+        entry = dict(title=paper.title, abstract=paper.abs, year=paper.year, url=paper.url,
+                     source=paper.source, id=paper.id)
+        filename = zp.attachments[key]["filename"] if key else None
+        if filename:
+            entry["document_path"] = os.path.join(download_dir, filename) if download_dir else filename
+        processed.append(entry)
+    return processed
 
-        paper = {}
+def iter_items(zot, first_page) -> Iterator[dict]:
+    """
+    Yield the items of a pyzotero query page by page, e.g.
+    iter_items(zot, zot.collection_items(collection, limit=100)).
+    Clients without paging (e.g. test fakes) return everything in first_page.
+    """
+    # Taken now: requests made before the items are consumed replace zot.links.
+    links = dict(getattr(zot, "links", None) or {})
+    return _pages(zot, first_page, links)
+
+def _pages(zot, first_page, links) -> Iterator[dict]:
+    yield from first_page
+    if hasattr(zot, "iterfollow") and links.get("next"):
+        # Follow the "next" links from the second page on (makeiter would fetch first_page again).
+        zot.links = links
+        for page in zot.iterfollow():
+            yield from page
+
+def iter_jsonl(path: str) -> Iterator[dict]:
+    """
+    Yield the items of a JSON-lines export (one Zotero item per line).
+    """
+    with open(path) as inp:
+        for line in inp:
+            if line.strip():
+                yield json.loads(line)
 
-        paper["title"] = data.get("title", "")
-        paper["abstract"] = data.get("abstractNote", "")
+def attachment_meta(item: dict) -> dict:
+    """
+    The md5, size and filename Zotero reports for an attachment item (any may be None).
+    """
+    data = item.get("data", {})
+    size = item.get("links", {}).get("enclosure", {}).get("length")
+    return dict(md5=data.get("md5"), size=int(size) if size is not None else None,
+                filename=data.get("filename"))
 
-        # Determine the year from 'parsedDate' (preferred) or 'date'.
-        parsed_date = data.get("parsedDate")
-        if parsed_date and len(parsed_date) >= 4:
-            paper["year"] = parsed_date[:4]
-        else:
-            date_str = data.get("date", "")
-            paper["year"] = date_str[:4] if date_str and len(date_str) >= 4 else ""
+class ZoteroProcessor(BaseModel):
+    """
+    Turn Zotero items into (Paper, attachment key, attachment destination) tuples.
+
+    stream() makes a single pass over any iterable of items (pages of the
+    API, a JSON-lines export), joining attachments to their parents in
+    whichever order they arrive. A paper is yielded as soon as it has an
+    attachment or all of its meta.numChildren children were seen; children
+    that arrive before their parent are buffered until it does. Nothing is
+    kept for a paper once it is yielded, and at most max_pending papers
+    waiting for children (and parents of buffered children) are held: beyond
+    that the oldest are yielded with what they have, so memory does not grow
+    with the size of the library.
+    """
+    items: list[dict] = []
+    download_dir: str | None = None
+    max_pending: int = 10000 # Items held while waiting for their children or parent
+    _attachments: dict = PrivateAttr(default_factory=dict)
+    _emitted: OrderedDict = PrivateAttr(default_factory=OrderedDict)
 
-        paper["url"] = data.get("url", "")
+    @property
+    def attachments(self) -> dict[str, dict]:
+        """
+        Attachment key -> attachment_meta() of the attachment just yielded.
+        An entry is dropped when the next item is read, so look it up as soon
+        as stream() yields its paper.
+        """
+        return self._attachments
 
-        # Determine the source (publisher) from the extra field if present.
-        extra = data.get("extra", "")
-        import urllib
-        if data.get("url"):
-            source = urllib.parse.urlparse(data['url']).netloc.split(".")[-2] 
-        elif "Publisher:" in extra:
-            # Extract publisher name after "Publisher:".
-            # This simple implementation takes the entire remainder; adjust as needed.
-            source = extra.split("Publisher:")[-1].strip()
-        else:
-            # Fallback: for journal articles use 'publicationTitle', for webpages use 'websiteTitle'
-            if data.get("itemType") == "journalArticle":
-                source = data.get("publicationTitle", "")
-            elif data.get("itemType") == "webpage":
-                source = data.get("websiteTitle", "")
-        paper["source"] = source
-
-        # Use the item's key as the id.
-        paper["id"] = retrievers.get_id_from_url(url=paper['url']) 
-        
+    def _paper(self, item: dict, attachment: dict | None) -> tuple[Paper, str | None, str | None]:
+        data = item.get("data", {})
+        url = data.get("url", "")
+        paper_id = retrievers.get_id_from_url(url=url)
+        key = None
+        dest = None
+        if attachment:
+            key = attachment.get("key")
+            dest = f"{self.download_dir}/{paper_id}.{(attachment.get('data', {}).get('filename') or 'txt').split('.')[-1]}"
+            self._attachments[key] = attachment_meta(attachment)
+        paper = Paper(
+            id=paper_id,
+            url=url,
+            source=self._extract_source(data),
+            year=self._extract_year(data),
+            title=data.get("title", ""),
+            abs=data.get("abstractNote", "")
+        )
+        return paper, key, dest
+
+    def stream(self, items: Iterable[dict],
+               on_paper: Callable[[str, Paper], None] | None = None) -> Iterator[tuple[Paper, str | None, str | None]]:
+        """
+        Yield (paper, attachment key, destination) for every top-level item.
+        If a paper has several attachments, the first one seen is used.
 
-        # If an attachment exists for this paper, include its document path.
-        # The attachment is identified by its 'parentItem' key.
-        attach = attachments.get(item["key"])
-        if attach:
-            filename = attach.get("filename", "")
-            if filename:
-                if download_dir:
-                    document_path = os.path.join(download_dir, filename)
+        Args:
+            items: Zotero JSON dictionaries (a list, pages or a lazy iterator).
+            on_paper: Optional callback invoked with the Zotero item key and
+                the paper of every top-level item, before it is yielded.
+        """
+        parents = OrderedDict() # key -> item, papers still waiting for their children
+        children = OrderedDict() # parent key -> [number of children seen, first attachment]
+
+        def complete(key):
+            seen, attachment = children.get(key, (0, None))
+            expected = parents[key].get("meta", {}).get("numChildren")
+            # Without numChildren (e.g. some exports) wait until the item is flushed.
+            return attachment is not None or (expected is not None and seen >= expected)
+
+        def emit(key):
+            item = parents.pop(key)
+            _, attachment = children.pop(key, (0, None))
+            paper, attachment_key, dest = self._paper(item, attachment)
+            # Recognizes the children that arrive after their parent was yielded.
+            self._emitted[key] = None
+            if len(self._emitted) > self.max_pending:
+                self._emitted.popitem(last=False)
+            if on_paper:
+                on_paper(key, paper)
+            yield paper, attachment_key, dest
+            self._attachments.pop(attachment_key, None)
+
+        def flush():
+            # The oldest waiting parents go out with what they have; children of
+            # parents that never showed up are dropped.
+            dropped = 0
+            while len(parents) + len(children) > self.max_pending:
+                if parents:
+                    yield from emit(next(iter(parents)))
                 else:
-                    document_path = filename
-                paper["document_path"] = document_path
-
-        processed.append(paper)
-
-    return processed
-
-
-class ZoteroProcessor(BaseModel):
-    items: list[dict]
-    download_dir: str | None = None
+                    children.popitem(last=False)
+                    dropped += 1
+            if dropped:
+                logger.debug(f"Ignored the children of {dropped} items not seen in the last {self.max_pending}.")
 
-    def _build_attachments_mapping(self) -> dict:
+        for item in items:
+            data = item.get("data", {})
+            parent = data.get("parentItem")
+            if parent:
+                # An attachment or note; merged with its parent item.
+                if parent in self._emitted:
+                    # The parent was already yielded.
+                    continue
+                entry = children.setdefault(parent, [0, None])
+                entry[0] += 1
+                if data.get("itemType") == "attachment" and entry[1] is None:
+                    entry[1] = dict(key=item.get("key", data.get("key")), data=data, links=item.get("links", {}))
+                if parent in parents and complete(parent):
+                    yield from emit(parent)
+                yield from flush()
+                continue
+            if data.get("itemType") == "attachment":
+                # A standalone attachment has no metadata to build a paper from.
+                continue
+            parents[item["key"]] = item
+            if complete(item["key"]):
+                yield from emit(item["key"])
+            yield from flush()
+        # Parents whose remaining children are not in the input.
+        for key in list(parents):
+            yield from emit(key)
+        if children:
+            logger.debug(f"Ignored the children of {len(children)} items that are not in the input.")
+        children.clear()
+        self._emitted.clear()
+
+    def process(self) -> list[tuple[Paper, str | None, str | None]]:
         """
-        Build a mapping from parent item id to attachment data.
-        If multiple attachments exist for a paper, the first encountered is used.
+        Process self.items and return a list of (Paper, attachment key, destination) tuples.
+        
+        For each top-level item, the method extracts:
+            - title, abstract (mapped to Paper.abs), year, URL, and source.
+            - a unique id generated from the URL.
+            - the key and destination of its attachment, if it has one.
         """
-        attachments = {}
-        for item in self.items:
-            data = item.get("data", {})
-            item_type = data.get("itemType", "")
-            if item_type == "attachment":
-                parent = data.get("parentItem")
-                if parent:
-                    attachments[parent] = data
-        return attachments
+        return list(self.stream(self.items))
 
     def _extract_year(self, data: dict) -> str:
         """
@@ -133,7 +232,11 @@ class ZoteroProcessor(BaseModel):
         extra = data.get("extra", "")
         url = data.get("url", "")
         if url:
-            # This extracts the second-level domain (e.g., "example" from "www.example.com")
+            # The registered source for the URL's host (e.g. "acl anthology" for aclanthology.org),
+            # otherwise the second-level domain (e.g., "example" from "www.example.com")
+            source = retrievers.get_router().source(url)
+            if source is not None:
+                return source
             return urllib.parse.urlparse(url).netloc.split(".")[-2]
         elif "Publisher:" in extra:
             return extra.split("Publisher:")[-1].strip()
@@ -144,50 +247,3 @@ class ZoteroProcessor(BaseModel):
             elif item_type == "webpage":
                 return data.get("websiteTitle", "")
         return ""
-
-    def process(self) -> list[Paper]:
-        """
-        Process the Zotero items and return a list of Paper objects.
-        
-        For each non-attachment item, the method extracts:
-            - title, abstract (mapped to Paper.abs), year, URL, and source.
-            - a unique id generated from the URL.
-            - document_path if an attachment exists.
-        """
-        attachments = self._build_attachments_mapping()
-        papers = []
-        for item in self.items:
-            data = item.get("data", {})
-            item_type = data.get("itemType", "")
-            # Skip attachments – they are merged with their parent items.
-            if item_type == "attachment":
-                continue
-
-            title = data.get("title", "")
-            abstract = data.get("abstractNote", "")
-            year = self._extract_year(data)
-            url = data.get("url", "")
-            source = self._extract_source(data)
-            paper_id = retrievers.get_id_from_url(url=url)
-            
-            # Check if there's an attachment for this paper.
-            key = None
-            dest = None
-            attachment = attachments.get(item["key"])
-            if attachment:
-                #filename = attachment.get("filename", "")
-                #if filename:
-                #    document_path = os.path.join(self.download_dir, filename) if self.download_dir else filename
-                key = attachment.get("key")
-                dest = f"{self.download_dir}/{paper_id}.{attachment.get('filename', 'txt').split('.')[-1]}"
-
-            paper = Paper(
-                id=paper_id,
-                url=url,
-                source=source,
-                year=year,
-                title=title,
-                abs=abstract
-            )
-            papers.append((paper, key, dest))
-        return papers
\ No newline at end of file
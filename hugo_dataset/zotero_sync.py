@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+from typing import Iterable, Iterator
+
+from pydantic import BaseModel
+
+from hugo_dataset.zotero_processor import iter_items
+
+from hugo_dataset.logger import get_logger
+logger = get_logger("zotero")
+
+class SyncDelta(BaseModel):
+    """
+    What changed in a collection since the previous sync.
+    """
+    version : int | None = None # Library version the stored items are now at
+    full : bool = False # No previous sync: every item is new
+    changed : list[str] = [] # Keys of top-level items added or modified (directly or through a child)
+    removed : dict[str, str | None] = {} # Keys of top-level items no longer in the collection -> their paper id
+
+class ZoteroSyncState:
+    """
+    Local copy (SQLite) of a Zotero collection's items and the library
+    version they were fetched at, so later syncs only fetch what changed.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    key TEXT PRIMARY KEY,
+                    parent TEXT,
+                    version INTEGER,
+                    data TEXT NOT NULL,
+                    paper_id TEXT
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS items_parent ON items (parent)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    @property
+    def version(self) -> int | None:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else None
+
+    def _set_version(self, version: int):
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (str(version),))
+
+    def has(self, key: str) -> bool:
+        return self._conn.execute("SELECT 1 FROM items WHERE key = ?", (key,)).fetchone() is not None
+
+    def parents(self) -> list[tuple[str, str | None]]:
+        """
+        (key, paper id) of every top-level item.
+        """
+        return self._conn.execute("SELECT key, paper_id FROM items WHERE parent IS NULL ORDER BY rowid").fetchall()
+
+    def items(self, keys: Iterable[str]) -> Iterator[dict]:
+        """
+        Yield the stored JSON of the top-level items keys, each followed by its children.
+        """
+        for key in keys:
+            for (data,) in self._conn.execute(
+                    "SELECT data FROM items WHERE key = ? OR parent = ? ORDER BY parent IS NOT NULL", (key, key)).fetchall():
+                yield json.loads(data)
+
+    def set_paper_ids(self, paper_ids: dict[str, str]):
+        with self._conn:
+            self._conn.executemany("UPDATE items SET paper_id = ? WHERE key = ?",
+                                   ((id, key) for key, id in paper_ids.items()))
+
+    def apply(self, version: int, changed: Iterable[dict], deleted: list[str], collection: str | None = None) -> SyncDelta:
+        """
+        Store the items changed since the last sync and drop deleted ones.
+
+        Top-level items outside `collection` (moved out of it) and trashed
+        items count as deleted. Children are kept when their parent is;
+        children seen before their parent wait until the end of changed.
+        """
+        delta = SyncDelta(version=version, full=self.version is None)
+        touched = set()
+        removed = set(deleted)
+        waiting = []
+
+        def add_child(item):
+            parent = item["data"]["parentItem"]
+            if parent in removed:
+                return True
+            if parent in touched or self.has(parent):
+                self._upsert(item, parent)
+                touched.add(parent)
+                return True
+            return False
+
+        with self._conn:
+            for item in changed:
+                data = item.get("data", {})
+                if data.get("parentItem"):
+                    if data.get("deleted"):
+                        removed.add(item["key"])
+                    elif not add_child(item):
+                        waiting.append(item)
+                elif data.get("deleted") or (collection and collection not in data.get("collections", [collection])):
+                    removed.add(item["key"])
+                else:
+                    self._upsert(item, None)
+                    touched.add(item["key"])
+            for item in waiting:
+                # Children of items outside the collection are dropped here.
+                add_child(item)
+            for key in removed:
+                row = self._conn.execute("SELECT parent, paper_id FROM items WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                parent, paper_id = row
+                if parent is None:
+                    delta.removed[key] = paper_id
+                    self._conn.execute("DELETE FROM items WHERE parent = ?", (key,))
+                elif parent not in removed:
+                    touched.add(parent)
+                self._conn.execute("DELETE FROM items WHERE key = ?", (key,))
+            self._set_version(version)
+        delta.changed = [key for key in touched if key not in delta.removed and self.has(key)]
+        return delta
+
+    def _upsert(self, item: dict, parent: str | None):
+        self._conn.execute("INSERT OR REPLACE INTO items (key, parent, version, data, paper_id) VALUES "
+                           "(?, ?, ?, ?, (SELECT paper_id FROM items WHERE key = ?))",
+                           (item["key"], parent, item.get("version"), json.dumps(item), item["key"]))
+
+    def close(self):
+        self._conn.close()
+
+def sync(zot, collection: str, state: ZoteroSyncState) -> SyncDelta:
+    """
+    Bring state up to date with a collection of a pyzotero client.
+
+    The first sync fetches the whole collection. Later ones fetch only the
+    library's items modified since the stored version (including trashed
+    ones) and the keys deleted since then.
+    """
+    since = state.version
+    # Read the version first: anything modified while we fetch is fetched again next time.
+    version = zot.last_modified_version()
+    if since is None:
+        changed = iter_items(zot, zot.collection_items(collection))
+        deleted = []
+    elif since == version:
+        return SyncDelta(version=version)
+    else:
+        changed = iter_items(zot, zot.items(since=since, includeTrashed=1))
+        deleted = zot.deleted(since=since).get("items", [])
+    delta = state.apply(version, changed, deleted, collection=collection)
+    logger.info(f"Zotero sync {since} -> {version}: {len(delta.changed)} changed, {len(delta.removed)} removed")
+    return delta
@@ -1,32 +1,142 @@
 from hugo_dataset.create_dataset import DatasetManager
 from hugo_dataset.evidence import DocumentHandler
-from pyzotero import zotero
-from hugo_dataset.zotero_processor import ZoteroProcessor
+from hugo_dataset.table import PaperTable
+from hugo_dataset.zotero_downloader import ZoteroDownloader
+from hugo_dataset.zotero_processor import ZoteroProcessor, iter_items, iter_jsonl
+from hugo_dataset.zotero_sync import ZoteroSyncState, sync
+import argparse
+import glob
 import os
 
 
-def load(dataset_dir, download_dir : str="data/downloads", doc_dir : str="data/docs"):
+def _previous_papers(dataset_dir):
+    # Rows of the last saved dataset, read into memory since it is about to be overwritten.
+    from datasets import load_from_disk
+    if not os.path.isdir(dataset_dir):
+        return None
+    dataset = load_from_disk(dataset_dir, keep_in_memory=True)
+    return PaperTable.from_dataset(dataset["papers"])
+
+def merge_papers(updated, previous, ids):
+    """
+    The papers of ids, in that order, taken from updated or else from previous
+    (PaperTables, previous may be None). Ids in neither are left out.
+    """
+    tables = [updated] if previous is None else [updated, previous]
+    combined = PaperTable.concat(tables)
+    rows = {}
+    for row, id in enumerate(combined.column("id").to_pylist()):
+        rows.setdefault(id, row)
+    return PaperTable(combined.table.take([rows[id] for id in ids if id in rows]), validate=False)
+
+def remove_documents(document_handler, download_dir, ids):
+    """
+    Drop the index entries of papers removed from the collection and delete
+    the files this script wrote for them: their attachment in download_dir
+    and their stored document if it is under doc_dir or download_dir. Files
+    elsewhere (e.g. in a local directory) are kept.
+    """
+    owned = tuple(os.path.join(os.path.abspath(d), "") for d in (document_handler.doc_dir, download_dir))
+    store = document_handler.local_store
+    for id in ids:
+        paths = glob.glob(os.path.join(glob.escape(download_dir), f"{glob.escape(id)}.*"))
+        stored = store.get(id)
+        if stored:
+            paths.append(stored)
+        for path in paths:
+            if os.path.abspath(path).startswith(owned) and os.path.isfile(path):
+                os.unlink(path)
+    store.delete_many(ids)
+
+def load(dataset_dir, download_dir : str="data/downloads", doc_dir : str="data/docs", workers : int=4, zot=None,
+         incremental : bool=False, state_file : str | None=None, export : str | None=None):
+    """
+    Build (or with incremental, update) the dataset from a Zotero collection.
+
+    With incremental, the collection's items and the library version are kept
+    in state_file (default: download_dir/.zotero_sync.sqlite). Only items
+    modified since the last sync are fetched, downloaded and processed; the
+    other papers are carried over from the saved dataset, and the index
+    entries and downloaded documents of removed items are deleted.
+    With export, items are read from a JSON-lines export instead of the API
+    (attachments are still downloaded through the client).
+    """
     os.makedirs(download_dir, exist_ok=True)
 
-    zot = zotero.Zotero(os.environ["ZOTERO_LIBRARY"], "group", os.environ["ZOTERO_API_KEY"])
-    items = zot.collection_items(os.environ["ZOTERO_COLLECTION"])
-    zp = ZoteroProcessor(items=items, download_dir=download_dir)
-    processed_items = zp.process()
-
-    for p, key, dest in processed_items:
-        #print(p)
-        if key:
-            with open(dest, 'wb') as out:
-                out.write(zot.file(key))
-        else:
-            print("No file!", p.url)
-
-    manager = DatasetManager(papers=[p[0] for p in processed_items],
-        document_handler=DocumentHandler(doc_dir=doc_dir),
+    if zot is None:
+        from pyzotero import zotero
+        zot = zotero.Zotero(os.environ["ZOTERO_LIBRARY"], "group", os.environ["ZOTERO_API_KEY"])
+    collection = os.environ["ZOTERO_COLLECTION"]
+    document_handler = DocumentHandler(doc_dir=doc_dir)
+    state = None
+    previous = None
+    if export:
+        items = iter_jsonl(export)
+    elif incremental:
+        state = ZoteroSyncState(state_file or os.path.join(download_dir, ".zotero_sync.sqlite"))
+        delta = sync(zot, collection, state)
+        # Before process_all indexes download_dir, so the files are not picked up again.
+        kept = {id for _, id in state.parents()}
+        remove_documents(document_handler, download_dir,
+                         [id for id in delta.removed.values() if id is not None and id not in kept])
+        previous = None if delta.full else _previous_papers(dataset_dir)
+        previous_ids = set(previous.column("id").to_pylist()) if previous is not None else set()
+        changed = set(delta.changed)
+        # Items whose paper is missing from the saved dataset are processed again too.
+        changed.update(key for key, id in state.parents() if id not in previous_ids)
+        items = state.items([key for key, _ in state.parents() if key in changed])
+    else:
+        items = iter_items(zot, zot.collection_items(collection))
+    # Items are read page by page and papers are downloaded and processed as soon as they are complete.
+    zp = ZoteroProcessor(download_dir=download_dir)
+    paper_ids = {} # Zotero item key -> paper id, recorded in the sync state
+
+    def record(key, paper):
+        paper_ids[key] = paper.id
+
+    # Attachments already present with Zotero's size and md5 are skipped; the
+    # md5 goes to the hash cache so process_all does not read the files again.
+    downloader = ZoteroDownloader(client=zot, workers=workers, hash_cache=document_handler.hashes)
+
+    def papers():
+        for result in downloader.download(zp.stream(items, on_paper=record if state is not None else None),
+                                          attachments=zp.attachments):
+            if result.status in ("downloaded", "skipped"):
+                # Downloaded after process_all indexed download_dir.
+                document_handler.local_store[result.paper.id] = result.dest
+            elif result.status == "missing":
+                print("No file!", result.paper.url)
+            elif result.status == "failed":
+                print(f"Failed to download {result.key}: {result.error}")
+            yield result.paper
+
+    manager = DatasetManager(
+        document_handler=document_handler,
         dataset_dir=dataset_dir
-        ) # Process the predefined list of papers.
-    manager.process_all(additional_directories=[download_dir])
+        ) # Process the papers as they are downloaded; they are kept in manager.table.
+    manager.process_all(additional_directories=[download_dir], papers=papers())
+
+    if state is not None:
+        state.set_paper_ids(paper_ids)
+        # Unchanged papers come from the saved dataset; modified items move to the end.
+        manager.table = merge_papers(manager.table, previous, [id for _, id in state.parents()])
+        state.close()
     manager.save_dataset()
 
 if __name__ == "__main__":
-    load(download_dir = "data/zotero", doc_dir="data/msd_docs", dataset_dir="data/materials_sciences_demo")
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the dataset from a Zotero collection.")
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        default=False,
+        help="Only fetch and process the items changed since the last sync"
+    )
+    parser.add_argument(
+        "--export",
+        default=None,
+        type=str,
+        help="Read the items from a JSON-lines export instead of the Zotero API"
+    )
+    args = parser.parse_args()
+    load(download_dir = "data/zotero", doc_dir="data/msd_docs", dataset_dir="data/materials_sciences_demo",
+         incremental=args.sync, export=args.export)
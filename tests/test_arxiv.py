@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.server import StandInServer, _Handler
+from hugo_dataset.retrievers import arxiv, policy
+from hugo_dataset.retrievers.policy import RequestPolicy
+from hugo_dataset.retrievers.transport import Transport
+
+class FailingHandler(_Handler):
+    def do_GET(self):
+        self.server.requests += 1
+        if self.server.fail == "xml":
+            return self._send(200, b"<feed><entry>", "application/atom+xml")
+        if self.server.fail:
+            return self._send(503, b"unavailable")
+        return super().do_GET()
+
+class ArxivServer(StandInServer):
+    handler_class = FailingHandler
+
+    def __init__(self, documents):
+        super().__init__(documents)
+        self.fail = False
+        self.requests = 0
+
+@pytest.fixture
+def server(monkeypatch):
+    policy.reset()
+    # The server knows two papers; the feed only has entries for those.
+    with ArxivServer({"2101.00001": "", "2101.00002": ""}) as server:
+        monkeypatch.setattr(arxiv, "policy", RequestPolicy(max_retries=0))
+        monkeypatch.setattr(arxiv, "transport", Transport(host_map=server.host_map()))
+        yield server
+    policy.reset()
+
+def test_get_many_failed_request(server):
+    server.fail = True
+    failed = set()
+    assert arxiv.get_many(["2101.00001", "2101.00003"], failed=failed) == {}
+    assert failed == {"2101.00001", "2101.00003"}
+
+def test_get_many_partial_response(server, monkeypatch):
+    monkeypatch.setattr(arxiv, "batch_size", 2)
+    failed = set()
+    results = arxiv.get_many(["2101.00001", "2101.00003", "2101.00001", "2101.00002"], failed=failed)
+    # Ids the feed leaves out are missing from the results but did not fail.
+    assert sorted(results) == ["2101.00001", "2101.00002"]
+    assert failed == set()
+    assert server.requests == 2
+    assert results["2101.00002"] == dict(id="2101.00002", url="https://arxiv.org/pdf/2101.00002.pdf", source="arxiv",
+                                         title="Synthetic paper 2101.00002",
+                                         abs="Abstract of synthetic paper 2101.00002.", year="2021")
+
+def test_get_many_malformed_feed(server):
+    server.fail = "xml"
+    failed = set()
+    assert arxiv.get_many(["2101.00001"], failed=failed) == {}
+    assert failed == {"2101.00001"}
@@ -0,0 +1,108 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from benchmarks.server import StandInServer, _Handler
+from hugo_dataset.retrievers.base import Retriever
+from hugo_dataset.retrievers.policy import RequestPolicy
+from hugo_dataset.retrievers.transport import Transport
+
+DOCUMENT = bytes(range(256)) * 4096 # 1 MiB
+
+class stub(Retriever):
+    source = "stub"
+    policy = RequestPolicy(max_retries=0)
+    hosts = ("arxiv.org",)
+    url_pattern = r'arxiv\.org/pdf/([0-9]+\.[0-9]+)'
+
+class ShiftedRangeHandler(_Handler):
+    # Answers range requests from one byte past the requested offset.
+    def _send_file(self, path):
+        if "Range" in self.headers:
+            start = int(self.headers["Range"][len("bytes="):].split("-")[0]) + 1
+            self.headers.replace_header("Range", f"bytes={start}-")
+        return super()._send_file(path)
+
+class ShiftedRangeServer(StandInServer):
+    handler_class = ShiftedRangeHandler
+
+@pytest.fixture
+def document(tmp_path):
+    path = tmp_path / "served" / "2101.00001.pdf"
+    path.parent.mkdir()
+    path.write_bytes(DOCUMENT)
+    return str(path)
+
+def serve(server_class, document):
+    server = server_class({"2101.00001": document})
+    server.__enter__()
+    stub.transport = Transport(host_map=server.host_map())
+    return server
+
+@pytest.fixture
+def server(document):
+    server = serve(StandInServer, document)
+    yield server
+    stub.transport = None
+    server.__exit__()
+
+@pytest.fixture
+def shifted_server(document):
+    server = serve(ShiftedRangeServer, document)
+    yield server
+    stub.transport = None
+    server.__exit__()
+
+URL = "https://arxiv.org/pdf/2101.00001.pdf"
+
+def etag(path):
+    st = os.stat(path)
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def interrupted(target, document, received, validator=None):
+    # What an interrupted download leaves behind: a partial file and its journal.
+    with open(f"{target}.part", "wb") as f:
+        f.write(DOCUMENT[:received])
+    with open(f"{target}.part.json", "w") as f:
+        json.dump(dict(url=URL, validator=validator or etag(document), bytes=received), f)
+
+def check(target, result):
+    path, digest = result
+    assert path == target
+    assert open(target, "rb").read() == DOCUMENT
+    assert digest == hashlib.md5(DOCUMENT).hexdigest()
+    assert not os.path.exists(f"{target}.part") and not os.path.exists(f"{target}.part.json")
+
+def test_download(server, tmp_path):
+    target = str(tmp_path / "doc.pdf")
+    check(target, stub._download(URL, target))
+
+def test_resume(server, document, tmp_path):
+    target = str(tmp_path / "doc.pdf")
+    interrupted(target, document, 300_000)
+    check(target, stub._download(URL, target))
+
+def test_resume_complete_part(server, document, tmp_path):
+    # The journal covers the whole document: the server answers 416.
+    target = str(tmp_path / "doc.pdf")
+    interrupted(target, document, len(DOCUMENT))
+    check(target, stub._download(URL, target))
+
+def test_changed_document_starts_over(server, document, tmp_path):
+    # If-Range does not match: the server sends the whole document.
+    target = str(tmp_path / "doc.pdf")
+    interrupted(target, document, 300_000, validator='"stale"')
+    check(target, stub._download(URL, target))
+
+def test_unexpected_content_range_starts_over(shifted_server, document, tmp_path):
+    target = str(tmp_path / "doc.pdf")
+    interrupted(target, document, 300_000)
+    check(target, stub._download(URL, target))
+
+def test_get_remote_into_directory(server, tmp_path):
+    digests = []
+    path = stub._get_remote(URL, str(tmp_path), on_download=lambda path, algo, digest: digests.append(digest))
+    assert path == str(tmp_path / "2101.00001.pdf")
+    assert digests == [hashlib.md5(DOCUMENT).hexdigest()]
@@ -0,0 +1,59 @@
+import hashlib
+import os
+
+from hugo_dataset.evidence import DocumentHandler
+from hugo_dataset.hashing import HashCache
+
+def md5(content):
+    return hashlib.md5(content).hexdigest()
+
+def old_file(path, content):
+    path.write_bytes(content)
+    st = os.stat(path)
+    # Modified long before it is hashed, so the digest may be cached.
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 3600 * 10**9))
+    return str(path)
+
+def test_digests_are_reused_until_the_file_changes(tmp_path):
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    path = old_file(tmp_path / "paper.pdf", b"%PDF one")
+    assert cache.digest(path) == md5(b"%PDF one")
+    cache.store(path, "md5", "cached")
+    assert cache.digest(path) == "cached"
+    assert cache.digest(path, "sha256") == hashlib.sha256(b"%PDF one").hexdigest()
+
+    old_file(tmp_path / "paper.pdf", b"%PDF two, longer")
+    assert cache.lookup(path) is None
+    assert cache.digest(path) == md5(b"%PDF two, longer")
+    cache.close()
+
+def test_recently_modified_files_are_not_cached(tmp_path):
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    path = tmp_path / "paper.pdf"
+    path.write_bytes(b"%PDF-1.4")
+    cache.digest(str(path))
+    assert cache.lookup(str(path)) is None
+    # Unless the caller wrote the file itself.
+    cache.store(str(path), "md5", md5(b"%PDF-1.4"), trusted=True)
+    assert cache.lookup(str(path)) == md5(b"%PDF-1.4")
+    cache.close()
+
+def test_invalidate_and_force(tmp_path):
+    cache = HashCache(str(tmp_path / "hashes.sqlite"))
+    path = old_file(tmp_path / "paper.pdf", b"%PDF-1.4")
+    cache.store(path, "md5", "stale")
+    assert cache.digest(path, force=True) == md5(b"%PDF-1.4")
+    # The forced digest replaces the cached one.
+    assert cache.lookup(path) == md5(b"%PDF-1.4")
+    cache.invalidate(path)
+    assert cache.lookup(path) is None
+    cache.close()
+
+def test_rehash_ignores_cached_digests(tmp_path):
+    path = old_file(tmp_path / "paper.pdf", b"%PDF-1.4")
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"))
+    handler.hashes.store(path, "md5", "stale")
+    assert handler.compute_hash(path) == "stale"
+    handler.rehash = True
+    assert handler.compute_hash(path) == md5(b"%PDF-1.4")
+    handler.close()
@@ -0,0 +1,38 @@
+import subprocess
+import sys
+
+import pytest
+
+from benchmarks.bench_import import BUDGETS, FORBIDDEN, ROOT, import_times
+
+@pytest.mark.parametrize("module", list(BUDGETS))
+def test_no_heavy_imports(module):
+    times = import_times(module)
+    assert [package for package in FORBIDDEN if package in times] == []
+
+@pytest.mark.parametrize("first", [
+    "import hugo_dataset.retrievers.mp",
+    "from hugo_dataset.retrievers.mp import mp",
+    "from hugo_dataset.retrievers import mp",
+    "from hugo_dataset import retrievers; retrievers.GETTERS['materialsproject']",
+])
+def test_retriever_attribute_is_the_class(first):
+    # Whatever imports the retriever first, retrievers.mp is its class once it is looked up.
+    code = f"""{first}
+from hugo_dataset import retrievers
+cls = retrievers.GETTERS["materialsproject"]
+assert isinstance(cls, type) and retrievers.mp is cls, retrievers.mp
+"""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stderr
+
+def test_retrievers_load_on_first_use():
+    code = """import sys
+from hugo_dataset import retrievers
+assert {"arxiv", "policy"} <= set(dir(retrievers))
+assert "hugo_dataset.retrievers.arxiv" not in sys.modules
+assert retrievers.GETTERS.get("arxiv").source == "arxiv"
+assert "hugo_dataset.retrievers.arxiv" in sys.modules and "hugo_dataset.retrievers.acl" not in sys.modules
+"""
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT)
+    assert result.returncode == 0, result.stderr
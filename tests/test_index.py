@@ -0,0 +1,67 @@
+import os
+
+from hugo_dataset.evidence import DocumentHandler, _scan_tree
+
+HOUR_NS = 3600 * 10**9
+
+def age(*paths, ns):
+    # Timestamps well before the scan, so listings are not discarded as racy.
+    for path in paths:
+        os.utime(path, ns=(ns, ns))
+
+def tree(tmp_path):
+    root = tmp_path / "local"
+    (root / "a").mkdir(parents=True)
+    (root / "b").mkdir()
+    (root / "a" / "2101.00001.pdf").write_bytes(b"%PDF-1.4")
+    (root / "b" / "2101.00002.pdf").write_bytes(b"%PDF-1.4")
+    (root / "b" / ".hidden").write_bytes(b"")
+    (root / "b" / "2101.00003.pdf.part").write_bytes(b"")
+    age(root, root / "a", root / "b", ns=os.stat(root).st_mtime_ns - HOUR_NS)
+    return root
+
+def test_unchanged_directories_are_not_listed_again(tmp_path):
+    root = tree(tmp_path)
+    files, signatures, listed = _scan_tree(str(root), {})
+    assert sorted(id for id, _ in files) == ["2101.00001", "2101.00002"]
+    assert listed == 3
+
+    files, signatures, listed = _scan_tree(str(root), signatures)
+    assert listed == 0
+    assert sorted(id for id, _ in files) == ["2101.00001", "2101.00002"]
+
+    (root / "a" / "2101.00004.pdf").write_bytes(b"%PDF-1.4")
+    age(root / "a", ns=os.stat(root / "a").st_mtime_ns - 2 * HOUR_NS)
+    files, signatures, listed = _scan_tree(str(root), signatures)
+    assert listed == 1
+    assert sorted(id for id, _ in files) == ["2101.00001", "2101.00002", "2101.00004"]
+
+def test_recently_modified_directories_are_listed_again(tmp_path):
+    root = tree(tmp_path)
+    _, signatures, _ = _scan_tree(str(root), {})
+    (root / "b" / "2101.00005.pdf").write_bytes(b"%PDF-1.4")
+    # Same mtime as before, but too close to the scan to trust it.
+    age(root / "b", ns=signatures[str(root / "b")]["scanned_ns"])
+    signatures[str(root / "b")]["mtime_ns"] = os.stat(root / "b").st_mtime_ns
+    files, _, listed = _scan_tree(str(root), signatures)
+    assert listed == 1
+    assert "2101.00005" in [id for id, _ in files]
+
+def test_index_prunes_deleted_files(tmp_path):
+    root = tree(tmp_path)
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"), local_dir=[str(root)])
+    handler.local_store["elsewhere"] = str(tmp_path / "gone" / "elsewhere.pdf")
+    handler.index()
+    assert set(handler.local_store) == {"2101.00001", "2101.00002", "elsewhere"}
+
+    (root / "b" / "2101.00002.pdf").unlink()
+    age(root / "b", ns=os.stat(root / "b").st_mtime_ns - 2 * HOUR_NS)
+    handler.index()
+    # Entries outside the indexed roots are not pruned.
+    assert set(handler.local_store) == {"2101.00001", "elsewhere"}
+
+    (root / "a" / "2101.00001.pdf").unlink()
+    age(root / "a", ns=os.stat(root / "a").st_mtime_ns - 2 * HOUR_NS)
+    handler.index(prune=False)
+    assert set(handler.local_store) == {"2101.00001", "elsewhere"}
+    handler.close()
@@ -0,0 +1,42 @@
+import pyarrow as pa
+import pytest
+from datasets import Dataset, DatasetDict
+
+from hugo_dataset import table as table_module
+from hugo_dataset.load_dataset import DatasetLoader
+
+@pytest.fixture
+def local_dataset(tmp_path):
+    rows = 10
+    DatasetDict({"papers": Dataset(pa.table({
+        "id": [f"p{i}" for i in range(rows)],
+        "url": [f"https://arxiv.org/abs/{i}" for i in range(rows)],
+        "source": ["arxiv"] * rows,
+        "license_type": ["cc by 4.0"] * rows,
+    }))}).save_to_disk(str(tmp_path / "dataset"))
+    return str(tmp_path / "dataset")
+
+@pytest.fixture
+def constructed(monkeypatch):
+    # Counts the Paper objects built from table rows.
+    count = [0]
+    construct = table_module._construct
+    def counting(row):
+        count[0] += 1
+        return construct(row)
+    monkeypatch.setattr(table_module, "_construct", counting)
+    return count
+
+def test_papers_built_per_batch(local_dataset, tmp_path, constructed):
+    dataset_loader = DatasetLoader(dataset_location=local_dataset, target_dir=str(tmp_path / "out"), remote=False,
+                                   allowed_licenses=["all"], batch_size=4)
+    dataset_loader.load_dataset()
+    assert len(dataset_loader.table) == 10
+    assert constructed[0] == 0
+
+    jobs = dataset_loader._jobs()
+    paper, offline = next(jobs)
+    assert (paper.id, offline) == ("p0", False)
+    assert constructed[0] == 1
+    assert [paper.id for paper, _ in jobs] == [f"p{i}" for i in range(1, 10)]
+    assert [paper.id for paper in dataset_loader.papers] == [f"p{i}" for i in range(10)]
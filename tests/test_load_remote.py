@@ -0,0 +1,38 @@
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from hugo_dataset.load_dataset import DatasetLoader
+from hugo_dataset.table import PaperFilter
+
+@pytest.fixture
+def parquet_dataset(tmp_path):
+    # A parquet dataset with an integer year column, loaded through the remote path.
+    table = pa.table({
+        "id": ["a", "b", "c"],
+        "url": [f"https://arxiv.org/abs/{i}" for i in range(3)],
+        "source": ["arxiv"] * 3,
+        "license_type": ["cc by 4.0"] * 3,
+        "year": pa.array([2017, 2018, 2019], pa.int64()),
+        "title": ["x", "y", "z"],
+    })
+    (tmp_path / "data").mkdir()
+    pq.write_table(table, tmp_path / "data" / "papers-00000.parquet")
+    return str(tmp_path)
+
+def loader(location, target, **kwargs):
+    return DatasetLoader(dataset_location=location, target_dir=target, remote=True, allowed_licenses=["all"], **kwargs)
+
+@pytest.mark.parametrize("columns", [None, ["title"]])
+def test_integer_year_filter_pushed_down(parquet_dataset, tmp_path, columns):
+    dataset_loader = loader(parquet_dataset, str(tmp_path / "out"), min_year=2018, max_year=2018, columns=columns)
+    split = next(iter(dataset_loader._load_remote(dataset_loader.paper_filter).values()))
+    assert split["id"] == ["b"]
+
+def test_remote_schema(parquet_dataset, tmp_path):
+    schema = loader(parquet_dataset, str(tmp_path / "out"))._remote_schema()
+    assert pa.types.is_integer(schema.field("year").type)
+
+def test_predicate_columns():
+    assert PaperFilter(min_year=2018).predicate_columns() == {"year"}
+    assert PaperFilter(licenses=["mit"], sources=["arxiv"]).predicate_columns() == {"license_type", "source"}
@@ -0,0 +1,37 @@
+import os
+
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.retrievers import arxiv, local_index
+
+def test_hydrate_matches_normalized_ids(tmp_path):
+    local_index.clear_local_indexes()
+    local = tmp_path / "local" / "nested"
+    local.mkdir(parents=True)
+    (local / "2101.00001v1.pdf").write_bytes(b"%PDF-1.4")
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"), local_dir=[str(tmp_path / "local")])
+    handler.index()
+    assert local_index._indexes == {}, "index() no longer registers a process-wide index"
+    paper = Paper(id="2101.00001v2", url="https://arxiv.org/abs/2101.00001v2", source="arxiv")
+    path = handler.hydrate(paper, offline=True)
+    handler.close()
+    assert path and os.path.isfile(path)
+
+def test_get_local_finds_files_added_after_indexing(tmp_path):
+    local_index.clear_local_indexes()
+    root = tmp_path / "local"
+    root.mkdir()
+    (root / "2101.00001.pdf").write_bytes(b"%PDF-1.4")
+    target = tmp_path / "out"
+    target.mkdir()
+    assert arxiv._get_local("https://arxiv.org/abs/2101.00001", str(target), local_dir=str(root))
+    (root / "2101.00002.pdf").write_bytes(b"%PDF-1.4")
+    assert arxiv._get_local("https://arxiv.org/abs/2101.00002", str(target), local_dir=str(root))
+    local_index.clear_local_indexes()
+
+def test_get_local_ignores_missing_paths(tmp_path):
+    local_index.clear_local_indexes()
+    target = tmp_path / "out"
+    target.mkdir()
+    missing = str(tmp_path / "docs" / "2101.00001.pdf")
+    assert arxiv._get_local("https://arxiv.org/abs/2101.00001", str(target), local_dir=missing) is None
+    assert local_index._indexes == {}
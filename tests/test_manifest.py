@@ -0,0 +1,96 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hugo_dataset.create_dataset import DatasetManager
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.manifest import RunManifest, restore
+
+def test_close_closes_connections_of_all_threads(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    manifest = RunManifest(path, batch_size=1)
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda i: manifest.record(f"p{i}", "done"), range(16)))
+    assert manifest.summary()["done"] == 16
+    manifest.close()
+    # The -wal/-shm files are removed once the last connection is closed.
+    assert sorted(os.listdir(tmp_path)) == ["manifest.sqlite"]
+
+def test_summary_includes_pending_records(tmp_path):
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.record("p0", "done")
+    manifest.record("p1", "failed", error="boom")
+    assert manifest.summary() == {"done": 1, "failed": 1, "skipped": 0}
+    manifest.close()
+
+def test_completed_keeps_the_latest_successful_outcome(tmp_path):
+    doc = tmp_path / "p0.pdf"
+    doc.write_bytes(b"%PDF-1.4")
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"), batch_size=2)
+    manifest.record("p0", "failed", error="timeout")
+    manifest.record("p0", "done", path=str(doc), hash="h0")
+    manifest.record("p1", "done", path=str(tmp_path / "p1.pdf"), hash="h1")
+    manifest.record("p2", "skipped")
+    with pytest.raises(ValueError):
+        manifest.record("p3", "unknown")
+    assert manifest.completed() == {"p0": (str(doc), 8, "h0"), "p1": (str(tmp_path / "p1.pdf"), None, "h1")}
+    assert manifest.failures() == []
+    manifest.close()
+
+def test_restore_requires_the_recorded_file(tmp_path):
+    doc = tmp_path / "p0.pdf"
+    doc.write_bytes(b"%PDF-1.4")
+    paper = Paper(id="p0", url="https://example.org/p0", source="example")
+    assert not restore(paper, None)
+    assert not restore(paper, (str(doc), 9, "h0"))
+    assert not restore(paper, (str(tmp_path / "gone.pdf"), 8, "h0"))
+    assert paper.hash is None
+    assert restore(paper, (str(doc), 8, "h0"))
+    assert paper.hash == "h0"
+
+class StubPaper(Paper):
+    # Hydrates from a file named after the id in `docs`; records the papers processed.
+    def resolve(self):
+        pass
+
+    def download(self, document_handler, offline=False):
+        path = os.path.join(self._docs, f"{self.id}.pdf")
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        self._processed.append(self.id)
+        return path
+
+    def compute_hash(self, document_handler, doc_path):
+        self.hash = f"hash-{self.id}"
+
+def test_resume_skips_papers_done(tmp_path, monkeypatch):
+    monkeypatch.setattr(Paper, "fetch_metadata_many", classmethod(lambda cls, papers: None))
+    docs = tmp_path / "local"
+    docs.mkdir()
+    for i in (0, 1):
+        (docs / f"p{i}.pdf").write_bytes(b"%PDF-1.4")
+    processed = []
+
+    def run(resume):
+        papers = []
+        for i in range(3):
+            paper = StubPaper(id=f"p{i}", url=f"https://example.org/p{i}", source="example")
+            paper._docs, paper._processed = str(docs), processed
+            papers.append(paper)
+        manager = DatasetManager(papers=papers, document_handler=DocumentHandler(doc_dir=str(tmp_path / "docs")),
+                                 use_metadata_cache=False, manifest=str(tmp_path / "manifest.sqlite"))
+        manager.process_all(resume=resume)
+        return papers
+
+    run(resume=False)
+    assert sorted(processed) == ["p0", "p1"]
+    (docs / "p2.pdf").write_bytes(b"%PDF-1.4")
+    processed.clear()
+    papers = run(resume=True)
+    # p2 failed the first time; the others keep their recorded hashes.
+    assert processed == ["p2"]
+    assert [paper.hash for paper in papers] == ["hash-p0", "hash-p1", "hash-p2"]
+    manifest = RunManifest(str(tmp_path / "manifest.sqlite"))
+    assert manifest.summary() == {"done": 3, "failed": 0, "skipped": 0}
+    manifest.close()
@@ -0,0 +1,122 @@
+import pytest
+
+from hugo_dataset.retrievers import cache as cache_module
+from hugo_dataset.retrievers.base import HTTPStatusError, Retriever
+from hugo_dataset.retrievers.cache import MetadataCache
+
+class Getter:
+    source = "stub"
+    error = None
+    calls = 0
+
+    @classmethod
+    def get(cls, id, **kwargs):
+        cls.calls += 1
+        if cls.error is not None:
+            raise cls.error
+        return dict(id=id)
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite"))
+    yield cache
+    cache.close()
+
+@pytest.fixture
+def getter():
+    Getter.error, Getter.calls = None, 0
+    return Getter
+
+@pytest.mark.parametrize("error", [HTTPStatusError("rate limited", 429), HTTPStatusError("unavailable", 503)])
+def test_transient_http_errors_are_not_cached(cache, getter, error):
+    getter.error = error
+    with pytest.raises(HTTPStatusError):
+        cache.get(getter, "a")
+    assert cache.lookup("stub", "a") is None
+    getter.error = None
+    assert cache.get(getter, "a") == dict(id="a")
+
+@pytest.mark.parametrize("error", [HTTPStatusError("not found", 404), ValueError("no entry")])
+def test_permanent_errors_are_cached(cache, getter, error):
+    getter.error = error
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            cache.get(getter, "a")
+    assert getter.calls == 1
+
+def test_access_times_are_batched(cache, getter):
+    cache.get(getter, "a")
+    (before,) = cache._conn.execute("SELECT accessed_at FROM metadata").fetchone()
+    cache.get(getter, "a")
+    assert cache._conn.execute("SELECT accessed_at FROM metadata").fetchone() == (before,)
+    cache.flush()
+    (after,) = cache._conn.execute("SELECT accessed_at FROM metadata").fetchone()
+    assert after >= before and not cache._accessed
+
+class BatchGetter(Retriever):
+    # Answers for the ids in `known`; the whole batch fails while `down` is set.
+    source = "stub"
+    known = set()
+    down = False
+    requests = []
+    etag = None
+
+    @classmethod
+    def get(cls, id, **kwargs):
+        validators = cache_module.conditional.get()
+        cls.requests.append(("get", id, dict(validators or {})))
+        if cls.down:
+            raise HTTPStatusError("unavailable", 503)
+        if validators and cls.etag and validators.get("etag") == cls.etag:
+            raise cache_module.NotModified()
+        if validators is not None:
+            validators["etag"] = cls.etag
+        return dict(id=id, version=cls.etag)
+
+    @classmethod
+    def get_many(cls, ids, failed=None, **kwargs):
+        cls.requests.append(("get_many", tuple(ids), None))
+        if cls.down:
+            failed.update(ids)
+            return {}
+        return {id: dict(id=id) for id in ids if id in cls.known}
+
+@pytest.fixture
+def batch_getter():
+    BatchGetter.known, BatchGetter.down, BatchGetter.requests, BatchGetter.etag = {"a", "b"}, False, [], None
+    return BatchGetter
+
+def test_get_many_caches_ids_not_returned(cache, batch_getter):
+    assert cache.get_many(batch_getter, ["a", "b", "x"]) == {"a": dict(id="a"), "b": dict(id="b")}
+    assert cache.get_many(batch_getter, ["a", "b", "x"]) == {"a": dict(id="a"), "b": dict(id="b")}
+    assert batch_getter.requests == [("get_many", ("a", "b", "x"), None)]
+    assert cache.lookup("stub", "x")["error"]
+
+def test_get_many_revalidates_stale_entries(cache, batch_getter):
+    batch_getter.etag = '"v1"'
+    cache.get(batch_getter, "a")
+    cache.ttl = 0
+    batch_getter.requests.clear()
+    assert cache.get_many(batch_getter, ["a"]) == {"a": dict(id="a", version='"v1"')}
+    # One conditional request, answered 304, instead of a batch refetch.
+    assert batch_getter.requests == [("get", "a", dict(etag='"v1"', last_modified=None))]
+    batch_getter.down = True
+    assert cache.get_many(batch_getter, ["a"]) == {"a": dict(id="a", version='"v1"')}
+
+def test_get_many_serves_stale_data_when_the_batch_fails(cache, batch_getter):
+    cache.get_many(batch_getter, ["a", "x"])
+    cache.ttl = cache.negative_ttl = 0
+    batch_getter.down = True
+    assert cache.get_many(batch_getter, ["a", "x"]) == {"a": dict(id="a")}
+    # A failed batch caches nothing new.
+    assert cache.lookup("stub", "a")["data"] == dict(id="a")
+    assert cache.lookup("stub", "x")["error"]
+
+def test_get_serves_stale_data_on_transient_errors(cache, getter):
+    cache.get(getter, "a")
+    cache.ttl = 0
+    getter.error = HTTPStatusError("unavailable", 503)
+    assert cache.get(getter, "a") == dict(id="a")
+    getter.error = HTTPStatusError("gone", 410)
+    with pytest.raises(HTTPStatusError):
+        cache.get(getter, "a")
@@ -0,0 +1,31 @@
+import json
+
+import pytest
+
+from hugo_dataset import metrics
+from hugo_dataset.create_dataset import DatasetManager
+from hugo_dataset.evidence import DocumentHandler
+from hugo_dataset.pipeline import HydrationPipeline
+
+def manager(tmp_path, metrics_file):
+    return DatasetManager(document_handler=DocumentHandler(doc_dir=str(tmp_path / "docs")),
+                          metrics_file=metrics_file, use_metadata_cache=False)
+
+def test_failed_export_keeps_the_run_error(tmp_path, monkeypatch):
+    def fail(self, jobs, on_result=None, collect=True):
+        raise ValueError("run failed")
+    monkeypatch.setattr(HydrationPipeline, "run", fail)
+    (tmp_path / "file").write_text("")
+    # The metrics cannot be written under a regular file.
+    with pytest.raises(ValueError, match="run failed"):
+        manager(tmp_path, str(tmp_path / "file" / "metrics.prom")).process_all()
+
+def test_failed_export_does_not_fail_the_run(tmp_path):
+    (tmp_path / "file").write_text("")
+    manager(tmp_path, str(tmp_path / "file" / "metrics.prom")).process_all()
+
+def test_metrics_cover_one_run(tmp_path):
+    metrics.get_metrics().counter("hugo_test_total").inc(3)
+    manager(tmp_path, str(tmp_path / "metrics.prom")).process_all()
+    summary = json.loads((tmp_path / "metrics.json").read_text())
+    assert not summary["hugo_test_total"]["values"]
@@ -0,0 +1,83 @@
+import threading
+
+import pytest
+
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.pipeline import HydrationPipeline
+
+class StubPaper(Paper):
+    # Downloads of the "slow" source wait until `release` is set.
+    def resolve(self):
+        pass
+
+    def download(self, document_handler, offline=False):
+        if self.source == "slow":
+            self._release.wait(10)
+        return f"/docs/{self.id}.pdf"
+
+    def compute_hash(self, document_handler, doc_path):
+        pass
+
+@pytest.fixture
+def handler(tmp_path, monkeypatch):
+    monkeypatch.setattr(Paper, "fetch_metadata_many", classmethod(lambda cls, papers: None))
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"))
+    yield handler
+    handler.close()
+
+def papers(source, n, release):
+    result = []
+    for i in range(n):
+        paper = StubPaper(id=f"{source}-{i}", url=f"https://example.org/{source}/{i}", source=source)
+        paper._release = release
+        result.append(paper)
+    return result
+
+def test_slow_source_does_not_block_dispatch(handler):
+    release = threading.Event()
+    slow, fast = papers("slow", 50, release), papers("fast", 10, release)
+    finished_fast = []
+
+    def on_result(result):
+        if result.paper.source == "fast":
+            finished_fast.append(release.is_set())
+            if len(finished_fast) == len(fast):
+                release.set()
+
+    # The slow papers overflow queue_size before the fast ones are dispatched.
+    pipeline = HydrationPipeline(document_handler=handler, workers=2, queue_size=4)
+    results = pipeline.run(slow + fast, on_result=on_result)
+    assert len(results) == len(slow) + len(fast)
+    assert finished_fast == [False] * len(fast)
+
+def test_max_in_flight(handler):
+    release = threading.Event()
+    release.set()
+    pipeline = HydrationPipeline(document_handler=handler, workers=4, queue_size=2, max_in_flight=3)
+    results = pipeline.run(papers("fast", 40, release) + papers("slow", 40, release))
+    assert sorted(r.paper.id for r in results if r.error is None and r.path) == \
+        sorted([f"fast-{i}" for i in range(40)] + [f"slow-{i}" for i in range(40)])
+
+class Crash(BaseException):
+    pass
+
+def test_crashed_worker_does_not_deadlock(handler, monkeypatch):
+    def crash(cls, papers):
+        raise Crash()
+    monkeypatch.setattr(Paper, "fetch_metadata_many", classmethod(crash))
+    release = threading.Event()
+    release.set()
+    pipeline = HydrationPipeline(document_handler=handler, workers=2, queue_size=2)
+    outcome = []
+
+    def run():
+        try:
+            pipeline.run(papers("fast", 20, release))
+        except RuntimeError as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive(), "the pipeline did not shut down after its metadata workers crashed"
+    assert isinstance(outcome[0].__cause__, Crash)
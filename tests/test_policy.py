@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+from benchmarks.server import StandInServer, _Handler
+from hugo_dataset.retrievers import policy
+from hugo_dataset.retrievers.policy import CircuitOpenError, RequestPolicy
+from hugo_dataset.retrievers.transport import Transport
+
+class ScriptedHandler(_Handler):
+    # /status answers with the server's scripted (status, headers), then 200s.
+    def do_GET(self):
+        if self.path != "/status":
+            return super().do_GET()
+        self.server.hits += 1
+        status, headers = self.server.script.pop(0) if self.server.script else (200, {})
+        self._send(status, b"ok" if status == 200 else b"error", headers=headers)
+
+class ScriptedServer(StandInServer):
+    handler_class = ScriptedHandler
+
+    def __init__(self):
+        super().__init__({})
+        self.hits = 0
+        self.script = []
+
+@pytest.fixture
+def server():
+    policy.reset()
+    with ScriptedServer() as server:
+        server.transport = Transport()
+        yield server
+    policy.reset()
+
+def send(server, request_policy, sleep=time.sleep):
+    url = f"{server.url}/status"
+    host = url.split("/")[2]
+    return policy.call("stub", host, request_policy, lambda: server.transport.get(url), sleep=sleep)
+
+def test_rate_limit(server):
+    request_policy = RequestPolicy(rate=20, burst=1)
+    start = time.perf_counter()
+    for _ in range(6):
+        assert send(server, request_policy).status_code == 200
+    # The first request uses the burst; the other five wait 1/20s each.
+    assert time.perf_counter() - start >= 5 / 20 * 0.9
+
+def test_retry_after(server):
+    server.script = [(503, {"Retry-After": "2"}), (429, {"Retry-After": "1"})]
+    waits = []
+    response = send(server, RequestPolicy(max_retries=3), sleep=waits.append)
+    assert response.status_code == 200
+    assert waits == [2.0, 1.0]
+    assert server.hits == 3
+
+def test_retry_after_beyond_max_backoff_is_returned(server):
+    server.script = [(503, {"Retry-After": "600"})]
+    waits = []
+    assert send(server, RequestPolicy(max_backoff=60), sleep=waits.append).status_code == 503
+    assert waits == []
+
+def test_breaker_counts_calls_not_attempts(server):
+    request_policy = RequestPolicy(max_retries=3, backoff=0, breaker_threshold=2, breaker_cooldown=0.3)
+    server.script = [(503, {})] * 8
+    assert send(server, request_policy).status_code == 503
+    assert server.hits == 4
+    # One failed call (four attempts) does not open a breaker with a threshold of two.
+    assert send(server, request_policy).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        send(server, request_policy)
+    assert server.hits == 8
+
+def test_breaker_half_open(server):
+    request_policy = RequestPolicy(max_retries=0, breaker_threshold=1, breaker_cooldown=0.3)
+    server.script = [(503, {}), (503, {})]
+    assert send(server, request_policy).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        send(server, request_policy)
+    time.sleep(0.35)
+    # Half-open: the trial call fails and the breaker opens again.
+    assert send(server, request_policy).status_code == 503
+    with pytest.raises(CircuitOpenError):
+        send(server, request_policy)
+    time.sleep(0.35)
+    # A successful trial closes it.
+    assert send(server, request_policy).status_code == 200
+    assert send(server, request_policy).status_code == 200
+    assert server.hits == 4
+
+def test_retried_responses_are_closed(server):
+    server.script = [(503, {"Retry-After": "0"}), (503, {"Retry-After": "0"})]
+    responses = []
+
+    def fn():
+        responses.append(server.transport.get(f"{server.url}/status", stream=True))
+        return responses[-1]
+
+    host = server.url.split("/")[2]
+    assert policy.call("stub", host, RequestPolicy(max_retries=3), fn).status_code == 200
+    assert len(responses) == 3
+    assert all(response.raw.closed for response in responses[:2])
+    assert not responses[2].raw.closed
@@ -0,0 +1,16 @@
+import time
+
+from hugo_dataset import profiling
+
+def test_profile_writes_without_printing(tmp_path, capsys):
+    with profiling.profile(str(tmp_path), ["hash"], interval=0.001) as profiler:
+        with profiling.stage("hash"):
+            time.sleep(0.05)
+    assert capsys.readouterr().out == ""
+    assert (tmp_path / "hotspots.txt").read_text() == profiler.hotspots()
+    assert profiler.hotspots().startswith("hash:")
+
+def test_profile_off():
+    with profiling.profile(None) as profiler:
+        pass
+    assert profiler is None
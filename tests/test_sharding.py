@@ -0,0 +1,105 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.bench_import import ROOT
+from hugo_dataset.hashing import HashCache
+from hugo_dataset.load_dataset import DatasetLoader
+from hugo_dataset.retrievers.cache import MetadataCache
+from hugo_dataset.sharding import check_shard, in_shard, merge_stores, shard_file, shard_of
+from hugo_dataset.store import SqliteStore
+from hugo_dataset.table import PaperFilter, PaperTable
+
+IDS = [f"2101.{i:05d}" for i in range(8)]
+
+def test_shards_are_stable():
+    # Pinned: every node and Python version must compute the same split.
+    assert [shard_of(id, 4) for id in IDS] == [3, 2, 3, 2, 0, 2, 2, 0]
+    code = "from hugo_dataset.sharding import shard_of; print(shard_of('10.1103/PhysRevB.1', 7))"
+    for seed in ("0", "1"):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=ROOT,
+                                env=dict(os.environ, PYTHONHASHSEED=seed))
+        assert result.stdout.strip() == "0", result.stderr
+
+def test_every_paper_is_in_exactly_one_shard():
+    ids = [f"p{i}" for i in range(200)]
+    shards = [[id for id in ids if in_shard(id, 3, index)] for index in range(3)]
+    assert sorted(sum(shards, [])) == sorted(ids)
+    assert all(shards)
+    assert all(in_shard(id, 1, 0) for id in ids)
+    assert shard_file("docs", "store", 1, 0) is None
+    assert shard_file("docs", "store", 3, 2) == os.path.join("docs", ".store.shard-2-of-3.sqlite")
+    with pytest.raises(ValueError):
+        check_shard(3, 3)
+
+def test_paper_filter_keeps_the_papers_of_its_shard():
+    table = PaperTable.from_papers([dict(id=id, url="u", source="arxiv") for id in IDS])
+    kept = PaperFilter(num_shards=4, shard_index=2).apply(table.table).column("id").to_pylist()
+    assert kept == [id for id in IDS if in_shard(id, 4, 2)]
+
+def test_merge_stores(tmp_path):
+    def document(name):
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-1.4")
+        return str(path)
+
+    target = SqliteStore(str(tmp_path / "store.sqlite"))
+    target["a"] = document("a.pdf")
+    target["c"] = str(tmp_path / "gone.pdf")
+    target.set_signatures({"/docs": dict(scanned_ns=1), "/old": dict(scanned_ns=5)})
+    sources = []
+    for i, (entries, signatures) in enumerate([
+            (dict(a=document("a-copy.pdf"), b=document("b.pdf")), {"/docs": dict(scanned_ns=3)}),
+            (dict(c=document("c.pdf"), d=str(tmp_path / "missing.pdf")), {"/old": dict(scanned_ns=2)})]):
+        shard = SqliteStore(str(tmp_path / f".store.shard-{i}-of-2.sqlite"))
+        shard.update(entries)
+        shard.set_signatures(signatures)
+        shard.close()
+        sources.append(shard.path)
+
+    counts = merge_stores(target, sources)
+    assert counts == dict(added=1, replaced=1, conflicts=2, missing=1)
+    # The target's existing file wins a conflict; an entry whose file is gone is replaced.
+    assert dict(target.items()) == dict(a=str(tmp_path / "a.pdf"), b=str(tmp_path / "b.pdf"),
+                                        c=str(tmp_path / "c.pdf"))
+    assert target.get_signatures() == {"/docs": dict(scanned_ns=3), "/old": dict(scanned_ns=5)}
+    target.close()
+
+def test_shards_default_to_their_own_caches(tmp_path):
+    loader = DatasetLoader(dataset_location=str(tmp_path / "dataset"), target_dir=str(tmp_path / "docs"),
+                           remote=False, allowed_licenses=["all"], num_shards=2, shard_index=1)
+    assert loader.doc_handler.hash_cache == str(tmp_path / "docs" / ".hashes.shard-1-of-2.sqlite")
+
+def test_merge_hash_caches(tmp_path):
+    paper = tmp_path / "paper.pdf"
+    paper.write_bytes(b"%PDF-1.4")
+    old = os.stat(paper)
+    shards = [HashCache(str(tmp_path / f".hashes.shard-{i}-of-2.sqlite")) for i in range(2)]
+    shards[0].store(str(paper), "md5", "old", old, trusted=True)
+    os.utime(paper, ns=(old.st_atime_ns, old.st_mtime_ns + 10**9))
+    shards[1].store(str(paper), "md5", "new", trusted=True)
+    for shard in shards:
+        shard.close()
+
+    merged = HashCache(str(tmp_path / ".hashes.sqlite"))
+    merged.merge([shard.path for shard in reversed(shards)])
+    assert merged.lookup(str(paper)) == "new"
+    merged.close()
+
+def test_merge_metadata_caches(tmp_path):
+    shards = [MetadataCache(str(tmp_path / f".metadata.shard-{i}-of-2.sqlite")) for i in range(2)]
+    shards[0].store("arxiv", "a", {"title": "A"})
+    shards[0].store("arxiv", "b", {"title": "old"})
+    time.sleep(0.01)
+    shards[1].store("arxiv", "b", {"title": "new"})
+    for shard in shards:
+        shard.close()
+
+    merged = MetadataCache(str(tmp_path / ".metadata.sqlite"))
+    merged.merge([shard.path for shard in reversed(shards)])
+    assert merged.lookup("arxiv", "a")["data"] == {"title": "A"}
+    assert merged.lookup("arxiv", "b")["data"] == {"title": "new"}
+    merged.close()
@@ -0,0 +1,43 @@
+import json
+import os
+
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.store import open_store
+
+def write_json(path, mapping, mtime):
+    with open(path, "w") as f:
+        json.dump(mapping, f)
+    os.utime(path, (mtime, mtime))
+
+def test_json_store_file_is_imported_again_after_edits(tmp_path):
+    json_path = str(tmp_path / "store.json")
+    write_json(json_path, {"a": "/docs/a.pdf"}, 1_000_000)
+    store = open_store(str(tmp_path), json_path)
+    store["a"] = "/indexed/a.pdf"
+    store.close()
+
+    # Unchanged: existing entries win.
+    store = open_store(str(tmp_path), json_path)
+    assert store["a"] == "/indexed/a.pdf"
+    store.close()
+
+    write_json(json_path, {"a": "/edited/a.pdf", "b": "/docs/b.pdf"}, 2_000_000)
+    store = open_store(str(tmp_path), json_path)
+    assert dict(store.items()) == {"a": "/edited/a.pdf", "b": "/docs/b.pdf"}
+    store.close()
+
+def test_hydrated_paths_are_recorded(tmp_path):
+    local = tmp_path / "local"
+    local.mkdir()
+    (local / "2101.00001.pdf").write_bytes(b"%PDF-1.4")
+    paper = Paper(id="2101.00001", url="https://arxiv.org/abs/2101.00001", source="arxiv")
+
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"), local_dir=[str(local)])
+    path = handler.hydrate(paper, local_dir=str(local))
+    handler.close()
+    assert path and os.path.isfile(path)
+
+    # A new handler finds the document without indexing.
+    handler = DocumentHandler(doc_dir=str(tmp_path / "docs"))
+    assert handler.local_store.get("2101.00001") == path
+    handler.close()
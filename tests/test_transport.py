@@ -0,0 +1,72 @@
+import gzip
+
+import pytest
+
+from benchmarks.server import StandInServer, _Handler
+from hugo_dataset.retrievers import transport
+from hugo_dataset.retrievers.transport import USER_AGENT, Transport
+
+BODY = b"<feed>" + b"x" * 4096 + b"</feed>"
+
+class RecordingHandler(_Handler):
+    # Serves BODY, gzipped when the client accepts it, and records each request.
+    def do_GET(self):
+        self.server.seen.append((self.client_address[1], self.path, dict(self.headers)))
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            return self._send(200, gzip.compress(BODY), headers={"Content-Encoding": "gzip"})
+        self._send(200, BODY)
+
+class RecordingServer(StandInServer):
+    handler_class = RecordingHandler
+
+    def __init__(self):
+        super().__init__({})
+        self.seen = []
+
+@pytest.fixture
+def server():
+    with RecordingServer() as server:
+        yield server
+
+def test_connections_are_reused(server):
+    client = Transport(host_map=server.host_map())
+    for i in range(5):
+        assert client.get(f"https://export.arxiv.org/api/query?i={i}").status_code == 200
+    client.close()
+    # One keep-alive connection, rerouted from export.arxiv.org.
+    assert len({port for port, _, _ in server.seen}) == 1
+    assert [path for _, path, _ in server.seen] == [f"/api/query?i={i}" for i in range(5)]
+
+def test_headers_and_gzip(server):
+    client = Transport(host_map=server.host_map(), headers={"X-Test": "1"})
+    response = client.get("https://arxiv.org/api/query")
+    assert response.content == BODY
+    assert response.headers["Content-Encoding"] == "gzip"
+    headers = server.seen[-1][2]
+    assert (headers["User-Agent"], headers["X-Test"], headers["Accept-Encoding"]) == (USER_AGENT, "1", "gzip, deflate")
+    client.close()
+
+    client = Transport(host_map=server.host_map(), decode_gzip=False)
+    response = client.get("https://arxiv.org/api/query")
+    assert response.content == BODY and "Content-Encoding" not in response.headers
+    assert server.seen[-1][2]["Accept-Encoding"] == "identity"
+    client.close()
+
+def test_url_rewriting():
+    client = Transport(host_map={"arxiv.org": "http://127.0.0.1:8000", "example.org": "mirror.example.org"})
+    assert client.url("https://arxiv.org/pdf/1.pdf?x=1#f") == "http://127.0.0.1:8000/pdf/1.pdf?x=1#f"
+    assert client.url("https://example.org/a") == "https://mirror.example.org/a"
+    assert client.url("https://export.arxiv.org/a") == "https://export.arxiv.org/a"
+    client.close()
+
+def test_set_transport_closes_the_replaced_one(monkeypatch):
+    closed = []
+    first, second = Transport(), Transport()
+    monkeypatch.setattr(first, "close", lambda: closed.append("first"))
+    transport.set_transport(first)
+    assert transport.get_transport() is first
+    transport.set_transport(second)
+    assert transport.get_transport() is second and closed == ["first"]
+    transport.set_transport(None)
+    assert transport.get_transport() not in (first, second)
+    transport.set_transport(None)
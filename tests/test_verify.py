@@ -0,0 +1,82 @@
+import hashlib
+import os
+import sys
+
+import pyarrow as pa
+import pytest
+from datasets import Dataset, DatasetDict
+
+from hugo_dataset import load_dataset
+from hugo_dataset.evidence import DocumentHandler, Paper
+from hugo_dataset.load_dataset import DatasetLoader
+from hugo_dataset.verify import failed, verify_documents
+
+def test_documents_stored_under_another_id_form_are_found(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    content = b"%PDF-1.4"
+    (docs / "2101.00001v1.pdf").write_bytes(content)
+    handler = DocumentHandler(doc_dir=str(docs))
+    handler.index()
+    paper = Paper(id="2101.00001v2", url="https://arxiv.org/abs/2101.00001v2", source="arxiv",
+                  hash=hashlib.md5(content).hexdigest())
+    paper._expected_hash = paper.hash
+    report = verify_documents([paper], handler, workers=1)
+    handler.close()
+    assert report["summary"]["ok"] == 1
+
+def test_missing_documents_fail_unless_allowed():
+    summary = dict(ok=1, mismatch=0, missing=1, skipped=0, error=0)
+    assert failed(summary)
+    assert not failed(summary, allow_missing=True)
+    assert failed(dict(summary, missing=0, mismatch=1), allow_missing=True)
+    assert not failed(dict(summary, missing=0))
+
+@pytest.fixture
+def dataset(tmp_path):
+    # p0 matches, p1 does not, p2 is missing and p3 has no recorded hash.
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(4):
+        if i != 2:
+            (docs / f"p{i}.pdf").write_bytes(f"%PDF {i}".encode())
+    ids = [f"p{i}" for i in range(4)]
+    hashes = [hashlib.md5(b"%PDF 0").hexdigest(), hashlib.md5(b"other").hexdigest(),
+              hashlib.md5(b"%PDF 2").hexdigest(), None]
+    DatasetDict({"papers": Dataset(pa.table({
+        "id": ids,
+        "url": [f"https://example.org/{id}" for id in ids],
+        "source": ["example"] * 4,
+        "license_type": ["cc by 4.0"] * 4,
+        "hash": hashes,
+    }))}).save_to_disk(str(tmp_path / "dataset"))
+    return tmp_path
+
+def test_verify_report(dataset):
+    loader = DatasetLoader(dataset_location=str(dataset / "dataset"), target_dir=str(dataset / "docs"),
+                           remote=False, allowed_licenses=["all"])
+    loader.load_dataset()
+    report = loader.verify(workers=1)
+    loader.doc_handler.close()
+    assert report["summary"] == dict(ok=1, mismatch=1, missing=1, skipped=1, error=0)
+    assert {record["id"]: record["status"] for record in report["documents"]} == \
+        dict(p0="ok", p1="mismatch", p2="missing", p3="skipped")
+    assert report["throughput"]["files"] == 2
+    assert os.path.isfile(dataset / "docs" / "verify_report.json")
+
+@pytest.mark.parametrize("fixed, extra, status", [
+    ((), [], 1),
+    (("p1",), [], 1), # p2 is missing
+    (("p1",), ["--allow-missing"], 0),
+    (("p1", "p2"), [], 0),
+])
+def test_verify_exit_status(dataset, monkeypatch, fixed, extra, status):
+    if "p1" in fixed:
+        (dataset / "docs" / "p1.pdf").write_bytes(b"other")
+    if "p2" in fixed:
+        (dataset / "docs" / "p2.pdf").write_bytes(b"%PDF 2")
+    monkeypatch.setattr(sys, "argv", ["load_dataset.py", "--dataset", str(dataset / "dataset"), "--allowed-licenses", "all",
+                                      "--target-dir", str(dataset / "docs"), "--verify", "--verify-workers", "1", *extra])
+    with pytest.raises(SystemExit) as exit:
+        load_dataset.main()
+    assert exit.value.code == status
@@ -0,0 +1,170 @@
+import hashlib
+import os
+
+import pytest
+
+import load_from_zotero
+from benchmarks.server import StandInServer, _Handler
+from hugo_dataset.evidence import DocumentHandler
+from hugo_dataset.retrievers import transport
+from hugo_dataset.table import PaperTable
+from hugo_dataset.zotero_downloader import ZoteroDownloader
+from hugo_dataset.zotero_processor import ZoteroProcessor, iter_items
+
+def parent(key, number, children=None):
+    item = {"key": key, "data": {"key": key, "itemType": "journalArticle", "title": key, "abstractNote": "...",
+                                  "url": f"https://arxiv.org/abs/2101.{number:05d}"}}
+    if children is not None:
+        item["meta"] = {"numChildren": children}
+    return item
+
+def attachment(key, parent_key, content=b""):
+    return {"key": key, "data": {"key": key, "itemType": "attachment", "parentItem": parent_key,
+                                  "filename": f"{key}.pdf", "md5": hashlib.md5(content).hexdigest()},
+            "links": {"enclosure": {"length": len(content)}}}
+
+def test_children_before_parents_are_joined():
+    items = [attachment("a1", "p1"), parent("p1", 1, 1), parent("p2", 2, 0)]
+    zp = ZoteroProcessor(download_dir="dl")
+    keys = {}
+    out = [(paper.id, key, dest) for paper, key, dest in zp.stream(items, on_paper=lambda k, p: keys.update({k: p.id}))]
+    assert out == [("2101.00001", "a1", "dl/2101.00001.pdf"), ("2101.00002", None, None)]
+    assert keys == {"p1": "2101.00001", "p2": "2101.00002"}
+
+def test_emitted_papers_are_evicted():
+    items = [parent("p1", 1, 2), attachment("a1", "p1"), attachment("a2", "p1"), parent("p2", 2, 1), attachment("a3", "p2")]
+    zp = ZoteroProcessor(download_dir="dl")
+    seen = []
+    for paper, key, _ in zp.stream(items):
+        # Only the attachment just yielded is kept.
+        assert list(zp.attachments) == [key]
+        seen.append(key)
+    assert seen == ["a1", "a3"]
+    assert zp.attachments == {}
+    assert not zp._emitted
+
+def test_pending_parents_are_capped():
+    read = []
+
+    def items():
+        for i in range(10):
+            read.append(i)
+            # No numChildren: complete only once flushed.
+            yield parent(f"p{i}", i)
+
+    zp = ZoteroProcessor(download_dir="dl", max_pending=3)
+    stream = zp.stream(items())
+    next(stream)
+    assert len(read) == 4
+    assert len(list(stream)) == 9
+
+class PagedClient:
+    """Mimics pyzotero's paging: follow() fetches links["next"] and updates links."""
+    def __init__(self, pages):
+        self.pages = pages
+        self.fetched = []
+        self.links = {"self": 0, "next": 1}
+
+    def follow(self):
+        page = self.links["next"]
+        self.fetched.append(page)
+        self.links = {"self": page, "next": page + 1} if page + 1 < len(self.pages) else {"self": page}
+        return self.pages[page]
+
+    def iterfollow(self):
+        while self.links.get("next"):
+            yield self.follow()
+
+def test_iter_items_starts_from_the_second_page():
+    client = PagedClient([[1, 2], [3], [4, 5]])
+    items = iter_items(client, client.pages[0])
+    client.links = {"self": "deleted"} # Another request made before the items are read
+    assert list(items) == [1, 2, 3, 4, 5]
+    assert client.fetched == [1, 2]
+
+def test_merge_papers():
+    updated = PaperTable.from_papers([dict(id="b", url="u", source="s", title="new")])
+    previous = PaperTable.from_papers([dict(id=i, url="u", source="s", title="old") for i in "abc"])
+    merged = load_from_zotero.merge_papers(updated, previous, ["c", "b", "x", "a"])
+    assert merged.column("id").to_pylist() == ["c", "b", "a"]
+    assert merged.column("title").to_pylist() == ["old", "new", "old"]
+
+class FakeZotero:
+    def __init__(self, items, files):
+        self.items = items
+        self.files = files
+
+    def collection_items(self, collection):
+        return self.items
+
+    def file(self, key):
+        return self.files[key]
+
+def test_load_streams_papers_into_the_dataset(tmp_path, monkeypatch):
+    monkeypatch.setenv("ZOTERO_COLLECTION", "c")
+    items = [parent("p1", 1, 1), attachment("a1", "p1", b"%PDF one"), parent("p2", 2, 1), attachment("a2", "p2", b"%PDF two")]
+    zot = FakeZotero(items, {"a1": b"%PDF one", "a2": b"%PDF two"})
+    load_from_zotero.load(str(tmp_path / "dataset"), download_dir=str(tmp_path / "downloads"),
+                          doc_dir=str(tmp_path / "docs"), zot=zot)
+    from datasets import load_from_disk
+    papers = load_from_disk(str(tmp_path / "dataset"))["papers"]
+    assert sorted(papers["id"]) == ["2101.00001", "2101.00002"]
+    hashes = dict(zip(papers["id"], papers["hash"]))
+    assert hashes["2101.00001"] == hashlib.md5(b"%PDF one").hexdigest()
+    # Hydrated from the downloaded attachment, not from arxiv.org.
+    assert sorted(os.listdir(tmp_path / "downloads")) == ["2101.00001.pdf", "2101.00002.pdf"]
+    assert len(list((tmp_path / "docs").glob("*/arxiv/2101.0000[12].pdf"))) == 2
+
+class RecordingHandler(_Handler):
+    # Zotero's file endpoint redirects to the storage server (another host in production).
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.path.endswith("/file"):
+            return self._send(302, headers={"Location": f"{self.server.storage}/pdf/a1.pdf"})
+        return super().do_GET()
+
+class RecordingServer(StandInServer):
+    handler_class = RecordingHandler
+
+    def __init__(self, documents=None, storage=None):
+        super().__init__(documents or {})
+        self.requests = []
+        self.storage = storage
+
+class ZoteroClient:
+    library_type = "groups"
+    library_id = "1"
+    api_key = "secret"
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+
+def test_api_key_not_sent_to_the_redirect_host(tmp_path):
+    (tmp_path / "a1.pdf").write_bytes(b"%PDF attachment")
+    with RecordingServer({"a1": str(tmp_path / "a1.pdf")}) as storage, \
+         RecordingServer(storage=storage.url) as api:
+        transport.set_transport(transport.Transport())
+        try:
+            chunks = ZoteroDownloader(client=ZoteroClient(api.url))._chunks("a1")
+            assert b"".join(chunks) == b"%PDF attachment"
+        finally:
+            transport.set_transport(None)
+    (_, api_headers), = api.requests
+    assert api_headers["Authorization"] == "Bearer secret"
+    (_, storage_headers), = storage.requests
+    assert "secret" not in str(storage_headers)
+
+def test_removed_items_lose_their_entries_and_owned_files(tmp_path):
+    downloads, docs, local = tmp_path / "downloads", tmp_path / "docs", tmp_path / "local"
+    for d in (downloads, docs / "cc by 4.0" / "arxiv", local):
+        d.mkdir(parents=True)
+    files = [downloads / "2101.00001.pdf", docs / "cc by 4.0" / "arxiv" / "2101.00001.pdf",
+             downloads / "2101.00002.pdf", local / "2101.00003.pdf"]
+    for f in files:
+        f.write_bytes(b"%PDF-1.4")
+    handler = DocumentHandler(doc_dir=str(docs))
+    handler.local_store.update({"2101.00001": str(files[1]), "2101.00002": str(files[2]), "2101.00003": str(files[3])})
+    load_from_zotero.remove_documents(handler, str(downloads), ["2101.00001", "2101.00003"])
+    assert dict(handler.local_store.items()) == {"2101.00002": str(files[2])}
+    handler.close()
+    assert [f.exists() for f in files] == [False, False, True, True]
@@ -0,0 +1,84 @@
+from hugo_dataset.zotero_sync import ZoteroSyncState, sync
+
+def parent(key, version=1, collections=("c",), **data):
+    return {"key": key, "version": version,
+            "data": {"key": key, "itemType": "journalArticle", "collections": list(collections), **data}}
+
+def child(key, parent_key, version=1, **data):
+    return {"key": key, "version": version,
+            "data": {"key": key, "itemType": "attachment", "parentItem": parent_key, **data}}
+
+def stored(state, keys):
+    return [item["key"] for item in state.items(keys)]
+
+def test_apply_added_modified_and_removed(tmp_path):
+    state = ZoteroSyncState(str(tmp_path / "sync.sqlite"))
+    # A child seen before its parent waits for it.
+    delta = state.apply(10, [child("a1", "p1"), parent("p1"), parent("p2"), child("a2", "p2"), parent("p3")], [],
+                        collection="c")
+    assert delta.full and delta.version == 10 and state.version == 10
+    assert sorted(delta.changed) == ["p1", "p2", "p3"]
+    assert stored(state, ["p1", "p2"]) == ["p1", "a1", "p2", "a2"]
+    state.set_paper_ids({"p1": "id1", "p2": "id2", "p3": "id3"})
+
+    delta = state.apply(11, [
+        parent("p1", 11, title="new"), # modified
+        child("a2", "p2", 11, deleted=1), # trashed child: its parent changed
+        parent("p3", 11, collections=["other"]), # moved out of the collection
+        parent("p4", 11), # added
+        child("x1", "p5", 11), # child of an item outside the collection
+    ], ["p2-gone"], collection="c")
+    assert not delta.full
+    assert sorted(delta.changed) == ["p1", "p2", "p4"]
+    assert delta.removed == {"p3": "id3"}
+    assert stored(state, ["p1", "p2", "p3", "p5"]) == ["p1", "a1", "p2"]
+    assert next(state.items(["p1"]))["data"]["title"] == "new"
+    # Paper ids survive modifications, which move the item to the end.
+    assert state.parents() == [("p2", "id2"), ("p1", "id1"), ("p4", None)]
+
+    delta = state.apply(12, [], ["p1", "a1"], collection="c")
+    assert delta.removed == {"p1": "id1"} and delta.changed == []
+    assert stored(state, ["p1"]) == []
+    state.close()
+
+class FakeZotero:
+    def __init__(self):
+        self.version = 5
+        self.collection = [parent("p1", 5), child("a1", "p1", 5)]
+        self.modified = []
+        self.deleted_keys = []
+        self.calls = []
+
+    def last_modified_version(self):
+        return self.version
+
+    def collection_items(self, collection):
+        self.calls.append(("collection_items", collection))
+        return self.collection
+
+    def items(self, since, includeTrashed):
+        self.calls.append(("items", since))
+        return self.modified
+
+    def deleted(self, since):
+        self.calls.append(("deleted", since))
+        return {"items": self.deleted_keys}
+
+def test_sync_fetches_only_what_changed(tmp_path):
+    zot = FakeZotero()
+    state = ZoteroSyncState(str(tmp_path / "sync.sqlite"))
+    delta = sync(zot, "c", state)
+    assert delta.full and delta.changed == ["p1"]
+    assert zot.calls == [("collection_items", "c")]
+
+    zot.calls.clear()
+    delta = sync(zot, "c", state)
+    assert (delta.changed, delta.removed, zot.calls) == ([], {}, [])
+
+    zot.version = 7
+    zot.modified = [parent("p2", 7)]
+    zot.deleted_keys = ["p1"]
+    delta = sync(zot, "c", state)
+    assert zot.calls == [("items", 5), ("deleted", 5)]
+    assert (delta.changed, delta.removed, state.version) == (["p2"], {"p1": None}, 7)
+    state.close()